@@ -1,26 +1,1038 @@
+import time
+STARTED = time.perf_counter()  # 冷启动计时起点（含模块导入）
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 import keyboard
-import pyautogui
-from PIL import Image, ImageGrab, ImageTk
+import importlib
+import queue
+from PIL import Image, ImageDraw, ImageGrab, ImageTk
 import ctypes
+import ctypes.util
+import os
 import sys
-import pystray
+import argparse
+import csv
+import heapq
+import json
+import re
 import threading
+import traceback
+from collections import OrderedDict, deque
+from datetime import datetime
+
+# 其他线程只往队列里放操作，由 Tk 线程定时取出执行；间隔决定托盘/热键操作的最大延迟
+ACTION_POLL_MS = 15
+# 性能预算（毫秒）：启动到托盘图标出现、按下热键到取色窗口显示
+TRAY_BUDGET_MS = 500
+OVERLAY_BUDGET_MS = 50
+
+class LazyModule:
+    """首次访问属性时才导入的模块，启动时不必等待重量级模块加载"""
+    def __init__(self, name):
+        self.name = name
+        self.module = None
+
+    def resolve(self):
+        if self.module is None:
+            self.module = importlib.import_module(self.name)
+        return self.module
+
+    def __getattr__(self, attr):
+        return getattr(self.resolve(), attr)
+
+pyautogui = LazyModule('pyautogui')
+pystray = LazyModule('pystray')
+# numpy 导入约 60ms，托盘出现后才在后台预先导入，不计入启动时间
+np = LazyModule('numpy')
+
+class RenderStats:
+    """放大镜渲染统计：帧率（最近一秒）、事件到画面的延迟、被合并的事件数"""
+    def __init__(self):
+        self.frame_times = deque()
+        self.events = 0
+        self.frames = 0
+        self.skipped = 0
+        self.latency_ms = 0.0
+        self.max_latency_ms = 0.0
+
+    def record_event(self):
+        self.events += 1
+
+    def record_frame(self, event_time, render_time):
+        self.frames += 1
+        self.frame_times.append(render_time)
+        while self.frame_times and render_time - self.frame_times[0] > 1.0:
+            self.frame_times.popleft()
+        latency = (render_time - event_time) * 1000
+        # 指数平滑，显示更稳定
+        self.latency_ms = latency if self.frames == 1 else self.latency_ms * 0.9 + latency * 0.1
+        self.max_latency_ms = max(self.max_latency_ms, latency)
+
+    @property
+    def fps(self):
+        return len(self.frame_times)
+
+    @property
+    def coalesced(self):
+        """没有单独渲染的事件数（合并到后一帧或光标未移动）"""
+        return max(0, self.events - self.frames)
+
+    def summary(self):
+        return (f"fps {self.fps} · 延迟 {self.latency_ms:.1f}ms (最大 {self.max_latency_ms:.1f}ms) · "
+                f"事件 {self.events} / 帧 {self.frames} / 跳过 {self.skipped}")
+
+class CaptureFrame:
+    """
+    一次区域截图的结果
+    buffer 是像素数据的 memoryview。持久后端中 reserve 过的尺寸直接指向共享内存/预分配缓冲区，不做复制，
+    只在同一尺寸下一次截图之前有效（用 valid 判断）；其他尺寸的帧持有数据副本，一直有效。
+    需要长期保留时调用 image() 转成 PIL 图像
+    """
+    # 原始像素格式 -> (R, G, B) 在每个像素内的字节偏移
+    CHANNELS = {'BGRX': (2, 1, 0), 'XRGB': (1, 2, 3), 'RGBX': (0, 1, 2), 'XBGR': (3, 2, 1), 'RGB': (0, 1, 2)}
+
+    def __init__(self, left, top, width, height, buffer=None, stride=0, rawmode='RGB', image=None, owner=None):
+        """
+        :param owner: 帧直接引用的后端缓冲区（有 generation 计数），None 表示帧持有自己的数据
+        """
+        self.owner = owner
+        self.generation = owner.generation if owner is not None else None
+        self.left = left
+        self.top = top
+        self.width = width
+        self.height = height
+        self.stride = stride
+        self.rawmode = rawmode
+        self.pixel_bytes = len(rawmode)
+        self._buffer = buffer
+        self._image = image
+
+    @property
+    def valid(self):
+        """缓冲区是否还是这一帧的数据（同尺寸的后续截图会覆盖共享缓冲区）"""
+        return self.owner is None or self.owner.generation == self.generation
+
+    @property
+    def buffer(self):
+        if self._buffer is None:
+            # PIL 后端没有原始缓冲区，按需导出一份 RGB 数据
+            self._buffer = memoryview(self._image.tobytes())
+            self.stride = self.width * 3
+        return self._buffer
+
+    def pixel(self, x, y):
+        """读取帧内 (x, y) 处的 RGB，直接从缓冲区取值，不创建图像"""
+        if self._buffer is None and self._image is not None:
+            return self._image.getpixel((x, y))[:3]
+        buf = self.buffer
+        offset = y * self.stride + x * self.pixel_bytes
+        r, g, b = self.CHANNELS[self.rawmode]
+        return buf[offset + r], buf[offset + g], buf[offset + b]
+
+    def array(self):
+        """返回 (高, 宽, 3) 的 RGB uint8 数组；持久后端先以视图方式读取缓冲区，只在挑选通道时复制一次"""
+        if self._buffer is None and self._image is not None:
+            return np.asarray(self._image)[..., :3]
+        rows = np.frombuffer(self.buffer, np.uint8, count=self.stride * self.height).reshape(self.height, self.stride)
+        pixels = rows[:, :self.width * self.pixel_bytes].reshape(self.height, self.width, self.pixel_bytes)
+        return pixels[..., list(self.CHANNELS[self.rawmode])]
+
+    def image(self):
+        """转换为 RGB 模式的 PIL 图像（一次 C 层解码）"""
+        if self._image is None:
+            self._image = Image.frombuffer('RGB', (self.width, self.height), self._buffer,
+                                           'raw', self.rawmode, self.stride, 1)
+        return self._image
+
+class CaptureBackend:
+    """截图后端接口：grab 截取屏幕上的矩形区域并返回 CaptureFrame"""
+    name = 'base'
+
+    def screen_size(self):
+        raise NotImplementedError
+
+    def grab(self, left, top, width, height):
+        raise NotImplementedError
+
+    def reserve(self, width, height):
+        """声明会反复截取的尺寸（放大镜区域），持久后端为它保留缓冲区，帧不复制数据"""
+        pass
+
+    def close(self):
+        pass
+
+class PILCaptureBackend(CaptureBackend):
+    """
+    PIL ImageGrab 后端：跨平台，每次截图都新建图像
+    注意 ImageGrab.grab(bbox) 在 Windows 和 X11 上都是先截取整个屏幕再裁剪，区域再小也要付出整屏的代价，
+    只作为没有专用后端时的退路
+    """
+    name = 'pil'
+
+    def __init__(self):
+        self.size = None
+
+    def screen_size(self):
+        if self.size is None:
+            self.size = ImageGrab.grab().size
+        return self.size
+
+    def grab(self, left, top, width, height):
+        img = ImageGrab.grab(bbox=(left, top, left + width, top + height))
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        return CaptureFrame(left, top, img.width, img.height, image=img)
+
+class XImage(ctypes.Structure):
+    _fields_ = [
+        ('width', ctypes.c_int), ('height', ctypes.c_int), ('xoffset', ctypes.c_int), ('format', ctypes.c_int),
+        ('data', ctypes.c_void_p), ('byte_order', ctypes.c_int), ('bitmap_unit', ctypes.c_int),
+        ('bitmap_bit_order', ctypes.c_int), ('bitmap_pad', ctypes.c_int), ('depth', ctypes.c_int),
+        ('bytes_per_line', ctypes.c_int), ('bits_per_pixel', ctypes.c_int),
+        ('red_mask', ctypes.c_ulong), ('green_mask', ctypes.c_ulong), ('blue_mask', ctypes.c_ulong),
+        ('obdata', ctypes.c_void_p), ('f', ctypes.c_void_p * 6),
+    ]
+
+class XShmSegmentInfo(ctypes.Structure):
+    _fields_ = [('shmseg', ctypes.c_ulong), ('shmid', ctypes.c_int), ('shmaddr', ctypes.c_void_p),
+                ('readOnly', ctypes.c_int)]
+
+X_ERROR_HANDLER = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_void_p, ctypes.c_void_p)
+
+class XImageBuffer:
+    """一块 XImage 及其像素缓冲区；generation 在每次截图时递增，帧据此判断数据是否已被覆盖"""
+    def __init__(self, ximage, shminfo, view, buf=None):
+        self.ximage = ximage
+        self.shminfo = shminfo
+        self.view = view
+        self.buf = buf  # 非 SHM 时保持 ctypes 缓冲区存活
+        self.generation = 0
+
+class X11CaptureBackend(CaptureBackend):
+    """
+    X11 后端：程序运行期间保持一个 X 连接，每种截图尺寸只创建一次 XImage
+    支持 MIT-SHM 时用 XShmGetImage 直接写入共享内存；否则用 XGetSubImage 写入预分配的缓冲区
+    """
+    Z_PIXMAP = 2
+    # 未 reserve 的尺寸只缓存最近使用的几个，且单个不超过 4 MB，大矩形用完即释放
+    CACHE_SIZES = 2
+    CACHE_MAX_BYTES = 4 << 20
+    ALL_PLANES = ctypes.c_ulong(-1).value
+    IPC_CREAT = 0o1000
+    IPC_RMID = 0
+
+    def __init__(self, display=None, use_shm=True):
+        """
+        :param display: X 显示名，默认读取 DISPLAY 环境变量
+        :param use_shm: 是否尝试 MIT-SHM 扩展
+        """
+        path = ctypes.util.find_library('X11')
+        if not path:
+            raise OSError("找不到 libX11")
+        self.xlib = xlib = ctypes.CDLL(path)
+        xlib.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        xlib.XOpenDisplay.restype = ctypes.c_void_p
+        for func in ('XDefaultScreen',):
+            getattr(xlib, func).argtypes = [ctypes.c_void_p]
+        for func in ('XDisplayWidth', 'XDisplayHeight', 'XDefaultDepth'):
+            getattr(xlib, func).argtypes = [ctypes.c_void_p, ctypes.c_int]
+        xlib.XRootWindow.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        xlib.XRootWindow.restype = ctypes.c_ulong
+        xlib.XDefaultVisual.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        xlib.XDefaultVisual.restype = ctypes.c_void_p
+        xlib.XCreateImage.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int, ctypes.c_int,
+                                      ctypes.c_void_p, ctypes.c_uint, ctypes.c_uint, ctypes.c_int, ctypes.c_int]
+        xlib.XCreateImage.restype = ctypes.POINTER(XImage)
+        xlib.XGetSubImage.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.c_int, ctypes.c_int, ctypes.c_uint,
+                                      ctypes.c_uint, ctypes.c_ulong, ctypes.c_int, ctypes.POINTER(XImage),
+                                      ctypes.c_int, ctypes.c_int]
+        xlib.XGetSubImage.restype = ctypes.POINTER(XImage)
+        xlib.XFree.argtypes = [ctypes.c_void_p]
+        xlib.XSync.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        xlib.XCloseDisplay.argtypes = [ctypes.c_void_p]
+        xlib.XSetErrorHandler.argtypes = [ctypes.c_void_p]
+        xlib.XSetErrorHandler.restype = ctypes.c_void_p
+
+        name = display.encode() if display else None
+        self.display = xlib.XOpenDisplay(name)
+        if not self.display:
+            raise OSError(f"无法连接 X 显示 {display or os.environ.get('DISPLAY', '')}")
+        screen = xlib.XDefaultScreen(self.display)
+        self.root_window = xlib.XRootWindow(self.display, screen)
+        self.visual = xlib.XDefaultVisual(self.display, screen)
+        self.depth = xlib.XDefaultDepth(self.display, screen)
+        self.size = (xlib.XDisplayWidth(self.display, screen), xlib.XDisplayHeight(self.display, screen))
+        self.pinned = {}  # reserve 过的尺寸 -> XImageBuffer，帧直接引用
+        self.images = OrderedDict()  # 其他尺寸的最近使用缓存，帧复制数据
+        self.rawmode = None
+        self.use_shm = False
+        if use_shm:
+            try:
+                self.load_xshm()
+                self.use_shm = True
+                self.reserve(1, 1)
+            except OSError:
+                self.release_all()
+                self.use_shm = False
+                self.rawmode = None
+        self.name = 'x11-shm' if self.use_shm else 'x11'
+        # 探测像素格式（1x1 也是取色和单像素监视的常用尺寸）；不支持的格式在这里就报错，由调用方退回 PIL 后端
+        try:
+            self.reserve(1, 1)
+        except OSError:
+            self.close()
+            raise
+
+    def load_xshm(self):
+        path = ctypes.util.find_library('Xext')
+        libc_path = ctypes.util.find_library('c')
+        if not path or not libc_path:
+            raise OSError("找不到 libXext")
+        self.xext = xext = ctypes.CDLL(path)
+        xext.XShmQueryExtension.argtypes = [ctypes.c_void_p]
+        xext.XShmCreateImage.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int,
+                                         ctypes.c_void_p, ctypes.POINTER(XShmSegmentInfo),
+                                         ctypes.c_uint, ctypes.c_uint]
+        xext.XShmCreateImage.restype = ctypes.POINTER(XImage)
+        xext.XShmAttach.argtypes = [ctypes.c_void_p, ctypes.POINTER(XShmSegmentInfo)]
+        xext.XShmDetach.argtypes = [ctypes.c_void_p, ctypes.POINTER(XShmSegmentInfo)]
+        xext.XShmGetImage.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(XImage),
+                                      ctypes.c_int, ctypes.c_int, ctypes.c_ulong]
+        self.libc = libc = ctypes.CDLL(libc_path, use_errno=True)
+        libc.shmget.argtypes = [ctypes.c_int, ctypes.c_size_t, ctypes.c_int]
+        libc.shmat.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_int]
+        libc.shmat.restype = ctypes.c_void_p
+        libc.shmdt.argtypes = [ctypes.c_void_p]
+        libc.shmctl.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_void_p]
+        if not xext.XShmQueryExtension(self.display):
+            raise OSError("X 服务器不支持 MIT-SHM")
+
+    def attach_shm(self, shminfo):
+        """
+        挂载共享内存段；远程显示等情况下 XShmAttach 会产生 X 错误，
+        这里临时替换错误处理函数把错误记下来，而不是让 Xlib 直接退出进程
+        """
+        errors = []
+        handler = X_ERROR_HANDLER(lambda display, event: errors.append(event) or 0)
+        previous = self.xlib.XSetErrorHandler(ctypes.cast(handler, ctypes.c_void_p))
+        try:
+            ok = self.xext.XShmAttach(self.display, ctypes.byref(shminfo))
+            self.xlib.XSync(self.display, 0)
+        finally:
+            self.xlib.XSetErrorHandler(previous)
+        return ok and not errors
+
+    def create_shm_image(self, width, height):
+        shminfo = XShmSegmentInfo()
+        ximage = self.xext.XShmCreateImage(self.display, self.visual, self.depth, self.Z_PIXMAP,
+                                           None, ctypes.byref(shminfo), width, height)
+        if not ximage:
+            raise OSError("XShmCreateImage 失败")
+        size = ximage.contents.bytes_per_line * height
+        shmid = self.libc.shmget(0, size, self.IPC_CREAT | 0o600)
+        if shmid < 0:
+            self.xlib.XFree(ximage)
+            raise OSError(ctypes.get_errno(), "shmget 失败")
+        addr = self.libc.shmat(shmid, None, 0)
+        if addr is None or addr == ctypes.c_void_p(-1).value:
+            self.libc.shmctl(shmid, self.IPC_RMID, None)
+            self.xlib.XFree(ximage)
+            raise OSError(ctypes.get_errno(), "shmat 失败")
+        shminfo.shmid = shmid
+        shminfo.shmaddr = addr
+        shminfo.readOnly = 0
+        ximage.contents.data = addr
+        attached = self.attach_shm(shminfo)
+        # 双方都挂载后立即标记删除，进程异常退出时内核也会回收
+        self.libc.shmctl(shmid, self.IPC_RMID, None)
+        if not attached:
+            self.libc.shmdt(addr)
+            self.xlib.XFree(ximage)
+            raise OSError("XShmAttach 失败")
+        view = memoryview((ctypes.c_char * size).from_address(addr)).cast('B')
+        return XImageBuffer(ximage, shminfo, view)
+
+    def create_plain_image(self, width, height):
+        ximage = self.xlib.XCreateImage(self.display, self.visual, self.depth, self.Z_PIXMAP, 0,
+                                        None, width, height, 32, 0)
+        if not ximage:
+            raise OSError("XCreateImage 失败")
+        buf = ctypes.create_string_buffer(ximage.contents.bytes_per_line * height)
+        ximage.contents.data = ctypes.addressof(buf)
+        return XImageBuffer(ximage, None, memoryview(buf).cast('B'), buf)
+
+    def create_image(self, width, height):
+        image = self.create_shm_image(width, height) if self.use_shm else self.create_plain_image(width, height)
+        if self.rawmode is None:
+            try:
+                self.rawmode = self.pixel_format(image.ximage.contents)
+            except OSError:
+                self.release_image(image)
+                raise
+        return image
+
+    def reserve(self, width, height):
+        key = (width, height)
+        if key not in self.pinned:
+            self.pinned[key] = self.images.pop(key, None) or self.create_image(width, height)
+        return self.pinned[key]
+
+    def get_image(self, width, height):
+        """
+        取得指定尺寸的 XImage
+        :return: (XImageBuffer, 是否已缓存)；未缓存的由调用方用完后释放
+        """
+        key = (width, height)
+        if key in self.pinned:
+            return self.pinned[key], True
+        image = self.images.get(key)
+        if image is not None:
+            self.images.move_to_end(key)
+            return image, True
+        image = self.create_image(width, height)
+        if image.ximage.contents.bytes_per_line * height > self.CACHE_MAX_BYTES:
+            return image, False
+        self.images[key] = image
+        while len(self.images) > self.CACHE_SIZES:
+            self.release_image(self.images.popitem(last=False)[1])
+        return image, True
+
+    def release_image(self, image):
+        # 引用它的帧从此失效
+        image.generation = -1
+        if image.shminfo is not None:
+            self.xext.XShmDetach(self.display, ctypes.byref(image.shminfo))
+            self.xlib.XSync(self.display, 0)
+            self.libc.shmdt(image.shminfo.shmaddr)
+        # data 指向共享内存或 Python 缓冲区，只释放结构体本身
+        self.xlib.XFree(image.ximage)
+
+    def release_all(self):
+        for image in list(self.pinned.values()) + list(self.images.values()):
+            self.release_image(image)
+        self.pinned.clear()
+        self.images.clear()
+
+    def pixel_format(self, ximage):
+        """根据 XImage 的字节序和颜色掩码确定原始像素格式（只支持 32 位像素）"""
+        if ximage.bits_per_pixel != 32:
+            raise OSError(f"不支持 {ximage.bits_per_pixel} 位像素")
+        lsb_first = ximage.byte_order == 0
+        if ximage.red_mask == 0xFF0000:
+            return 'BGRX' if lsb_first else 'XRGB'
+        if ximage.red_mask == 0xFF:
+            return 'RGBX' if lsb_first else 'XBGR'
+        raise OSError(f"不支持的颜色掩码 {ximage.red_mask:#x}")
+
+    def screen_size(self):
+        return self.size
+
+    def grab(self, left, top, width, height):
+        """
+        截取区域；帧的位置和尺寸总是与请求一致，超出屏幕的部分填黑（放大镜中心始终对准光标）
+        reserve 过的尺寸返回直接引用缓冲区的帧，其他尺寸返回数据副本
+        """
+        x0, y0 = max(left, 0), max(top, 0)
+        x1, y1 = min(left + width, self.size[0]), min(top + height, self.size[1])
+        if (x0, y0, x1, y1) != (left, top, left + width, top + height):
+            return self.pad_frame(left, top, width, height, (x0, y0, x1, y1))
+        image, cached = self.get_image(width, height)
+        ximage = image.ximage
+        if image.shminfo is not None:
+            ok = self.xext.XShmGetImage(self.display, self.root_window, ximage, left, top, self.ALL_PLANES)
+        else:
+            ok = self.xlib.XGetSubImage(self.display, self.root_window, left, top, width, height,
+                                        self.ALL_PLANES, self.Z_PIXMAP, ximage, 0, 0)
+        stride = ximage.contents.bytes_per_line
+        try:
+            if not ok:
+                raise OSError("X11 截图失败")
+            image.generation += 1
+            if (width, height) in self.pinned:
+                return CaptureFrame(left, top, width, height, buffer=image.view, stride=stride,
+                                    rawmode=self.rawmode, owner=image)
+            data = memoryview(bytes(image.view))
+        finally:
+            if not cached:
+                self.release_image(image)
+        return CaptureFrame(left, top, width, height, buffer=data, stride=stride, rawmode=self.rawmode)
+
+    def pad_frame(self, left, top, width, height, visible):
+        """区域部分在屏幕外：截取屏幕内的部分，复制到填黑的完整区域中"""
+        x0, y0, x1, y1 = visible
+        stride = width * 4
+        data = bytearray(stride * height)
+        if x0 < x1 and y0 < y1:
+            inner = self.grab(x0, y0, x1 - x0, y1 - y0)
+            row_bytes = inner.width * 4
+            for row in range(inner.height):
+                src = row * inner.stride
+                dst = (y0 - top + row) * stride + (x0 - left) * 4
+                data[dst:dst + row_bytes] = inner.buffer[src:src + row_bytes]
+        return CaptureFrame(left, top, width, height, buffer=memoryview(data), stride=stride, rawmode=self.rawmode)
+
+    def close(self):
+        if not self.display:
+            return
+        # 关闭后之前返回的引用缓冲区的帧随之失效
+        self.release_all()
+        self.xlib.XCloseDisplay(self.display)
+        self.display = None
+
+class BITMAPINFOHEADER(ctypes.Structure):
+    _fields_ = [
+        ('biSize', ctypes.c_uint32), ('biWidth', ctypes.c_int32), ('biHeight', ctypes.c_int32),
+        ('biPlanes', ctypes.c_uint16), ('biBitCount', ctypes.c_uint16), ('biCompression', ctypes.c_uint32),
+        ('biSizeImage', ctypes.c_uint32), ('biXPelsPerMeter', ctypes.c_int32), ('biYPelsPerMeter', ctypes.c_int32),
+        ('biClrUsed', ctypes.c_uint32), ('biClrImportant', ctypes.c_uint32),
+    ]
+
+class DIBBuffer:
+    """一个 DIB section（自上而下的 32 位 BGRX）及其像素缓冲区；generation 的含义同 XImageBuffer"""
+    def __init__(self, bitmap, address, view):
+        self.bitmap = bitmap
+        self.address = address
+        self.view = view
+        self.generation = 0
+
+class Win32CaptureBackend(CaptureBackend):
+    """
+    Windows GDI 后端：用 BitBlt 只把请求的矩形从屏幕 DC 复制到 DIB section，不截取整个桌面
+    reserve 过的尺寸保留 DIB section，帧直接引用；其他尺寸截完复制数据后立即释放。
+    坐标与 PIL 相同（主屏左上角为原点），超出虚拟桌面的部分填黑
+    """
+    name = 'win32'
+    SRCCOPY = 0x00CC0020
+    CAPTUREBLT = 0x40000000  # 同时截取分层窗口，与 ImageGrab 一致
+    DIB_RGB_COLORS = 0
+    SM_CXSCREEN, SM_CYSCREEN = 0, 1
+    SM_XVIRTUALSCREEN, SM_YVIRTUALSCREEN, SM_CXVIRTUALSCREEN, SM_CYVIRTUALSCREEN = 76, 77, 78, 79
+
+    def __init__(self):
+        if sys.platform != 'win32':
+            raise OSError("GDI 截图后端只支持 Windows")
+        handle = ctypes.c_void_p
+        self.user32 = user32 = ctypes.WinDLL('user32')
+        self.gdi32 = gdi32 = ctypes.WinDLL('gdi32')
+        user32.GetDC.argtypes = [handle]
+        user32.GetDC.restype = handle
+        user32.ReleaseDC.argtypes = [handle, handle]
+        user32.GetSystemMetrics.argtypes = [ctypes.c_int]
+        gdi32.CreateCompatibleDC.argtypes = [handle]
+        gdi32.CreateCompatibleDC.restype = handle
+        gdi32.CreateDIBSection.argtypes = [handle, ctypes.POINTER(BITMAPINFOHEADER), ctypes.c_uint,
+                                           ctypes.POINTER(ctypes.c_void_p), handle, ctypes.c_uint32]
+        gdi32.CreateDIBSection.restype = handle
+        gdi32.SelectObject.argtypes = [handle, handle]
+        gdi32.SelectObject.restype = handle
+        gdi32.BitBlt.argtypes = [handle, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int,
+                                 handle, ctypes.c_int, ctypes.c_int, ctypes.c_uint32]
+        gdi32.DeleteObject.argtypes = [handle]
+        gdi32.DeleteDC.argtypes = [handle]
+
+        self.screen_dc = user32.GetDC(None)
+        if not self.screen_dc:
+            raise OSError("GetDC 失败")
+        self.memory_dc = gdi32.CreateCompatibleDC(self.screen_dc)
+        if not self.memory_dc:
+            user32.ReleaseDC(None, self.screen_dc)
+            raise OSError("CreateCompatibleDC 失败")
+        self.default_bitmap = None  # 内存 DC 原来选入的位图，删除 DIB 前要先换回
+        self.selected = None
+        self.pinned = {}
+        self.rawmode = 'BGRX'
+        self.reserve(1, 1)
+
+    def screen_size(self):
+        return (self.user32.GetSystemMetrics(self.SM_CXSCREEN), self.user32.GetSystemMetrics(self.SM_CYSCREEN))
+
+    def virtual_screen(self):
+        """虚拟桌面（所有显示器）的 (左, 上, 右, 下)"""
+        metrics = self.user32.GetSystemMetrics
+        left, top = metrics(self.SM_XVIRTUALSCREEN), metrics(self.SM_YVIRTUALSCREEN)
+        return left, top, left + metrics(self.SM_CXVIRTUALSCREEN), top + metrics(self.SM_CYVIRTUALSCREEN)
+
+    def create_buffer(self, width, height):
+        # 高度取负数表示自上而下的行顺序，与 CaptureFrame 的行序一致
+        header = BITMAPINFOHEADER(ctypes.sizeof(BITMAPINFOHEADER), width, -height, 1, 32, 0, 0, 0, 0, 0, 0)
+        bits = ctypes.c_void_p()
+        bitmap = self.gdi32.CreateDIBSection(self.memory_dc, ctypes.byref(header), self.DIB_RGB_COLORS,
+                                             ctypes.byref(bits), None, 0)
+        if not bitmap or not bits.value:
+            raise OSError(f"CreateDIBSection 失败 ({width}x{height})")
+        view = memoryview((ctypes.c_char * (width * height * 4)).from_address(bits.value)).cast('B')
+        return DIBBuffer(bitmap, bits.value, view)
+
+    def select(self, buffer):
+        if self.selected is not buffer:
+            previous = self.gdi32.SelectObject(self.memory_dc, buffer.bitmap)
+            if self.default_bitmap is None:
+                self.default_bitmap = previous
+            self.selected = buffer
+
+    def release_buffer(self, buffer):
+        buffer.generation = -1
+        if self.selected is buffer:
+            self.gdi32.SelectObject(self.memory_dc, self.default_bitmap)
+            self.selected = None
+        self.gdi32.DeleteObject(buffer.bitmap)
+
+    def reserve(self, width, height):
+        key = (width, height)
+        if key not in self.pinned:
+            self.pinned[key] = self.create_buffer(width, height)
+        return self.pinned[key]
+
+    def grab(self, left, top, width, height):
+        buffer = self.pinned.get((width, height))
+        temporary = buffer is None
+        if temporary:
+            buffer = self.create_buffer(width, height)
+        try:
+            self.select(buffer)
+            vx0, vy0, vx1, vy1 = self.virtual_screen()
+            x0, y0 = max(left, vx0), max(top, vy0)
+            x1, y1 = min(left + width, vx1), min(top + height, vy1)
+            if (x0, y0, x1, y1) != (left, top, left + width, top + height):
+                # 部分在桌面外：先清零，再只复制桌面内的部分
+                ctypes.memset(buffer.address, 0, width * height * 4)
+            if x0 < x1 and y0 < y1:
+                ok = self.gdi32.BitBlt(self.memory_dc, x0 - left, y0 - top, x1 - x0, y1 - y0,
+                                       self.screen_dc, x0, y0, self.SRCCOPY | self.CAPTUREBLT)
+                if not ok:
+                    raise OSError("BitBlt 截图失败")
+            buffer.generation += 1
+            if not temporary:
+                return CaptureFrame(left, top, width, height, buffer=buffer.view, stride=width * 4,
+                                    rawmode=self.rawmode, owner=buffer)
+            data = memoryview(bytes(buffer.view))
+        finally:
+            if temporary:
+                self.release_buffer(buffer)
+        return CaptureFrame(left, top, width, height, buffer=data, stride=width * 4, rawmode=self.rawmode)
+
+    def close(self):
+        if not self.memory_dc:
+            return
+        # 关闭后之前返回的引用缓冲区的帧随之失效
+        for buffer in self.pinned.values():
+            self.release_buffer(buffer)
+        self.pinned.clear()
+        self.gdi32.DeleteDC(self.memory_dc)
+        self.user32.ReleaseDC(None, self.screen_dc)
+        self.memory_dc = None
+
+CAPTURE_BACKENDS = {'pil': PILCaptureBackend, 'x11': X11CaptureBackend, 'win32': Win32CaptureBackend}
+
+def create_capture_backend(name='auto'):
+    """
+    创建截图后端
+    :param name: 'pil'、'x11'、'win32' 或 'auto'（Windows 用 GDI 区域截图，Linux 且有 DISPLAY 时用 X11，
+                 都不可用时退回 PIL）
+    """
+    if name == 'auto':
+        if sys.platform == 'win32':
+            try:
+                return Win32CaptureBackend()
+            except OSError as e:
+                print(f"GDI 截图后端不可用，改用 PIL: {e}")
+        elif sys.platform.startswith('linux') and os.environ.get('DISPLAY'):
+            try:
+                return X11CaptureBackend()
+            except OSError as e:
+                print(f"X11 截图后端不可用，改用 PIL: {e}")
+        return PILCaptureBackend()
+    return CAPTURE_BACKENDS[name]()
+
+# 采样模式：界面显示名 -> 内部名称
+SAMPLE_MODES = {'单点': 'point', '平均': 'average', '中值': 'median', '主色': 'dominant'}
+
+def average_color(pixels):
+    """区域平均色（先按列求和再合并，比直接对 (N, 3) 求均值快一个数量级）"""
+    height, width = pixels.shape[:2]
+    total = pixels.sum(axis=0, dtype=np.uint64).sum(axis=0)
+    return tuple(int(v) for v in np.rint(total / (height * width)))
+
+def median_color(pixels):
+    """区域逐通道中值，对抗锯齿边缘和抖动图案更稳定"""
+    return tuple(int(v) for v in np.median(pixels.reshape(-1, 3), axis=0))
+
+def dominant_colors(pixels, k=3, iterations=10, max_samples=4096):
+    """
+    向量化 k-means 求区域主色
+    :param pixels: (..., 3) 的 RGB 数组
+    :param k: 聚类数
+    :param iterations: 最大迭代次数
+    :param max_samples: 像素过多时随机抽样的数量（固定种子，结果可复现）
+    :return: [((r, g, b), 占比), ...]，按占比从大到小
+    """
+    data = pixels.reshape(-1, 3).astype(np.float32)
+    if len(data) > max_samples:
+        data = data[np.random.default_rng(0).choice(len(data), max_samples, replace=False)]
+    k = max(1, min(k, len(data)))
+    # 按亮度分位数取初始中心，避免随机初始化导致每次点击结果不同
+    order = np.argsort(data @ np.array([0.299, 0.587, 0.114], np.float32))
+    centers = data[order[((np.arange(k) + 0.5) * len(data) / k).astype(int)]]
+    for _ in range(iterations):
+        labels = ((data[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2).argmin(axis=1)
+        counts = np.bincount(labels, minlength=k)
+        sums = np.stack([np.bincount(labels, weights=data[:, c], minlength=k) for c in range(3)], axis=1)
+        filled = counts > 0
+        updated = centers.copy()
+        updated[filled] = sums[filled] / counts[filled, None]
+        if np.allclose(updated, centers, atol=0.5):
+            centers = updated
+            break
+        centers = updated
+    labels = ((data[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2).argmin(axis=1)
+    counts = np.bincount(labels, minlength=k)
+    return [(tuple(int(v) for v in np.rint(centers[i])), float(counts[i] / len(data)))
+            for i in np.argsort(-counts) if counts[i]]
+
+# sRGB (D65) 线性值到 XYZ 的矩阵和参考白
+SRGB_TO_XYZ = ((0.4124564, 0.3575761, 0.1804375),
+               (0.2126729, 0.7151522, 0.0721750),
+               (0.0193339, 0.1191920, 0.9503041))
+D65_WHITE = (0.95047, 1.0, 1.08883)
+
+def rgb_to_lab(rgb):
+    """
+    sRGB（0-255）转 CIELAB，向量化计算
+    :param rgb: 形状为 (..., 3) 的数组或单个 (r, g, b)
+    :return: 同形状的 Lab 数组
+    """
+    c = np.asarray(rgb, np.float64) / 255.0
+    c = np.where(c > 0.04045, ((c + 0.055) / 1.055) ** 2.4, c / 12.92)
+    xyz = c @ np.asarray(SRGB_TO_XYZ).T / np.asarray(D65_WHITE)
+    delta = 6 / 29
+    f = np.where(xyz > delta ** 3, np.cbrt(xyz), xyz / (3 * delta ** 2) + 4 / 29)
+    return np.stack([116 * f[..., 1] - 16, 500 * (f[..., 0] - f[..., 1]), 200 * (f[..., 1] - f[..., 2])], axis=-1)
+
+class KDTree:
+    """
+    三维点的 KD 树，用于色板最近邻查询
+    点按树的顺序重排后连续存放，叶子节点内用 NumPy 一次算完距离
+    """
+    LEAF_SIZE = 16
+
+    def __init__(self, points):
+        points = np.asarray(points, np.float64)
+        self.order = np.arange(len(points))
+        self.nodes = []  # [划分轴（叶子为 -1）, 划分值, 左子树, 右子树, 起始, 结束]
+        self.source = points
+        self.root = self.build(0, len(points))
+        self.points = points[self.order]
+        del self.source
+
+    def build(self, start, end):
+        node = len(self.nodes)
+        self.nodes.append([-1, 0.0, -1, -1, start, end])
+        if end - start <= self.LEAF_SIZE:
+            return node
+        segment = self.order[start:end]
+        values = self.source[segment]
+        axis = int(np.argmax(values.max(axis=0) - values.min(axis=0)))
+        mid = (end - start) // 2
+        part = np.argpartition(values[:, axis], mid)
+        self.order[start:end] = segment[part]
+        split = float(self.source[self.order[start + mid], axis])
+        left = self.build(start, start + mid)
+        right = self.build(start + mid, end)
+        self.nodes[node] = [axis, split, left, right, start, end]
+        return node
+
+    def query(self, point, k=1):
+        """
+        查询 k 个最近点
+        :return: [(距离, 原始下标), ...]，按距离从小到大
+        """
+        target = np.asarray(point, np.float64)
+        coords = target.tolist()
+        best = []  # 以负的平方距离作大顶堆，堆顶是当前第 k 近
+
+        def visit(node):
+            axis, split, left, right, start, end = self.nodes[node]
+            if axis < 0:
+                d2 = ((self.points[start:end] - target) ** 2).sum(axis=1)
+                for d, i in zip(d2.tolist(), range(start, end)):
+                    if len(best) < k:
+                        heapq.heappush(best, (-d, i))
+                    elif d < -best[0][0]:
+                        heapq.heapreplace(best, (-d, i))
+                return
+            diff = coords[axis] - split
+            near, far = (left, right) if diff < 0 else (right, left)
+            visit(near)
+            # 只有划分面比当前第 k 近的点更近时才需要搜索另一侧
+            if len(best) < k or diff * diff < -best[0][0]:
+                visit(far)
+
+        if len(self.points):
+            visit(self.root)
+        return [(d ** 0.5, int(self.order[i])) for d, i in sorted((-d, i) for d, i in best)]
+
+HEX_PATTERN = re.compile(r'#?\b([0-9A-Fa-f]{6})\b')
+
+def parse_hex(text):
+    """'#RRGGBB' 或 'RRGGBB' 转 (r, g, b)"""
+    value = text.strip().lstrip('#')
+    return int(value[0:2], 16), int(value[2:4], 16), int(value[4:6], 16)
+
+def load_palette(path):
+    """
+    读取色板文件
+    支持 GIMP .gpl（“R G B 名称”）、JSON（{名称: "#RRGGBB"}、[{"name": ..., "hex": ...}] 或 [[名称, "#RRGGBB"]]）
+    以及每行包含名称和 #RRGGBB 的 CSV/文本文件
+    :param path: 色板文件路径
+    :return: [(名称, (r, g, b)), ...]
+    """
+    with open(path, encoding='utf-8-sig') as f:
+        text = f.read()
+    entries = []
+    if path.lower().endswith('.json'):
+        data = json.loads(text)
+        items = data.items() if isinstance(data, dict) else data
+        for item in items:
+            if isinstance(item, dict):
+                name, value = item.get('name', ''), item.get('hex') or item.get('color', '')
+            else:
+                name, value = item
+            entries.append((str(name) or value, parse_hex(value)))
+        return entries
+    lines = text.splitlines()
+    if lines and lines[0].strip() == 'GIMP Palette':
+        for line in lines[1:]:
+            parts = line.split(None, 3)
+            if len(parts) < 3 or line.startswith('#') or not all(p.isdigit() for p in parts[:3]):
+                continue
+            rgb = tuple(int(p) for p in parts[:3])
+            entries.append((parts[3].strip() if len(parts) > 3 else '#%02X%02X%02X' % rgb, rgb))
+        return entries
+    for line in lines:
+        # 名称本身可能是十六进制单词（Beaded、Facade），优先取带 # 的值，都不带 # 时取行中最后一个
+        matches = list(HEX_PATTERN.finditer(line))
+        if not matches:
+            continue
+        match = ([m for m in matches if m.group().startswith('#')] or matches)[-1]
+        name = (line[:match.start()] + line[match.end():]).strip(' \t,;|')
+        entries.append((name or '#' + match.group(1).upper(), parse_hex(match.group(1))))
+    return entries
+
+class Palette:
+    """已加载的色板集合；KD 树在 CIELAB 空间中构建，ΔE 为 CIE76（Lab 欧氏距离）"""
+    def __init__(self):
+        self.names = []
+        self.colors = []
+        self.sources = []
+        self.tree = None
+
+    def __len__(self):
+        return len(self.names)
+
+    def load(self, path):
+        """加载一个色板文件，返回新增的颜色数；索引在下次查询时重建"""
+        entries = load_palette(path)
+        source = os.path.splitext(os.path.basename(path))[0]
+        for name, rgb in entries:
+            self.names.append(name)
+            self.colors.append(rgb)
+            self.sources.append(source)
+        self.tree = None
+        return len(entries)
+
+    def build(self):
+        if self.tree is None and self.colors:
+            self.tree = KDTree(rgb_to_lab(np.array(self.colors)))
+        return self.tree
+
+    def nearest(self, rgb, k=5):
+        """
+        查找最接近的 k 个色板颜色
+        :return: [(名称, 色板名, (r, g, b), ΔE), ...]
+        """
+        if self.build() is None:
+            return []
+        return [(self.names[i], self.sources[i], self.colors[i], delta_e)
+                for delta_e, i in self.tree.query(rgb_to_lab(rgb), k)]
+
+class PixelMonitor:
+    """
+    持续监视屏幕上的一个像素或小区域
+    样本 (时间戳, r, g, b, ΔE) 存入环形缓冲区；与参考色的 ΔE 越过阈值（进入或离开）时记录事件并触发回调
+    每次采样只截取监视区域：构造时为区域尺寸 reserve 缓冲区，X11/GDI 后端每次采样都复用同一块缓冲区
+    """
+    def __init__(self, capture, region, interval=0.5, threshold=10.0, reference=None, capacity=100000):
+        """
+        :param capture: 截图后端
+        :param region: 监视区域 (left, top, 宽, 高)，截图坐标；区域大于 1 像素时取平均色
+        :param interval: 采样间隔（秒）
+        :param threshold: ΔE 阈值
+        :param reference: 参考色 (r, g, b)，默认取第一个样本
+        :param capacity: 环形缓冲区容量，超出后丢弃最早的样本
+        """
+        self.capture = capture
+        self.region = region
+        capture.reserve(region[2], region[3])
+        self.interval = interval
+        self.threshold = threshold
+        self.reference = reference
+        self.reference_lab = rgb_to_lab(reference) if reference is not None else None
+        self.samples = deque(maxlen=capacity)
+        self.events = deque(maxlen=1000)
+        self.callbacks = []
+        self.outside = None
+        self.last_rgb = None
+        self.last_delta = 0.0
+        self.capture_s = 0.0  # 累计截图耗时，用来核对后端是否真的只截了区域
+        self.started = time.perf_counter()
+        self.cpu_started = time.process_time()
+
+    def add_callback(self, callback):
+        """注册越过阈值时的回调，参数为事件字典 {time, rgb, hex, delta_e, outside}"""
+        self.callbacks.append(callback)
+
+    def sample(self):
+        """采样一次，返回 ((r, g, b), ΔE)"""
+        left, top, width, height = self.region
+        start = time.perf_counter()
+        frame = self.capture.grab(left, top, width, height)
+        self.capture_s += time.perf_counter() - start
+        rgb = frame.pixel(0, 0) if width * height == 1 else average_color(frame.array())
+        now = time.time()
+        # 颜色不变时沿用上一次的 ΔE，长时间监视静止画面几乎不做计算
+        if rgb != self.last_rgb:
+            if self.reference_lab is None:
+                self.reference = rgb
+                self.reference_lab = rgb_to_lab(rgb)
+            self.last_delta = float(np.sqrt(((rgb_to_lab(rgb) - self.reference_lab) ** 2).sum()))
+            self.last_rgb = rgb
+        self.samples.append((now, rgb[0], rgb[1], rgb[2], self.last_delta))
+        outside = self.last_delta > self.threshold
+        if outside != self.outside:
+            # 第一个样本只确定初始状态，不算越过阈值
+            if self.outside is not None:
+                event = {'time': now, 'rgb': rgb, 'hex': '#%02X%02X%02X' % rgb,
+                         'delta_e': self.last_delta, 'outside': outside}
+                self.events.append(event)
+                for callback in self.callbacks:
+                    callback(event)
+            self.outside = outside
+        return rgb, self.last_delta
+
+    def run(self, duration=None):
+        """
+        阻塞运行（命令行模式）；按绝对时间安排下一次采样，不累积漂移，落后时不补采
+        :param duration: 运行时长（秒），None 表示一直运行
+        """
+        next_time = time.perf_counter()
+        end = None if duration is None else next_time + duration
+        while end is None or next_time < end:
+            self.sample()
+            next_time += self.interval
+            delay = next_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_time = time.perf_counter()
+
+    def cpu_percent(self):
+        """开始监视以来本进程的平均 CPU 占用（%）"""
+        wall = time.perf_counter() - self.started
+        return (time.process_time() - self.cpu_started) / wall * 100 if wall > 0 else 0.0
+
+    def summary(self):
+        grab_ms = self.capture_s / len(self.samples) * 1000 if self.samples else 0.0
+        return (f"样本 {len(self.samples)} · 事件 {len(self.events)} · 截图 {grab_ms:.3f} ms/次"
+                f" · CPU {self.cpu_percent():.2f}%")
+
+    def export_csv(self, path):
+        """导出缓冲区中的全部样本，返回行数"""
+        with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.writer(f)
+            writer.writerow(['时间', '时间戳', 'R', 'G', 'B', 'HEX', 'ΔE'])
+            for ts, r, g, b, delta_e in self.samples:
+                writer.writerow([datetime.fromtimestamp(ts).isoformat(timespec='milliseconds'), f"{ts:.3f}",
+                                 r, g, b, f'#{r:02X}{g:02X}{b:02X}', f"{delta_e:.2f}"])
+        return len(self.samples)
+
+def format_monitor_event(event):
+    state = "超出阈值" if event['outside'] else "恢复"
+    stamp = datetime.fromtimestamp(event['time']).strftime('%H:%M:%S.%f')[:-3]
+    return f"[{stamp}] 监视: {event['hex']} ΔE {event['delta_e']:.1f} {state}"
+
+def print_monitor_event(event):
+    print(format_monitor_event(event))
+
+def run_monitor(spec, rate=2.0, threshold=10.0, duration=None, csv_path=None, backend='auto'):
+    """
+    命令行监视模式：不启动界面，直到时长结束或 Ctrl+C，然后导出 CSV
+    :param spec: 监视区域 "x,y" 或 "x,y,宽,高"（截图坐标）
+    """
+    values = [int(v) for v in spec.split(',')]
+    region = tuple(values) if len(values) == 4 else (values[0], values[1], 1, 1)
+    capture = create_capture_backend(backend)
+    if capture.name == 'pil':
+        print("注意：PIL 后端每次采样都截取整个屏幕，高频监视时 CPU 占用会明显升高")
+    monitor = PixelMonitor(capture, region, interval=1 / rate, threshold=threshold)
+    monitor.add_callback(print_monitor_event)
+    print(f"监视 {region}（{capture.name}），{rate} 次/秒，ΔE 阈值 {threshold}，Ctrl+C 结束")
+    try:
+        monitor.run(duration)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        capture.close()
+    print(monitor.summary())
+    if csv_path:
+        print(f"已导出 {monitor.export_csv(csv_path)} 行到 {csv_path}")
+    return monitor
 
 class ColorPickerApp:
-    def __init__(self, root):
+    def __init__(self, root, target_fps=60, show_stats=False, mag_size=150, zoom=10, capture=None,
+                 palettes=(), palette_k=5, show_timing=False):
         self.root = root
         self.root.title("高级取色器")
         self.hotkey = 'alt+c'
-        self.scale_factor = self.get_scale_factor()
+        # 截图后端（默认按平台自动选择）
+        self.capture = capture or create_capture_backend()
+        # DPI 缩放因子在第一次换算坐标时才计算（需要 pyautogui）
+        self.scale_factor = None
+        # 热键线程和托盘线程不直接操作 Tk，操作投递到队列，由 Tk 线程用 after 轮询执行
+        self.actions = queue.Queue()
+        self.closing = False
+        self.show_timing = show_timing
+        self.timings = {}
+        self.hotkey_time = None
         self.picking = False
         self.tray_icon = None
         self.magnifier_photo = None
+        # 取色采样：模式、N×N 的边长、拖选起点
+        self.sample_mode = 'point'
+        self.sample_size = 5
+        self.drag_start = None
+        self.configure_magnifier(mag_size, zoom)
+        # 色板：取色后显示最接近的 palette_k 个色板颜色
+        self.palette = Palette()
+        self.palette_k = palette_k
+        # 监视模式：区域为最近一次取色的位置
+        self.last_pick_region = None
+        self.monitor = None
+        self.monitor_job = None
+        # 最近一次放大镜截图：((屏幕 x, 屏幕 y), 图像)，取色时直接读取其中心像素
+        self.last_capture = None
+        # 放大镜渲染循环：<Motion> 只记录时间，按目标帧率渲染最新的光标位置
+        self.target_fps = target_fps
+        self.show_stats = show_stats
+        self.pending_motion = None
+        self.last_rendered_pos = None
+        self.render_job = None
+        self.render_stats = RenderStats()
+        self.last_hex = None
 
         # 初始化并隐藏主窗口
         self.setup_ui()
         self.root.withdraw()
+        self.load_palettes(palettes)
 
         # 设置窗口图标
         try:
@@ -32,18 +1044,52 @@ class ColorPickerApp:
         self.setup_tray_icon()
         self.register_hotkey()
         self.root.protocol("WM_DELETE_WINDOW", self.hide_window)
+        self.poll_actions()
+
+    def configure_magnifier(self, size, zoom):
+        """
+        设置放大镜大小和放大倍数，并预先生成每帧复用的对象
+        :param size: 放大镜边长（像素），会调整为放大倍数的奇数倍，十字线正好落在中心像素上
+        :param zoom: 放大倍数
+        """
+        self.zoom_factor = max(1, int(zoom))
+        region = max(1, int(size) // self.zoom_factor)
+        if region % 2 == 0:
+            region += 1
+        self.mag_region = region  # 截取区域边长（屏幕像素）
+        self.mag_win_size = region * self.zoom_factor
+        # 放大镜每帧都截同一尺寸，让截图后端为它保留缓冲区
+        self.capture.reserve(region, region)
+        self.build_crosshair()
+        # 放大镜使用的 PhotoImage 在下次取色时按新尺寸重新创建
+        self.magnifier_photo = None
+
+    def build_crosshair(self):
+        """十字线（区域采样时加上采样框）：一张纯红图像 + 遮罩，每帧用一次 paste 合成"""
+        self.crosshair_color = Image.new('RGB', (self.mag_win_size, self.mag_win_size), (255, 0, 0))
+        self.crosshair_mask = Image.new('L', (self.mag_win_size, self.mag_win_size), 0)
+        draw = ImageDraw.Draw(self.crosshair_mask)
+        c = self.mag_win_size // 2
+        draw.line([(c, 0), (c, self.mag_win_size - 1)], fill=255)
+        draw.line([(0, c), (self.mag_win_size - 1, c)], fill=255)
+        if self.sample_mode != 'point' and 1 < self.sample_size <= self.mag_region:
+            start = (self.mag_region - self.sample_size) // 2 * self.zoom_factor
+            end = start + self.sample_size * self.zoom_factor - 1
+            draw.rectangle([start, start, end, end], outline=255)
 
     def get_scale_factor(self):
-        """获取 DPI 缩放因子"""
+        """
+        获取鼠标坐标到截图坐标的缩放因子
+        用截图后端与 pyautogui 报告的屏幕宽度之比计算，不依赖具体平台的 DPI 接口
+        """
+        if sys.platform == 'win32':
+            try:
+                ctypes.windll.shcore.SetProcessDpiAwareness(1)
+            except (AttributeError, OSError):
+                pass
         try:
-            ctypes.windll.shcore.SetProcessDpiAwareness(1)
-            user32 = ctypes.windll.user32
-            gdi32 = ctypes.windll.gdi32
-            dc = user32.GetDC(0)
-            dpi = gdi32.GetDeviceCaps(dc, 88)
-            user32.ReleaseDC(0, dc)
-            return dpi / 96.0
-        except:
+            return self.capture.screen_size()[0] / pyautogui.size()[0]
+        except Exception:
             return 1.0
 
     def setup_ui(self):
@@ -78,33 +1124,198 @@ class ColorPickerApp:
         self.rgb_entry = ttk.Entry(color_info_frame, width=20, font=('Arial', 10))
         self.rgb_entry.pack(pady=2, fill=tk.X)
 
-        self.root.minsize(280, 180)
+        # 采样模式：单点 / N×N 平均 / 中值 / 主色；取色时拖动鼠标则对拖选的矩形采样
+        sample_frame = ttk.Frame(main_frame)
+        sample_frame.grid(row=2, column=0, columnspan=2, pady=5, sticky=tk.EW)
+        ttk.Label(sample_frame, text="采样:").pack(side=tk.LEFT)
+        self.mode_combo = ttk.Combobox(sample_frame, values=list(SAMPLE_MODES), width=6, state='readonly')
+        self.mode_combo.set('单点')
+        self.mode_combo.bind('<<ComboboxSelected>>', self.update_sampling)
+        self.mode_combo.pack(side=tk.LEFT, padx=2)
+        ttk.Label(sample_frame, text="N:").pack(side=tk.LEFT)
+        self.size_spin = tk.Spinbox(sample_frame, from_=1, to=51, increment=2, width=4, command=self.update_sampling)
+        self.size_spin.delete(0, tk.END)
+        self.size_spin.insert(0, str(self.sample_size))
+        self.size_spin.bind('<Return>', self.update_sampling)
+        self.size_spin.pack(side=tk.LEFT, padx=2)
+
+        # 采样结果：说明文字 + 主色色块
+        result_frame = ttk.Frame(main_frame)
+        result_frame.grid(row=3, column=0, columnspan=2, sticky=tk.EW)
+        self.swatch_canvases = []
+        for _ in range(3):
+            canvas = tk.Canvas(result_frame, width=18, height=18, highlightthickness=1, bg='white')
+            canvas.pack(side=tk.LEFT, padx=1)
+            self.swatch_canvases.append(canvas)
+        self.sample_label = ttk.Label(result_frame, font=('Arial', 8))
+        self.sample_label.pack(side=tk.LEFT, padx=4)
+
+        # 色板匹配：最接近的色板颜色及 ΔE
+        palette_frame = ttk.Frame(main_frame)
+        palette_frame.grid(row=4, column=0, columnspan=2, pady=5, sticky=tk.EW)
+        palette_bar = ttk.Frame(palette_frame)
+        palette_bar.pack(fill=tk.X)
+        ttk.Button(palette_bar, text="加载色板", command=self.choose_palettes).pack(side=tk.LEFT)
+        self.palette_label = ttk.Label(palette_bar, text="未加载色板", font=('Arial', 8))
+        self.palette_label.pack(side=tk.LEFT, padx=4)
+        self.match_rows = []
+        for _ in range(self.palette_k):
+            row = ttk.Frame(palette_frame)
+            row.pack(fill=tk.X)
+            canvas = tk.Canvas(row, width=14, height=14, highlightthickness=1, bg='white')
+            canvas.pack(side=tk.LEFT, padx=1)
+            label = ttk.Label(row, font=('Arial', 8))
+            label.pack(side=tk.LEFT, padx=4)
+            self.match_rows.append((canvas, label))
+
+        # 监视模式
+        monitor_frame = ttk.Frame(main_frame)
+        monitor_frame.grid(row=5, column=0, columnspan=2, pady=5, sticky=tk.EW)
+        monitor_bar = ttk.Frame(monitor_frame)
+        monitor_bar.pack(fill=tk.X)
+        self.monitor_button = ttk.Button(monitor_bar, text="监视", width=5, command=self.toggle_monitor)
+        self.monitor_button.pack(side=tk.LEFT)
+        ttk.Label(monitor_bar, text="次/秒").pack(side=tk.LEFT)
+        self.rate_spin = tk.Spinbox(monitor_bar, from_=0.1, to=60, increment=0.5, width=4)
+        self.rate_spin.delete(0, tk.END)
+        self.rate_spin.insert(0, "2")
+        self.rate_spin.pack(side=tk.LEFT, padx=2)
+        ttk.Label(monitor_bar, text="ΔE").pack(side=tk.LEFT)
+        self.threshold_entry = ttk.Entry(monitor_bar, width=4)
+        self.threshold_entry.insert(0, "10")
+        self.threshold_entry.pack(side=tk.LEFT, padx=2)
+        ttk.Button(monitor_bar, text="导出", width=5, command=self.export_monitor).pack(side=tk.LEFT)
+        self.monitor_label = ttk.Label(monitor_frame, text="监视最近一次取色的位置", font=('Arial', 8))
+        self.monitor_label.pack(fill=tk.X)
+        self.monitor_event_label = ttk.Label(monitor_frame, text="", font=('Arial', 8))
+        self.monitor_event_label.pack(fill=tk.X)
+
+        self.root.minsize(280, 240)
         self.root.resizable(False, False)
 
+    def load_palettes(self, paths):
+        """加载色板文件；KD 树在空闲时构建，第一次取色时不必等待"""
+        errors = []
+        for path in paths:
+            try:
+                self.palette.load(path)
+            except (OSError, ValueError, TypeError, KeyError) as e:
+                errors.append(f"{path}: {e}")
+        if errors:
+            messagebox.showerror("错误", "色板加载失败:\n" + "\n".join(errors))
+        if len(self.palette):
+            self.palette_label.config(text=f"色板 {len(self.palette)} 色")
+            self.root.after_idle(self.palette.build)
+
+    def choose_palettes(self):
+        paths = filedialog.askopenfilenames(
+            title="选择色板文件",
+            filetypes=[("色板文件", "*.gpl *.json *.csv *.txt"), ("所有文件", "*.*")])
+        if paths:
+            self.load_palettes(paths)
+            hx = self.hex_entry.get().strip()
+            if HEX_PATTERN.fullmatch(hx):
+                self.update_palette_matches(parse_hex(hx))
+
+    def update_palette_matches(self, rgb):
+        """显示最接近的色板颜色：名称、色板、十六进制值和 ΔE"""
+        if not len(self.palette):
+            return
+        start = time.perf_counter()
+        matches = self.palette.nearest(rgb, self.palette_k)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        for i, (canvas, label) in enumerate(self.match_rows):
+            if i < len(matches):
+                name, source, (r, g, b), delta_e = matches[i]
+                hx = f'#{r:02X}{g:02X}{b:02X}'
+                canvas.config(bg=hx)
+                label.config(text=f"{name} ({source}) {hx} ΔE {delta_e:.1f}")
+            else:
+                canvas.config(bg='white')
+                label.config(text="")
+        self.palette_label.config(text=f"色板 {len(self.palette)} 色 · 查询 {elapsed_ms:.2f}ms")
+
     def generate_icon_image(self):
         img = Image.new('RGB', (64, 64), (0, 122, 204))
         return img
 
+    def post(self, func, *args):
+        """从任意线程投递一个操作，由 Tk 线程的轮询执行；这里不调用任何 Tk 方法"""
+        self.actions.put((func, args))
+
+    def drain_actions(self, event=None):
+        """执行队列中的全部操作；单个操作出错只记录，不影响后续操作"""
+        while True:
+            try:
+                func, args = self.actions.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                func(*args)
+            except Exception as e:
+                print(f"执行 {getattr(func, '__name__', func)} 出错: {e}")
+                traceback.print_exc()
+
+    def poll_actions(self):
+        """轮询操作队列，无论本次是否出错都安排下一次；窗口关闭后停止"""
+        try:
+            self.drain_actions()
+        finally:
+            if not self.closing:
+                try:
+                    self.root.after(ACTION_POLL_MS, self.poll_actions)
+                except tk.TclError:
+                    # 窗口已销毁
+                    pass
+
+    def report_timing(self, name, elapsed_ms, budget_ms):
+        """记录一项耗时；开启 --timing 时打印，并标出超出预算的项"""
+        self.timings[name] = elapsed_ms
+        if self.show_timing:
+            verdict = "超出预算" if elapsed_ms > budget_ms else "预算内"
+            print(f"{name}: {elapsed_ms:.1f} ms（预算 {budget_ms} ms，{verdict}）")
+
     def setup_tray_icon(self):
+        """托盘图标在后台线程中创建，pystray 也在那里导入，不拖慢主窗口启动"""
+        threading.Thread(target=self.run_tray, daemon=True).start()
+
+    def run_tray(self):
         menu = (
-            pystray.MenuItem("显示窗口", lambda icon, item: self.show_window()),
-            pystray.MenuItem("退出", lambda icon, item: self.on_close())
+            pystray.MenuItem("显示窗口", lambda icon, item: self.post(self.show_window)),
+            pystray.MenuItem("退出", lambda icon, item: self.post(self.on_close))
         )
         icon_image = self.generate_icon_image()
         self.tray_icon = pystray.Icon("color_picker", icon_image, "取色器", menu)
-        threading.Thread(target=self.tray_icon.run, daemon=True).start()
+        self.tray_icon.run(setup=self.on_tray_ready)
+
+    def on_tray_ready(self, icon):
+        icon.visible = True
+        self.post(self.report_timing, "启动到托盘", (time.perf_counter() - STARTED) * 1000, TRAY_BUDGET_MS)
+        # 托盘就绪后在后台预先导入 pyautogui 和 numpy，再回到 Tk 线程算好缩放因子，第一次按热键时不必等待
+        pyautogui.resolve()
+        np.resolve()
+        self.post(self.prepare_pick)
+
+    def prepare_pick(self):
+        """预先计算 DPI 缩放因子（PIL 后端需要截一次全屏）"""
+        if self.scale_factor is None:
+            self.scale_factor = self.get_scale_factor()
 
     def show_window(self):
-        self.root.after(0, self.root.deiconify)
+        self.root.deiconify()
         self.root.attributes('-topmost', 1)
         self.root.attributes('-topmost', 0)
 
     def hide_window(self):
         self.root.withdraw()
 
+    def on_hotkey(self):
+        """在 keyboard 的线程中调用：只记录时间并投递，不碰 Tk"""
+        self.post(self.pick_color, time.perf_counter())
+
     def register_hotkey(self):
         try:
-            keyboard.add_hotkey(self.hotkey, self.pick_color)
+            keyboard.add_hotkey(self.hotkey, self.on_hotkey)
         except Exception as e:
             messagebox.showerror("错误", f"快捷键注册失败: {e}")
 
@@ -114,16 +1325,20 @@ class ColorPickerApp:
             return
         try:
             keyboard.remove_hotkey(self.hotkey)
-            keyboard.add_hotkey(new, self.pick_color)
+            keyboard.add_hotkey(new, self.on_hotkey)
             self.hotkey = new
         except Exception as e:
             messagebox.showerror("错误", f"设置热键失败: {e}")
 
-    def pick_color(self):
-        """启动取色交互：隐藏主窗口，全屏预览+放大镜"""
+    def pick_color(self, hotkey_time=None):
+        """
+        启动取色交互：隐藏主窗口，全屏预览+放大镜
+        :param hotkey_time: 热键按下的时间，用于统计热键到取色窗口显示的延迟
+        """
         if self.picking:
             return
         self.picking = True
+        self.hotkey_time = hotkey_time
         self.root.withdraw()
 
         # 全屏透明捕捉窗
@@ -132,63 +1347,268 @@ class ColorPickerApp:
         self.preview_window.attributes('-fullscreen', True)
         self.preview_window.attributes('-topmost', True)
         self.preview_window.config(cursor='crosshair')
-        self.preview_window.bind('<Motion>', self.live_preview)
-        self.preview_window.bind('<Button-1>', self.select_color)
+        self.preview_window.bind('<Motion>', self.on_motion)
+        self.preview_window.bind('<ButtonPress-1>', self.start_drag)
+        self.preview_window.bind('<ButtonRelease-1>', self.select_color)
         self.preview_window.bind('<Escape>', self.cancel_pick)
+        self.preview_window.bind('<Map>', self.on_overlay_shown)
 
         # 放大镜
         self.mag_window = tk.Toplevel(self.root)
         self.mag_window.overrideredirect(True)
         self.mag_window.attributes('-topmost', True)
-        self.mag_win_size = 150
-        self.zoom_factor = 10  # 放大倍数
-        self.mag_label = tk.Label(self.mag_window)
+        # 放大镜图像只创建一次，之后每帧用 paste 更新内容
+        if self.magnifier_photo is None:
+            self.magnifier_photo = ImageTk.PhotoImage('RGB', (self.mag_win_size, self.mag_win_size))
+        self.mag_label = tk.Label(self.mag_window, image=self.magnifier_photo, borderwidth=0)
         self.mag_label.pack()
+        self.drag_label = tk.Label(self.mag_window, font=('Arial', 8), anchor=tk.W)
+        self.drag_label.pack(fill=tk.X)
+        self.stats_label = None
+        if self.show_stats:
+            self.stats_label = tk.Label(self.mag_window, font=('Arial', 8), anchor=tk.W)
+            self.stats_label.pack(fill=tk.X)
 
-    def live_preview(self, event=None):
-        x, y = pyautogui.position()
-        # 更新放大镜
-        half = int(self.mag_win_size / self.zoom_factor / 2)
-        left = x - half
-        top = y - half
-        right = x + half
-        bottom = y + half
-        img = ImageGrab.grab(bbox=(left, top, right, bottom))
-        img = img.resize((self.mag_win_size, self.mag_win_size), Image.NEAREST)
-        # 画十字
-        draw = img.copy()
-        pixels = draw.load()
-        cx, cy = self.mag_win_size // 2, self.mag_win_size // 2
-        for i in range(self.mag_win_size):
-            pixels[cx, i] = (255, 0, 0)
-            pixels[i, cy] = (255, 0, 0)
-        self.magnifier_photo = ImageTk.PhotoImage(draw)
-        self.mag_label.config(image=self.magnifier_photo)
-        # 放大镜跟随鼠标
-        self.mag_window.geometry(f"{self.mag_win_size}x{self.mag_win_size}+{x+20}+{y+20}")
-
-        # 更新实时色块显示
-        r, g, b = self.get_pixel(x, y)
+        # 启动渲染循环（立即渲染第一帧）
+        self.drag_start = None
+        self.drag_label.config(text=self.sampling_text())
+        self.last_hex = None
+        self.pending_motion = time.perf_counter()
+        self.last_rendered_pos = None
+        self.render_stats = RenderStats()
+        self.render_loop()
+
+    def on_overlay_shown(self, event=None):
+        if self.hotkey_time is not None:
+            elapsed_ms = (time.perf_counter() - self.hotkey_time) * 1000
+            self.hotkey_time = None
+            self.report_timing("热键到取色窗口", elapsed_ms, OVERLAY_BUDGET_MS)
+
+    def on_motion(self, event=None):
+        """只记录最近一次移动的时间，多余的事件在下一帧之前自然合并"""
+        if self.pending_motion is None:
+            self.pending_motion = time.perf_counter()
+        self.render_stats.record_event()
+
+    def render_loop(self):
+        """按目标帧率渲染；没有新的移动或光标位置未变时跳过这一帧"""
+        if not self.picking:
+            return
+        frame_start = time.perf_counter()
+        if self.pending_motion is not None:
+            event_time, self.pending_motion = self.pending_motion, None
+            x, y = pyautogui.position()
+            if (x, y) != self.last_rendered_pos:
+                self.live_preview(x, y)
+                self.last_rendered_pos = (x, y)
+                self.render_stats.record_frame(event_time, time.perf_counter())
+                if self.stats_label is not None:
+                    self.stats_label.config(text=self.render_stats.summary())
+            else:
+                self.render_stats.skipped += 1
+        # 扣除本帧耗时，尽量保持目标帧率
+        elapsed_ms = (time.perf_counter() - frame_start) * 1000
+        delay = max(1, int(1000 / self.target_fps - elapsed_ms))
+        self.render_job = self.root.after(delay, self.render_loop)
+
+    def to_screen(self, x, y):
+        """鼠标坐标换算为截图坐标（按 DPI 缩放）"""
+        if self.scale_factor is None:
+            self.scale_factor = self.get_scale_factor()
+        return int(x * self.scale_factor), int(y * self.scale_factor)
+
+    def capture_region(self, x, y):
+        """截取以 (x, y) 为中心的小区域，放大镜和取色共用这一次截图"""
+        sx, sy = self.to_screen(x, y)
+        half = self.mag_region // 2
+        frame = self.capture.grab(sx - half, sy - half, self.mag_region, self.mag_region)
+        self.last_capture = ((sx, sy), frame)
+        return frame
+
+    def live_preview(self, x, y):
+        """渲染一帧：放大镜和实时色块"""
+        # 更新放大镜：一次最近邻放大，一次 paste 合成十字线，再写入复用的 PhotoImage
+        img = self.capture_region(x, y).image()
+        frame = img.resize((self.mag_win_size, self.mag_win_size), Image.NEAREST)
+        frame.paste(self.crosshair_color, (0, 0), self.crosshair_mask)
+        self.magnifier_photo.paste(frame)
+        # 放大镜跟随鼠标（只改位置，窗口大小随内容）
+        self.mag_window.geometry(f"+{x+20}+{y+20}")
+
+        # 更新实时色块显示（按当前采样模式，颜色不变时不重写控件）
+        if self.drag_start is not None:
+            self.drag_label.config(text=self.sampling_text(self.drag_rect(x, y)))
+            return
+        (r, g, b), _ = self.sample_color(x, y)
         hx = f'#{r:02X}{g:02X}{b:02X}'
-        self.color_canvas.config(bg=hx)
-        self.hex_entry.delete(0, tk.END)
-        self.hex_entry.insert(0, hx)
-        self.rgb_entry.delete(0, tk.END)
-        self.rgb_entry.insert(0, f"RGB: {r} {g} {b}")
+        if hx != self.last_hex:
+            self.last_hex = hx
+            self.update_color_displays(r, g, b, hx)
 
     def get_pixel(self, x, y):
-        sx, sy = int(x * self.scale_factor), int(y * self.scale_factor)
-        return ImageGrab.grab().load()[sx, sy]
+        """优先读取最近一次放大镜截图的中心像素；光标已移动时只截取 1x1 区域"""
+        sx, sy = self.to_screen(x, y)
+        if self.last_capture is not None and self.last_capture[0] == (sx, sy) and self.last_capture[1].valid:
+            frame = self.last_capture[1]
+            return frame.pixel(sx - frame.left, sy - frame.top)
+        return self.capture.grab(sx, sy, 1, 1).pixel(0, 0)
+
+    def update_sampling(self, event=None):
+        """读取界面上的采样模式和 N（取奇数），并更新放大镜上的采样框"""
+        self.sample_mode = SAMPLE_MODES.get(self.mode_combo.get(), 'point')
+        try:
+            size = int(self.size_spin.get())
+        except ValueError:
+            size = self.sample_size
+        size = max(1, min(51, size))
+        if size % 2 == 0:
+            size += 1
+        self.sample_size = size
+        self.build_crosshair()
+
+    def sampling_text(self, rect=None):
+        """当前采样方式的说明，显示在放大镜下方"""
+        if rect is not None:
+            return f"拖选 {rect[2] - rect[0]}x{rect[3] - rect[1]}"
+        if self.sample_mode == 'point':
+            return "单点"
+        name = next(k for k, v in SAMPLE_MODES.items() if v == self.sample_mode)
+        return f"{name} {self.sample_size}x{self.sample_size}"
+
+    def start_drag(self, event=None):
+        self.drag_start = self.to_screen(*pyautogui.position())
+
+    def drag_rect(self, x, y):
+        """
+        拖选的矩形 (left, top, right, bottom)，截图坐标，右下不含
+        移动不足 3 像素视为单击，返回 None
+        """
+        if self.drag_start is None:
+            return None
+        (x0, y0), (x1, y1) = self.drag_start, self.to_screen(x, y)
+        if abs(x1 - x0) < 3 and abs(y1 - y0) < 3:
+            return None
+        return min(x0, x1), min(y0, y1), max(x0, x1) + 1, max(y0, y1) + 1
+
+    def sample_pixels(self, x, y, rect=None):
+        """
+        取得采样区域的像素数组 (高, 宽, 3)
+        N×N 不超过放大镜区域时直接切片最近一次放大镜截图，否则单独截取
+        """
+        if rect is not None:
+            left, top, right, bottom = rect
+            return self.capture.grab(left, top, right - left, bottom - top).array()
+        sx, sy = self.to_screen(x, y)
+        half = self.sample_size // 2
+        if (self.last_capture is not None and self.last_capture[0] == (sx, sy)
+                and self.last_capture[1].valid and self.sample_size <= self.mag_region):
+            frame = self.last_capture[1]
+            cx, cy = sx - frame.left, sy - frame.top
+            return frame.array()[max(0, cy - half):cy + half + 1, max(0, cx - half):cx + half + 1]
+        return self.capture.grab(sx - half, sy - half, self.sample_size, self.sample_size).array()
+
+    def sample_color(self, x, y, rect=None):
+        """
+        按当前采样模式取色
+        :param rect: 拖选的矩形；为 None 时单点或以光标为中心的 N×N 区域
+        :return: ((r, g, b), 主色列表)；主色模式下主色列表为 [((r, g, b), 占比), ...]
+        """
+        if self.sample_mode == 'point' and rect is None:
+            return self.get_pixel(x, y), []
+        pixels = self.sample_pixels(x, y, rect)
+        if self.sample_mode == 'median':
+            return median_color(pixels), []
+        if self.sample_mode == 'dominant':
+            colors = dominant_colors(pixels)
+            return colors[0][0], colors
+        # 单点模式下拖选矩形时也取平均色
+        return average_color(pixels), []
 
     def select_color(self, event=None):
         x, y = pyautogui.position()
-        r, g, b = self.get_pixel(x, y)
+        rect = self.drag_rect(x, y)
+        start = time.perf_counter()
+        (r, g, b), colors = self.sample_color(x, y, rect)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.last_pick_region = self.pick_region(x, y, rect)
         hx = f'#{r:02X}{g:02X}{b:02X}'
         self.update_color_displays(r, g, b, hx)
+        self.update_sample_result(self.sampling_text(rect), colors, elapsed_ms)
+        self.update_palette_matches((r, g, b))
         self.finish_pick()
         self.root.clipboard_clear()
         self.root.clipboard_append(hx)
 
+    def pick_region(self, x, y, rect=None):
+        """取色对应的屏幕区域 (left, top, 宽, 高)：拖选矩形、N×N 或单个像素"""
+        if rect is not None:
+            return rect[0], rect[1], rect[2] - rect[0], rect[3] - rect[1]
+        sx, sy = self.to_screen(x, y)
+        if self.sample_mode == 'point':
+            return sx, sy, 1, 1
+        half = self.sample_size // 2
+        return sx - half, sy - half, self.sample_size, self.sample_size
+
+    def toggle_monitor(self):
+        """开始/停止监视最近一次取色的区域"""
+        if self.monitor_job is not None:
+            self.stop_monitor()
+            return
+        if self.last_pick_region is None:
+            messagebox.showinfo("提示", "请先取色，监视的是最近一次取色的位置")
+            return
+        try:
+            rate = float(self.rate_spin.get())
+            threshold = float(self.threshold_entry.get())
+        except ValueError:
+            messagebox.showerror("错误", "采样频率和 ΔE 阈值必须是数字")
+            return
+        self.monitor = PixelMonitor(self.capture, self.last_pick_region,
+                                    interval=1 / max(0.1, rate), threshold=threshold)
+        self.monitor.add_callback(self.on_monitor_event)
+        self.monitor_button.config(text="停止")
+        self.monitor_tick()
+
+    def monitor_tick(self):
+        """在 Tk 循环中采样一次，扣除本次耗时后安排下一次"""
+        start = time.perf_counter()
+        try:
+            (r, g, b), delta_e = self.monitor.sample()
+        except Exception as e:
+            # 截图失败（如显示器断开）时停止监视，不再反复报错
+            print(f"监视采样出错: {e}")
+            traceback.print_exc()
+            self.stop_monitor()
+            self.monitor_label.config(text=f"监视已停止: {e}")
+            return
+        self.monitor_label.config(text=f"#{r:02X}{g:02X}{b:02X} ΔE {delta_e:.1f} · {self.monitor.summary()}")
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        delay = max(1, int(self.monitor.interval * 1000 - elapsed_ms))
+        self.monitor_job = self.root.after(delay, self.monitor_tick)
+
+    def stop_monitor(self):
+        if self.monitor_job is not None:
+            self.root.after_cancel(self.monitor_job)
+            self.monitor_job = None
+        self.monitor_button.config(text="监视")
+
+    def on_monitor_event(self, event):
+        print_monitor_event(event)
+        self.monitor_event_label.config(text=format_monitor_event(event),
+                                        foreground='red' if event['outside'] else 'green')
+        if event['outside']:
+            self.root.bell()
+
+    def export_monitor(self):
+        if self.monitor is None or not self.monitor.samples:
+            messagebox.showinfo("提示", "还没有监视数据")
+            return
+        path = filedialog.asksaveasfilename(title="导出监视数据", defaultextension=".csv",
+                                            filetypes=[("CSV 文件", "*.csv")])
+        if path:
+            rows = self.monitor.export_csv(path)
+            messagebox.showinfo("完成", f"已导出 {rows} 行")
+
     def update_color_displays(self, r, g, b, hx):
         self.color_canvas.config(bg=hx)
         self.hex_entry.delete(0, tk.END)
@@ -196,11 +1616,28 @@ class ColorPickerApp:
         self.rgb_entry.delete(0, tk.END)
         self.rgb_entry.insert(0, f"RGB: {r} {g} {b}")
 
+    def update_sample_result(self, text, colors, elapsed_ms):
+        """在主界面显示采样说明、耗时和主色色块"""
+        for i, canvas in enumerate(self.swatch_canvases):
+            if i < len(colors):
+                (r, g, b), _ = colors[i]
+                canvas.config(bg=f'#{r:02X}{g:02X}{b:02X}')
+            else:
+                canvas.config(bg='white')
+        parts = [text] + [f"{share:.0%}" for _, share in colors] + [f"· {elapsed_ms:.1f}ms"]
+        self.sample_label.config(text=" ".join(parts))
+
     def cancel_pick(self, event=None):
         self.finish_pick()
 
     def finish_pick(self):
         self.picking = False
+        self.drag_start = None
+        if self.render_job is not None:
+            self.root.after_cancel(self.render_job)
+            self.render_job = None
+        if self.show_stats:
+            print(f"放大镜: {self.render_stats.summary()}")
         if hasattr(self, 'preview_window'):
             self.preview_window.destroy()
         if hasattr(self, 'mag_window'):
@@ -208,15 +1645,91 @@ class ColorPickerApp:
         # 取色完成后主界面保持隐藏，除非手动打开
 
     def on_close(self):
+        # 先置标志，操作轮询不再在已销毁的窗口上安排下一次
+        self.closing = True
+        self.stop_monitor()
         try:
             self.tray_icon.stop()
         except:
             pass
         keyboard.remove_all_hotkeys()
+        self.capture.close()
         self.root.destroy()
         sys.exit(0)
 
+def benchmark_capture(rounds=50, half=7, backends=('pil', 'x11', 'win32')):
+    """
+    截图微基准：先测整个桌面截图（PIL 的 bbox 截图实际付出的代价），再对比各截图后端的放大镜区域截图
+    “读像素”只从缓冲区取中心像素（取色路径），“转图像”再解码成 PIL 图像（放大镜路径）
+    :param rounds: 每项测试的重复次数
+    :param half: 区域半径，区域边长为 2 * half + 1
+    :param backends: 要测试的后端名称
+    """
+    size = 2 * half + 1
+
+    def measure(capture):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            capture()
+        return (time.perf_counter() - start) / rounds
+
+    print(f"区域 {size}x{size}，每项 {rounds} 次")
+    try:
+        # Windows 上测所有显示器组成的虚拟桌面
+        full = (lambda: ImageGrab.grab(all_screens=True)) if sys.platform == 'win32' else ImageGrab.grab
+        width, height = full().size
+        full_s = measure(full)
+        print(f"{'全桌面':8s} 屏幕 {width}x{height} · 每次事件 {full_s * 1000:.3f} ms（{1 / full_s:.0f} 次/秒）")
+    except Exception as e:
+        print(f"{'全桌面':8s} 不可用: {e}")
+    for name in backends:
+        try:
+            backend = create_capture_backend(name)
+        except Exception as e:
+            print(f"{name:8s} 不可用: {e}")
+            continue
+        try:
+            backend.reserve(size, size)
+            width, height = backend.screen_size()
+            left, top = width // 2 - half, height // 2 - half
+            pixel_s = measure(lambda: backend.grab(left, top, size, size).pixel(half, half))
+            image_s = measure(lambda: backend.grab(left, top, size, size).image())
+        finally:
+            backend.close()
+        print(f"{backend.name:8s} 屏幕 {width}x{height} · 每次事件：读像素 {pixel_s * 1000:.3f} ms"
+              f"（{1 / pixel_s:.0f} 次/秒） · 转图像 {image_s * 1000:.3f} ms（{1 / image_s:.0f} 次/秒）")
+
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="高级取色器")
+    parser.add_argument('--bench-capture', action='store_true', help="运行截图微基准后退出")
+    parser.add_argument('--rounds', type=int, default=50, help="微基准的重复次数")
+    parser.add_argument('--fps', type=int, default=60, help="放大镜目标帧率")
+    parser.add_argument('--stats', action='store_true', help="在放大镜下方显示帧率/延迟统计")
+    parser.add_argument('--mag-size', type=int, default=150, help="放大镜边长（像素）")
+    parser.add_argument('--zoom', type=int, default=10, help="放大倍数")
+    parser.add_argument('--palette', action='append', default=[], help="色板文件（.gpl/.json/.csv/.txt），可多次指定")
+    parser.add_argument('--matches', type=int, default=5, help="显示最接近的色板颜色数")
+    parser.add_argument('--monitor', metavar='X,Y[,W,H]', help="不启动界面，持续监视该像素/区域")
+    parser.add_argument('--rate', type=float, default=2.0, help="监视采样频率（次/秒）")
+    parser.add_argument('--threshold', type=float, default=10.0, help="监视的 ΔE 阈值")
+    parser.add_argument('--duration', type=float, help="监视时长（秒），默认直到 Ctrl+C")
+    parser.add_argument('--csv', help="监视结束后导出 CSV 的路径")
+    parser.add_argument('--timing', action='store_true', help="打印启动到托盘、热键到取色窗口的耗时及预算")
+    parser.add_argument('--backend', choices=['auto'] + list(CAPTURE_BACKENDS), default='auto',
+                        help="截图后端；微基准下 auto 表示测试全部后端")
+    args = parser.parse_args()
+    if args.bench_capture:
+        backends = list(CAPTURE_BACKENDS) if args.backend == 'auto' else [args.backend]
+        benchmark_capture(args.rounds, backends=backends)
+        sys.exit(0)
+    if args.monitor:
+        run_monitor(args.monitor, rate=max(0.1, args.rate), threshold=args.threshold,
+                    duration=args.duration, csv_path=args.csv, backend=args.backend)
+        sys.exit(0)
+
     root = tk.Tk()
-    app = ColorPickerApp(root)
+    app = ColorPickerApp(root, target_fps=max(1, args.fps), show_stats=args.stats,
+                         mag_size=args.mag_size, zoom=args.zoom,
+                         capture=create_capture_backend(args.backend),
+                         palettes=args.palette, palette_k=max(1, args.matches), show_timing=args.timing)
     root.mainloop()
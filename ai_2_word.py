@@ -1,27 +1,52 @@
 import os
-import tkinter as tk
-from tkinter import ttk, filedialog, messagebox, scrolledtext
+import sys
 import csv
-import comtypes.client
+import json
+import time
+import hashlib
+import sqlite3
+import argparse
+import re
+import queue
+import threading
+from collections import Counter
+from xml.sax.saxutils import escape, quoteattr
+import xml.etree.ElementTree as ET
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# 界面模块在启动界面时由 import_gui 导入，comtypes 在调用 Illustrator 时才导入，
+# 命令行检索（search）不需要 tkinter 和 comtypes
+tk = ttk = filedialog = messagebox = scrolledtext = None
+
+def import_gui():
+    global tk, ttk, filedialog, messagebox, scrolledtext
+    import tkinter as tk
+    from tkinter import ttk, filedialog, messagebox, scrolledtext
 
 # --------------------------
 # AI 文件处理核心逻辑
 # --------------------------
-def extract_text_from_ai(ai_file, merge_segments=False, merge_threshold=50):
+def extract_segments_from_ai(ai_file, merge_segments=False, merge_threshold=50, show_message=True,
+                             index_db=None, raise_errors=False):
     """
-    从 AI 文件中提取所有文本
+    从 AI 文件中提取所有句段（带文本框序号和坐标）
     :param ai_file: AI 文件路径
     :param merge_segments: 是否合并相邻句段
     :param merge_threshold: 合并的最大垂直距离阈值
-    :return: 文本列表
+    :param show_message: 出错时是否弹窗提示（监控模式下关闭，避免阻塞）
+    :param index_db: 全文索引数据库路径，提供时同步更新该文件的索引
+    :param raise_errors: 提取失败时抛出异常，而不是返回空列表（调用方需要区分失败和空文件时使用）
+    :return: 句段列表 [{'key': 文本框序号（合并时以 + 连接）, 'text', 'x', 'y'}]
     """
     try:
+        import comtypes.client
         ai = comtypes.client.CreateObject("Illustrator.Application")
         doc = ai.Open(ai_file)
         text_frames = []
         
         # 收集所有文本框及其位置
-        for text_frame in doc.TextFrames:
+        for frame_index, text_frame in enumerate(doc.TextFrames):
             content = text_frame.Contents
             position = text_frame.Position
             # 获取文本框的边界框
@@ -34,6 +59,7 @@ def extract_text_from_ai(ai_file, merge_segments=False, merge_threshold=50):
                 height = 20
                 
             text_frames.append({
+                'index': frame_index,
                 'content': content,
                 'x': position[0],
                 'y': position[1],
@@ -42,22 +68,43 @@ def extract_text_from_ai(ai_file, merge_segments=False, merge_threshold=50):
         
         doc.Close()
         
+        # 更新全文索引（按原始文本框索引，保留坐标）
+        if index_db:
+            try:
+                update_text_index(index_db, ai_file, text_frames)
+            except sqlite3.Error as e:
+                if show_message:
+                    messagebox.showwarning("警告", f"更新全文索引失败: {str(e)}")
+        
         # 如果需要合并句段
         if merge_segments:
-            return merge_adjacent_segments(text_frames, merge_threshold)
+            return merge_adjacent_frames(text_frames, merge_threshold)
         else:
-            return [frame['content'] for frame in text_frames]
+            return [{'key': str(frame['index']), 'text': frame['content'], 'x': frame['x'], 'y': frame['y']}
+                    for frame in text_frames]
         
     except Exception as e:
-        messagebox.showerror("错误", f"无法提取文本: {str(e)}")
+        if raise_errors:
+            raise
+        if show_message:
+            messagebox.showerror("错误", f"无法提取文本: {str(e)}")
         return []
 
-def merge_adjacent_segments(text_frames, threshold=50):
+def extract_text_from_ai(ai_file, merge_segments=False, merge_threshold=50, show_message=True,
+                         index_db=None):
+    """
+    从 AI 文件中提取所有文本
+    :return: 文本列表（参数同 extract_segments_from_ai）
+    """
+    segments = extract_segments_from_ai(ai_file, merge_segments, merge_threshold, show_message, index_db)
+    return [segment['text'] for segment in segments]
+
+def merge_adjacent_frames(text_frames, threshold=50):
     """
     合并相邻的文本段
     :param text_frames: 文本帧列表
     :param threshold: 合并的最大垂直距离阈值
-    :return: 合并后的文本列表
+    :return: 合并后的句段列表（key 为参与合并的文本框序号，以 + 连接）
     """
     # 按垂直位置排序（从上到下）
     sorted_frames = sorted(text_frames, key=lambda f: f['y'], reverse=True)
@@ -73,7 +120,7 @@ def merge_adjacent_segments(text_frames, threshold=50):
         
         # 如果是第一个句段
         if current_segment is None:
-            current_segment = content
+            current_segment = {'keys': [frame['index']], 'text': content, 'x': frame['x'], 'y': y}
             current_y = y
             continue
         
@@ -83,84 +130,113 @@ def merge_adjacent_segments(text_frames, threshold=50):
         # 检查是否在同一行或相邻行（考虑高度）
         if vertical_distance < (height * 1.5 + threshold):
             # 合并内容（添加空格）
-            current_segment += " " + content
+            current_segment['text'] += " " + content
+            current_segment['keys'].append(frame['index'])
             # 更新当前y位置为合并后的平均位置
             current_y = (current_y + y) / 2
         else:
             # 保存当前合并的句段
             merged_segments.append(current_segment)
             # 开始新的句段
-            current_segment = content
+            current_segment = {'keys': [frame['index']], 'text': content, 'x': frame['x'], 'y': y}
             current_y = y
     
     # 添加最后一个句段
-    if current_segment:
+    if current_segment and current_segment['text']:
         merged_segments.append(current_segment)
     
+    for segment in merged_segments:
+        segment['key'] = "+".join(str(index) for index in segment.pop('keys'))
     return merged_segments
 
-def generate_translation_csv(texts, output_csv, filename, export_numbers=True, export_blanks=True):
-    """生成翻译用 CSV 文件（支持过滤纯数字和空白内容）"""
+def merge_adjacent_segments(text_frames, threshold=50):
+    """
+    合并相邻的文本段
+    :return: 合并后的文本列表（参数同 merge_adjacent_frames）
+    """
+    return [segment['text'] for segment in merge_adjacent_frames(text_frames, threshold)]
+
+def generate_translation_csv(texts, output_csv, filename, export_numbers=True, export_blanks=True,
+                             show_message=True, segment_filter=None):
+    """
+    生成翻译用 CSV 文件（支持按规则过滤纯数字、空白等内容）
+    :param texts: extract_segments_from_ai 返回的句段列表，或纯文本列表。
+                  纯文本没有文本框序号（列表位置在合并句段后并不是序号），导入时按顺序对应
+    :param segment_filter: SegmentFilter 实例；未提供时按 export_numbers/export_blanks 构造
+    """
+    if segment_filter is None:
+        segment_filter = SegmentFilter.from_options(export_numbers, export_blanks)
+    segments = [text if isinstance(text, dict) else {'key': None, 'text': text, 'x': None, 'y': None}
+                for text in texts]
+    return generate_translation_file(segments, output_csv, filename, segment_filter, show_message)
+
+def generate_translation_file(segments, output_path, filename, segment_filter=None, show_message=True,
+                              translations=None, raise_errors=False):
+    """
+    生成翻译模板，格式由扩展名决定（.csv / .xlsx / .xlf）
+    :param segments: extract_segments_from_ai 返回的句段列表
+    :param translations: 预翻译结果 {原文: 译文}，未提供时译文与原文相同
+    :param raise_errors: 写入失败时抛出异常，而不是返回 False
+    """
     try:
-        with open(output_csv, 'w', encoding='utf-8-sig', newline='') as csvfile:
-            writer = csv.writer(csvfile)
-            # 写入文件名作为第一行
-            writer.writerow([f"文件名: {filename}"])
-            writer.writerow(["原文", "译文"])  # 表头
-            
-            # 应用过滤规则
-            filtered_texts = []
-            for text in texts:
-                # 检查是否为空白内容
-                is_blank = not text.strip()
-                
-                # 检查是否为纯数字
-                is_numeric = False
-                try:
-                    # 尝试转换为数字（处理各种格式）
-                    cleaned_text = text.replace(',', '').replace('.', '').replace(' ', '')
-                    if cleaned_text.isdigit():
-                        is_numeric = True
-                except:
-                    pass
-                
-                # 应用过滤规则
-                if (is_blank and not export_blanks) or (is_numeric and not export_numbers):
-                    continue  # 跳过不符合条件的文本
-                
-                filtered_texts.append(text)
-            
-            # 写入过滤后的文本
-            for text in filtered_texts:
-                writer.writerow([text, text])  # 原文和译文初始相同
+        with open_translation_writer(output_path) as writer:
+            write_translation_segments(writer, segments, filename, segment_filter, translations)
         
-        messagebox.showinfo("成功", f"翻译模板已生成: {output_csv}")
+        if show_message:
+            messagebox.showinfo("成功", f"翻译模板已生成: {output_path}")
         return True
     except Exception as e:
-        messagebox.showerror("错误", f"生成CSV失败: {str(e)}")
+        if raise_errors:
+            raise
+        if show_message:
+            messagebox.showerror("错误", f"生成翻译模板失败: {str(e)}")
         return False
 
+def write_translation_segments(writer, segments, filename, segment_filter=None, translations=None):
+    """过滤句段后写入已打开的写入器（合并导出时多个文件共用一个写入器）"""
+    if segment_filter is not None:
+        # 应用过滤规则（整批处理，并累计各规则命中数）
+        segments = segment_filter.apply(segments, key=lambda segment: segment['text'])
+    translations = translations or {}
+    writer.begin_file(filename)
+    for segment in segments:
+        # 没有预翻译结果时原文和译文初始相同
+        writer.write_segment(segment, translations.get(segment['text'], segment['text']))
+
 def update_ai_file(ai_file, translations, mode, font=None):
-    """更新 AI 文件（替换或追加译文），并支持自定义字体设置"""
+    """
+    更新 AI 文件（替换或追加译文），并支持自定义字体设置
+    :param translations: 按顺序排列的译文列表，或 {文本框序号: 译文} 字典（只更新字典中的文本框）
+    """
     try:
+        import comtypes.client
         ai = comtypes.client.CreateObject("Illustrator.Application")
         doc = ai.Open(ai_file)
         
         # 获取所有文本框
         text_frames = [frame for frame in doc.TextFrames]
         
+        # 按文本框序号对应时不要求数量一致
+        by_key = isinstance(translations, dict)
+        
         # 检查译文数量是否匹配
-        if mode == "replace" and len(translations) != len(text_frames):
+        if mode == "replace" and not by_key and len(translations) != len(text_frames):
             messagebox.showwarning("警告", 
                 f"译文数量({len(translations)})与文本框数量({len(text_frames)})不匹配！\n"
                 "请确保导出和导入时使用了相同的合并设置。")
         
         for idx, text_frame in enumerate(text_frames):
-            if idx >= len(translations):
+            if by_key:
+                if idx not in translations:
+                    continue
+                translation = translations[idx]
+            elif idx >= len(translations):
                 break  # 防止索引越界
+            else:
+                translation = translations[idx]
                 
             if mode == "replace":
-                text_frame.Contents = translations[idx]
+                text_frame.Contents = translation
                 if font:
                     try:
                         # 尝试设置字体（需确保 font 为 Illustrator 中有效的字体标识）
@@ -170,7 +246,7 @@ def update_ai_file(ai_file, translations, mode, font=None):
                         messagebox.showwarning("警告", f"设置字体失败: {str(e)}")
             elif mode == "add_below":
                 new_text = doc.TextFrames.Add()
-                new_text.Contents = translations[idx]
+                new_text.Contents = translation
                 new_text.Position = [text_frame.Position[0], text_frame.Position[1] - 20]
                 if font:
                     try:
@@ -186,6 +262,704 @@ def update_ai_file(ai_file, translations, mode, font=None):
         messagebox.showerror("错误", f"更新失败: {str(e)}")
         return False
 
+# --------------------------
+# 翻译文件读写（CSV / XLSX / XLIFF）
+# --------------------------
+XLIFF_NAMESPACE = "urn:oasis:names:tc:xliff:document:1.2"
+XLIFF_SOURCE_LANGUAGE = "zh-CN"
+
+# XML 1.0 不允许的控制字符；Illustrator 的段落分隔符 \r 需转义，否则解析时会被规范化为 \n
+INVALID_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+def xml_text(text):
+    return escape(INVALID_XML_CHARS.sub('', text), {'\r': '&#13;'})
+
+class TranslationWriter:
+    """
+    翻译文件写入器：按 begin_file / write_segment 逐行写出，不在内存中保留全部行，
+    多个 AI 文件可以合并写入同一个文件
+    """
+    extension = ""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def begin_file(self, filename):
+        self.filename = filename
+
+    def write_segment(self, segment, translation):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class CsvTranslationWriter(TranslationWriter):
+    """
+    CSV 格式：每个 AI 文件以“文件名:”行和表头开始；前两列与原有格式相同，
+    第三列是文本框序号，过滤掉部分句段后导入时仍能对应到原文本框
+    """
+    extension = ".csv"
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.file = open(path, 'w', encoding='utf-8-sig', newline='')
+        self.writer = csv.writer(self.file)
+
+    def begin_file(self, filename):
+        super().begin_file(filename)
+        # 写入文件名作为第一行
+        self.writer.writerow([f"文件名: {filename}"])
+        self.writer.writerow(["原文", "译文", "文本框"])  # 表头
+
+    def write_segment(self, segment, translation):
+        self.writer.writerow([segment['text'], translation, segment['key'] or ""])
+
+    def close(self):
+        self.file.close()
+
+class XlsxTranslationWriter(TranslationWriter):
+    """XLSX 格式（openpyxl 只写模式，行数据流式写入临时文件）"""
+    extension = ".xlsx"
+    header = ["文件名", "文本框", "原文", "译文", "X", "Y"]
+
+    def __init__(self, path):
+        super().__init__(path)
+        import openpyxl  # 仅在导出 XLSX 时需要
+        self.workbook = openpyxl.Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet("翻译")
+        self.sheet.append(self.header)
+
+    def write_segment(self, segment, translation):
+        self.sheet.append([self.filename, segment['key'], segment['text'], translation,
+                           segment.get('x'), segment.get('y')])
+
+    def close(self):
+        self.workbook.save(self.path)
+
+class XliffTranslationWriter(TranslationWriter):
+    """XLIFF 1.2 格式：每个 AI 文件一个 <file>，文本框序号写入 resname，坐标写入 note"""
+    extension = ".xlf"
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.file = open(path, 'w', encoding='utf-8')
+        self.file.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        self.file.write(f'<xliff version="1.2" xmlns="{XLIFF_NAMESPACE}">\n')
+        self.in_file = False
+        self.units = 0
+
+    def begin_file(self, filename):
+        super().begin_file(filename)
+        self.end_file()
+        self.file.write(f'  <file original={quoteattr(filename)} source-language="{XLIFF_SOURCE_LANGUAGE}" '
+                        f'datatype="x-illustrator">\n    <body>\n')
+        self.in_file = True
+
+    def end_file(self):
+        if self.in_file:
+            self.file.write('    </body>\n  </file>\n')
+            self.in_file = False
+
+    def write_segment(self, segment, translation):
+        if segment['key']:
+            unit = f'id={quoteattr(segment["key"])} resname={quoteattr(segment["key"])}'
+        else:
+            # 没有文本框序号：id 不用纯数字，导入时不会被当作序号
+            self.units += 1
+            unit = f'id="u{self.units}"'
+        self.file.write(f'      <trans-unit {unit}>\n'
+                        f'        <source>{xml_text(segment["text"])}</source>\n'
+                        f'        <target>{xml_text(translation)}</target>\n')
+        if segment.get('x') is not None:
+            self.file.write(f'        <note>x={segment["x"]:.2f}, y={segment["y"]:.2f}</note>\n')
+        self.file.write('      </trans-unit>\n')
+
+    def close(self):
+        self.end_file()
+        self.file.write('</xliff>\n')
+        self.file.close()
+
+# 导出格式名称 -> 写入器
+EXPORT_FORMATS = {
+    "CSV": CsvTranslationWriter,
+    "XLSX": XlsxTranslationWriter,
+    "XLIFF": XliffTranslationWriter,
+}
+
+TRANSLATION_FILETYPES = [("CSV Files", "*.csv"), ("Excel Files", "*.xlsx"), ("XLIFF Files", "*.xlf *.xliff")]
+
+def translation_file_kind(path):
+    """根据扩展名判断翻译文件格式"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".xlsx":
+        return "XLSX"
+    if ext in (".xlf", ".xliff"):
+        return "XLIFF"
+    return "CSV"
+
+def open_translation_writer(path):
+    return EXPORT_FORMATS[translation_file_kind(path)](path)
+
+def consolidated_export_path(folder, output_folder, extension):
+    """
+    合并导出文件的路径：文件夹名加“_合并导出”后缀，与逐个导出的 <AI 文件名><扩展名> 区分；
+    文件夹中恰好有同名 AI 文件时再加序号
+    """
+    stem = f"{os.path.basename(os.path.normpath(folder))}_合并导出"
+    name, index = stem, 1
+    while os.path.exists(os.path.join(folder, name + ".ai")):
+        index += 1
+        name = f"{stem}{index}"
+    return os.path.join(output_folder, name + extension)
+
+def read_translations(path, filename=None):
+    """
+    读取翻译文件中的译文
+    :param filename: 合并导出的文件中只读取该 AI 文件的部分；找不到时返回全部译文
+    :return: [(文本框序号或 None, 译文)]
+    """
+    kind = translation_file_kind(path)
+    if kind == "XLSX":
+        sections = read_xlsx_translations(path)
+    elif kind == "XLIFF":
+        sections = read_xliff_translations(path)
+    else:
+        sections = read_csv_translations(path)
+    
+    if filename and filename in sections:
+        return sections[filename]
+    return [item for rows in sections.values() for item in rows]
+
+def read_csv_translations(path):
+    sections = {}
+    rows = sections.setdefault("", [])
+    # 文件开头和每个“文件名:”行之后的第一行是表头（没有“文件名:”行的文件也有表头）；
+    # 旧版导出的两列文件没有“文本框”列，按顺序对应
+    expect_header = True
+    key_col = None
+    with open(path, 'r', encoding='utf-8-sig', newline='') as csvfile:
+        reader = csv.reader(csvfile)
+        for row in reader:
+            if len(row) == 1 and row[0].startswith("文件名: "):
+                rows = sections.setdefault(row[0][len("文件名: "):], [])
+                expect_header = True
+            elif len(row) >= 2:  # 确保有译文列
+                if expect_header:
+                    expect_header = False
+                    key_col = row.index("文本框") if "文本框" in row else None
+                    continue
+                key = row[key_col] if key_col is not None and len(row) > key_col else ""
+                rows.append((key or None, row[1]))
+    return sections
+
+def read_xlsx_translations(path):
+    import openpyxl  # 仅在导入 XLSX 时需要
+    workbook = openpyxl.load_workbook(path, read_only=True)
+    try:
+        sections = {}
+        rows = workbook.active.iter_rows(values_only=True)
+        header = list(next(rows, ()))
+        file_col = header.index("文件名")
+        key_col = header.index("文本框")
+        target_col = header.index("译文")
+        for row in rows:
+            if len(row) <= target_col or row[target_col] is None:
+                continue
+            key = row[key_col]
+            sections.setdefault(row[file_col] or "", []).append(
+                (None if key is None else str(key), str(row[target_col])))
+        return sections
+    finally:
+        workbook.close()
+
+def read_xliff_translations(path):
+    sections = {}
+    # 不在 <file> 中的 trans-unit 归入无文件名的部分
+    rows = sections.setdefault("", [])
+    ns = "{" + XLIFF_NAMESPACE + "}"
+    for event, elem in ET.iterparse(path, events=("start", "end")):
+        if event == "start":
+            if elem.tag == ns + "file":
+                rows = sections.setdefault(elem.get("original", ""), [])
+            continue
+        if elem.tag == ns + "file":
+            rows = sections[""]
+        elif elem.tag == ns + "trans-unit":
+            target = elem.find(ns + "target")
+            if target is None:
+                target = elem.find(ns + "source")
+            if target is not None:
+                rows.append((elem.get("resname") or elem.get("id"), "".join(target.itertext())))
+            elem.clear()  # 释放已处理的节点，保持内存占用恒定
+    return sections
+
+def translations_for_update(items):
+    """
+    将读取的译文转换为 update_ai_file 的参数：
+    所有行都带有未合并的文本框序号时按序号对应，否则按顺序对应
+    """
+    if items and all(key is not None and key.isdigit() for key, _ in items):
+        return dict((int(key), text) for key, text in items)
+    return [text for _, text in items]
+
+# --------------------------
+# 预翻译（机器翻译）
+# --------------------------
+TRANSLATION_CACHE_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "translation_cache.db")
+
+class Translator:
+    """机器翻译后端接口：translate_batch 接收一批原文，按相同顺序返回译文"""
+    name = "translator"
+
+    def translate_batch(self, texts):
+        raise NotImplementedError
+
+class HttpTranslator(Translator):
+    """
+    通过 HTTP 调用翻译服务（本地模型服务或离线测试用的 HTTP 桩）
+    请求: POST {"texts": [...], "source": 源语言, "target": 目标语言}
+    响应: {"translations": [...]}，顺序与 texts 一致
+    """
+    def __init__(self, url, source_lang="zh", target_lang="en", timeout=120):
+        self.url = url
+        self.source_lang = source_lang
+        self.target_lang = target_lang
+        self.timeout = timeout
+        self.name = f"{url}|{source_lang}>{target_lang}"
+
+    def translate_batch(self, texts):
+        payload = json.dumps({"texts": texts, "source": self.source_lang, "target": self.target_lang},
+                             ensure_ascii=False).encode('utf-8')
+        request = urllib.request.Request(self.url, data=payload,
+                                         headers={"Content-Type": "application/json; charset=utf-8"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            result = json.loads(response.read().decode('utf-8'))
+        translations = result.get("translations")
+        if not isinstance(translations, list) or len(translations) != len(texts):
+            raise ValueError("翻译服务返回的译文数量与原文不一致")
+        return [str(text) for text in translations]
+
+class TranslationCache:
+    """
+    译文缓存（SQLite），以“后端+语言对+原文”的 SHA-256 为键，
+    只有缓存中没有的原文才会发送给翻译后端
+    """
+    def __init__(self, db_path=TRANSLATION_CACHE_DB, namespace=""):
+        self.db_path = db_path
+        self.namespace = namespace
+        with self.connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS translations "
+                         "(hash TEXT PRIMARY KEY, source TEXT, translation TEXT)")
+
+    def connect(self):
+        return sqlite3.connect(self.db_path)
+
+    def text_hash(self, text):
+        return hashlib.sha256(f"{self.namespace}\0{text}".encode('utf-8')).hexdigest()
+
+    def get_many(self, texts):
+        """返回 {原文: 译文}，只包含已缓存的原文"""
+        hashes = dict((self.text_hash(text), text) for text in texts)
+        found = {}
+        conn = self.connect()
+        try:
+            keys = list(hashes)
+            # 分批查询，避免超过 SQLite 的参数个数限制
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT hash, translation FROM translations WHERE hash IN ({','.join('?' * len(chunk))})", chunk)
+                for digest, translation in rows:
+                    found[hashes[digest]] = translation
+        finally:
+            conn.close()
+        return found
+
+    def put_many(self, pairs):
+        conn = self.connect()
+        try:
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO translations (hash, source, translation) VALUES (?, ?, ?)",
+                                 [(self.text_hash(source), source, translation) for source, translation in pairs])
+        finally:
+            conn.close()
+
+def pretranslate(texts, translator, cache=None, batch_size=50, max_workers=4):
+    """
+    预翻译一批原文：去重后先查缓存，其余按 batch_size 分批、最多 max_workers 个批次并发发送给后端
+    :return: ({原文: 译文}, 统计信息)，失败批次的原文不出现在结果中
+    """
+    unique_texts = list(dict.fromkeys(text for text in texts if text.strip()))
+    translations = cache.get_many(unique_texts) if cache else {}
+    missing = [text for text in unique_texts if text not in translations]
+    stats = {'unique': len(unique_texts), 'cached': len(translations), 'translated': 0, 'failed': 0, 'errors': []}
+    
+    batches = [missing[start:start + batch_size] for start in range(0, len(missing), max(1, batch_size))]
+    if batches:
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            futures = dict((executor.submit(translator.translate_batch, batch), batch) for batch in batches)
+            for future in as_completed(futures):
+                batch = futures[future]
+                try:
+                    results = future.result()
+                except Exception as e:
+                    stats['failed'] += len(batch)
+                    stats['errors'].append(str(e))
+                    continue
+                pairs = list(zip(batch, results))
+                translations.update(pairs)
+                stats['translated'] += len(pairs)
+                # 每个批次完成后立即写入缓存，中途失败也不会丢失已翻译的结果
+                if cache:
+                    cache.put_many(pairs)
+    return translations, stats
+
+# --------------------------
+# 句段过滤规则
+# --------------------------
+# 正则规则按顺序合并为一个编译后的表达式，整句匹配时由命中的分组名确定规则；
+# 靠前的规则优先，零件编号放在尺寸、数值+单位之后，220V、10x20mm 这类计为单位而不是编号
+# 零件编号要求大写字母和至少 3 个数字，COVID-19、MP3 这类缩写不算；
+# 代价是 X-12 这种数字很少的编号不会被识别，需要时可加入不翻译词表
+SEGMENT_RULES = [
+    ('number', "纯数字", r'[\d.,\s]*\d[\d.,\s]*'),
+    ('dimension', "尺寸", r'[Φφ⌀Ø]?\d+(?:\.\d+)?\s*(?:[x×*]\s*\d+(?:\.\d+)?\s*){1,2}(?:mm|cm|m|in|")?'),
+    ('unit', "数值+单位",
+     r'[±+-]?\d+(?:[.,]\d+)?\s*(?:~\s*[±+-]?\d+(?:[.,]\d+)?\s*)?'
+     r'(?:mm|cm|m|km|mg|g|kg|t|ml|mL|L|V|mV|kV|A|mA|W|kW|Wh|mAh|Hz|kHz|MHz|GHz|N|Nm|N·m|Pa|kPa|MPa|bar|psi|'
+     r'°C|℃|°F|°|%|dB|rpm|s|ms|min|h|Ω|kΩ|lm|lx|in|ft|lb|oz|GB|MB|KB|TB)'),
+    ('part_number', "零件编号", r'(?=(?:[A-Z._/-]*\d){3})(?=[A-Z0-9._/-]*[A-Z])[A-Z0-9][A-Z0-9._/-]{2,}'),
+    ('url', "网址/邮箱", r'(?:https?://|www\.)\S+|[\w.+-]+@[\w-]+(?:\.[\w-]+)+'),
+]
+
+# 非正则规则的显示名称
+RULE_LABELS = dict((name, label) for name, label, _ in SEGMENT_RULES)
+RULE_LABELS.update({'blank': "空白内容", 'min_length': "过短内容", 'dnt': "不翻译词"})
+
+class AhoCorasick:
+    """
+    Aho-Corasick 多模式匹配：一次扫描文本即可找出所有词表命中（不区分大小写）
+    文本和词都用 casefold 折叠，一个字符可能折叠成多个（如 İ、ß），命中位置按偏移表换算回原文本
+    """
+    def __init__(self, terms):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]  # 每个状态结束的词长度（折叠后的长度）
+        for term in terms:
+            self.add(term.casefold())
+        self.build()
+
+    def add(self, term):
+        if not term:
+            return
+        state = 0
+        for ch in term:
+            next_state = self.goto[state].get(ch)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][ch] = next_state
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+            state = next_state
+        self.output[state].append(len(term))
+
+    def build(self):
+        # 广度优先计算失败指针
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for ch, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(ch, 0)
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+
+    def iter_matches(self, text):
+        """逐个返回命中的 (起始位置, 结束位置)，位置对应原文本；只覆盖某个字符折叠结果一部分的命中不返回"""
+        # origin[i]: 折叠后第 i 个字符来自原文本的哪个字符（casefold 逐字符进行，与整体折叠结果一致）
+        origin = []
+        for index, ch in enumerate(text):
+            origin.extend([index] * len(ch.casefold()))
+        state = 0
+        for pos, ch in enumerate(text.casefold()):
+            while state and ch not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(ch, 0)
+            for length in self.output[state]:
+                start, end = pos + 1 - length, pos + 1
+                if (start and origin[start - 1] == origin[start]) or (end < len(origin) and origin[end] == origin[pos]):
+                    continue
+                yield origin[start], origin[pos] + 1
+
+class SegmentFilter:
+    """
+    按规则批量过滤句段，并统计每条规则的命中数
+    :param skip_rules: 需要跳过的规则名集合（SEGMENT_RULES 中的规则及 'blank'）
+    :param dnt_terms: 不翻译词表，句段完全由词表中的词（及标点空白）组成时跳过
+    :param min_length: 去除首尾空白后短于该长度的句段跳过（0 表示不限制）
+    """
+    def __init__(self, skip_rules=(), dnt_terms=(), min_length=0):
+        self.skip_blank = 'blank' in skip_rules
+        self.min_length = min_length
+        patterns = [f'(?P<{name}>{pattern})' for name, _, pattern in SEGMENT_RULES if name in skip_rules]
+        self.pattern = re.compile('|'.join(patterns)) if patterns else None
+        terms = [term.strip() for term in dnt_terms if term.strip()]
+        self.dnt_matcher = AhoCorasick(terms) if terms else None
+        self.hit_counts = Counter()
+
+    @classmethod
+    def from_options(cls, export_numbers=True, export_blanks=True):
+        """兼容原有的“导出纯数字 / 导出空白内容”选项"""
+        skip_rules = set()
+        if not export_numbers:
+            skip_rules.add('number')
+        if not export_blanks:
+            skip_rules.add('blank')
+        return cls(skip_rules)
+
+    def is_dnt(self, text):
+        """句段中所有字母数字字符都被不翻译词覆盖时返回 True"""
+        covered = [False] * len(text)
+        for start, end in self.dnt_matcher.iter_matches(text):
+            covered[start:end] = [True] * (end - start)
+        return all(covered[i] or not ch.isalnum() for i, ch in enumerate(text))
+
+    def classify(self, text):
+        """返回句段命中的规则名，不需要跳过时返回 None"""
+        stripped = text.strip()
+        if not stripped:
+            return 'blank' if self.skip_blank else None
+        if self.pattern is not None:
+            match = self.pattern.fullmatch(stripped)
+            if match:
+                return match.lastgroup
+        if len(stripped) < self.min_length:
+            return 'min_length'
+        if self.dnt_matcher is not None and self.is_dnt(stripped):
+            return 'dnt'
+        return None
+
+    def apply(self, items, key=None):
+        """
+        过滤一批句段，返回保留的句段列表
+        :param key: 从元素中取出文本的函数（元素为句段字典时使用）
+        """
+        kept = []
+        for item in items:
+            rule = self.classify(item if key is None else key(item))
+            if rule is None:
+                kept.append(item)
+            else:
+                self.hit_counts[rule] += 1
+        return kept
+
+    def summary(self):
+        """各规则命中数的文字描述"""
+        return ", ".join(f"{RULE_LABELS.get(rule, rule)} {count}" for rule, count in self.hit_counts.most_common())
+
+def load_dnt_terms(path):
+    """读取不翻译词表（UTF-8 文本，每行一个词）"""
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        return [line.strip() for line in f if line.strip()]
+
+# --------------------------
+# 全文索引（SQLite FTS5）
+# --------------------------
+# 放在脚本所在目录，与启动时的当前目录无关
+INDEX_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ai_text_index.db")
+
+def open_text_index(db_path=INDEX_DB):
+    """
+    打开（必要时创建）全文索引数据库
+    segment_info 保存文件、文本框序号和坐标，segment_fts 以相同 rowid 存放可检索的文本。
+    优先使用 trigram 分词器，中文等无空格文本也能按子串检索
+    """
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS segment_info (
+            id INTEGER PRIMARY KEY,
+            path TEXT NOT NULL,
+            frame_key INTEGER NOT NULL,
+            x REAL,
+            y REAL,
+            content TEXT
+        )""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_segment_path ON segment_info(path)")
+    try:
+        conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS segment_fts USING fts5(content, tokenize='trigram')")
+    except sqlite3.OperationalError:
+        # 旧版 SQLite 不支持 trigram 分词器，检索时全部走 LIKE（见 has_trigram_index）
+        conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS segment_fts USING fts5(content)")
+    return conn
+
+def has_trigram_index(conn):
+    """
+    segment_fts 是否使用 trigram 分词器。以表定义为准：旧版 SQLite 建的索引
+    即使之后换了支持 trigram 的 SQLite 打开，也仍是按词切分，不能按子串检索
+    """
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'segment_fts'").fetchone()
+    return row is not None and 'trigram' in row[0].lower()
+
+def update_text_index(db_path, ai_file, text_frames):
+    """
+    增量更新单个 AI 文件的索引：删除该文件的旧记录后写入新记录
+    :param text_frames: extract_text_from_ai 收集的文本框列表
+    """
+    path = os.path.abspath(ai_file)
+    conn = open_text_index(db_path)
+    try:
+        with conn:
+            conn.execute("DELETE FROM segment_fts WHERE rowid IN (SELECT id FROM segment_info WHERE path = ?)", (path,))
+            conn.execute("DELETE FROM segment_info WHERE path = ?", (path,))
+            for frame in text_frames:
+                cursor = conn.execute(
+                    "INSERT INTO segment_info (path, frame_key, x, y, content) VALUES (?, ?, ?, ?, ?)",
+                    (path, frame['index'], float(frame['x']), float(frame['y']), frame['content']))
+                conn.execute("INSERT INTO segment_fts (rowid, content) VALUES (?, ?)",
+                             (cursor.lastrowid, frame['content']))
+    finally:
+        conn.close()
+
+def search_text_index(query, db_path=INDEX_DB, limit=200):
+    """
+    在全文索引中查找包含指定短语的文本框
+    :return: [(文件路径, 文本框序号, x, y, 内容)]
+    """
+    query = query.strip()
+    if not query:
+        return []
+    
+    conn = open_text_index(db_path)
+    try:
+        if len(query) >= 3 and has_trigram_index(conn):
+            # 以短语方式匹配，避免查询中的特殊字符被当作 FTS 语法
+            phrase = '"' + query.replace('"', '""') + '"'
+            rows = conn.execute("""
+                SELECT i.path, i.frame_key, i.x, i.y, i.content
+                FROM segment_fts JOIN segment_info i ON i.id = segment_fts.rowid
+                WHERE segment_fts MATCH ?
+                ORDER BY i.path, i.frame_key
+                LIMIT ?""", (phrase, limit)).fetchall()
+        else:
+            # trigram 无法匹配少于 3 个字符的查询；索引不是 trigram 分词时 MATCH 只能整词匹配，都回退到 LIKE
+            pattern = '%' + query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            rows = conn.execute("""
+                SELECT path, frame_key, x, y, content FROM segment_info
+                WHERE content LIKE ? ESCAPE '\\'
+                ORDER BY path, frame_key
+                LIMIT ?""", (pattern, limit)).fetchall()
+    finally:
+        conn.close()
+    return rows
+
+# --------------------------
+# 文件夹监控（增量导出）
+# --------------------------
+WATCH_STATE_FILE = ".watch_state.json"
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """分块计算文件的 SHA-256 摘要，避免一次性读入大文件"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class FolderWatcher:
+    """
+    轮询监控文件夹中的 AI 文件，只返回新增或内容已变化的文件
+    - 先用 mtime+size 做快速判断，只有签名变化的文件才计算 SHA-256
+    - 文件签名在 debounce 秒内保持不变才视为保存完成（设计师连续保存时只提取一次）
+    - 已处理文件的状态保存在 state_path 中，重启监控后不会重复提取
+    """
+    def __init__(self, folder, state_path, debounce=2.0):
+        self.folder = folder
+        self.state_path = state_path
+        self.debounce = debounce
+        self.state = self.load_state()  # {文件名: {"mtime", "size", "sha256"}}
+        self.pending = {}               # {文件名: ((mtime, size), 最近一次变化的时间)}
+
+    def load_state(self):
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_state(self):
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False)
+        os.replace(tmp_path, self.state_path)
+
+    def scan(self):
+        """
+        扫描一次文件夹
+        :return: [(文件名, 文件信息)]，文件信息在处理完成后传给 mark_done
+        """
+        now = time.time()
+        ready = []
+        seen = set()
+        state_changed = False
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                if not entry.name.endswith(".ai") or not entry.is_file():
+                    continue
+                seen.add(entry.name)
+                stat = entry.stat()
+                signature = (stat.st_mtime, stat.st_size)
+                known = self.state.get(entry.name)
+                if known and (known["mtime"], known["size"]) == signature:
+                    self.pending.pop(entry.name, None)
+                    continue
+                
+                # 签名变化后重新计时，等待文件保存完成
+                pending = self.pending.get(entry.name)
+                if pending is None or pending[0] != signature:
+                    self.pending[entry.name] = (signature, now)
+                    continue
+                if now - pending[1] < self.debounce:
+                    continue
+                del self.pending[entry.name]
+                
+                try:
+                    digest = file_sha256(entry.path)
+                except OSError:
+                    continue  # 文件仍被占用，下次扫描再试
+                info = {"mtime": stat.st_mtime, "size": stat.st_size, "sha256": digest}
+                if known and known["sha256"] == digest:
+                    # 仅修改时间变化，内容未变，无需重新提取
+                    self.state[entry.name] = info
+                    state_changed = True
+                    continue
+                ready.append((entry.name, info))
+        
+        # 清理已删除文件的记录
+        for name in list(self.state):
+            if name not in seen:
+                del self.state[name]
+                state_changed = True
+        for name in list(self.pending):
+            if name not in seen:
+                del self.pending[name]
+        
+        if state_changed:
+            self.save_state()
+        return ready
+
+    def mark_done(self, filename, info):
+        """记录文件已处理，内容不变时不再重复提取"""
+        self.state[filename] = info
+        self.save_state()
+
 # --------------------------
 # UI 界面
 # --------------------------
@@ -193,7 +967,7 @@ class AIProcessorApp:
     def __init__(self, root):
         self.root = root
         self.root.title("AI 文件翻译处理工具")
-        self.root.geometry("800x750")  # 增加高度以容纳新选项
+        self.root.geometry("800x950")  # 增加高度以容纳新选项
         
         # 设置窗口图标（如果有的话）
         try:
@@ -211,8 +985,29 @@ class AIProcessorApp:
         # 导出过滤选项
         self.export_numbers = tk.BooleanVar(value=True)  # 默认导出纯数字
         self.export_blanks = tk.BooleanVar(value=True)   # 默认导出空白内容
+        # 其余过滤规则（默认全部导出，与原有行为一致）
+        self.export_rule_vars = dict((name, tk.BooleanVar(value=True))
+                                     for name, _, _ in SEGMENT_RULES if name != 'number')
+        self.min_length = tk.IntVar(value=0)             # 最短句段长度（0 表示不限制）
+        self.dnt_file = ""                               # 不翻译词表文件
         self.merge_segments = tk.BooleanVar(value=False) # 默认不合并句段
         self.merge_threshold = tk.IntVar(value=1)       # 默认合并阈值
+        self.update_index = tk.BooleanVar(value=True)   # 默认同步更新全文索引
+        self.export_format = tk.StringVar(value="CSV")  # 导出格式
+        self.consolidate_export = tk.BooleanVar(value=False)  # 批量导出时合并为单个文件
+        
+        # 预翻译选项（默认关闭，译文与原文相同）
+        self.pretranslate_enabled = tk.BooleanVar(value=False)
+        self.mt_url = tk.StringVar(value="http://127.0.0.1:8000/translate")
+        self.mt_source_lang = tk.StringVar(value="zh")
+        self.mt_target_lang = tk.StringVar(value="en")
+        self.mt_batch_size = tk.IntVar(value=50)
+        self.mt_workers = tk.IntVar(value=4)
+        
+        # 文件夹监控选项
+        self.watch_interval = tk.IntVar(value=2)        # 轮询间隔（秒）
+        self.watcher = None
+        self.watch_job = None
         
         # 创建 Notebook 选项卡
         self.notebook = ttk.Notebook(root)
@@ -228,6 +1023,11 @@ class AIProcessorApp:
         self.notebook.add(self.import_frame, text="导入 CSV → AI")
         self.create_import_widgets(self.import_frame)
         
+        # 搜索页：全文索引检索
+        self.search_frame = ttk.Frame(self.notebook)
+        self.notebook.add(self.search_frame, text="全文搜索")
+        self.create_search_widgets(self.search_frame)
+        
         # 日志显示区域（共用）
         log_frame = ttk.Frame(root)
         log_frame.pack(fill=tk.BOTH, expand=False, padx=10, pady=5)
@@ -254,12 +1054,24 @@ class AIProcessorApp:
         ttk.Button(frame, text="浏览文件夹", command=self.browse_export_ai_folder).grid(row=row, column=2, padx=5, pady=5)
         
         row += 1
-        # CSV 文件路径
-        ttk.Label(frame, text="CSV 文件路径:").grid(row=row, column=0, padx=5, pady=5, sticky="w")
+        # 导出文件路径
+        ttk.Label(frame, text="导出文件路径:").grid(row=row, column=0, padx=5, pady=5, sticky="w")
         self.entry_export_csv = ttk.Entry(frame, width=50)
         self.entry_export_csv.grid(row=row, column=1, padx=5, pady=5)
         ttk.Button(frame, text="浏览", command=self.browse_export_csv_file).grid(row=row, column=2, padx=5, pady=5)
         
+        row += 1
+        # 导出格式
+        ttk.Label(frame, text="导出格式:").grid(row=row, column=0, padx=5, pady=5, sticky="w")
+        format_frame = ttk.Frame(frame)
+        format_frame.grid(row=row, column=1, columnspan=2, padx=5, pady=5, sticky="w")
+        combo_format = ttk.Combobox(format_frame, values=list(EXPORT_FORMATS), textvariable=self.export_format,
+                                    state="readonly", width=10)
+        combo_format.pack(side=tk.LEFT)
+        combo_format.bind("<<ComboboxSelected>>", self.on_export_format_change)
+        ttk.Checkbutton(format_frame, text="批量导出时合并为单个文件", variable=self.consolidate_export).pack(
+            side=tk.LEFT, padx=15)
+        
         # 新增：句段合并选项
         row += 1
         merge_frame = ttk.LabelFrame(frame, text="句段合并设置")
@@ -292,15 +1104,76 @@ class AIProcessorApp:
         ttk.Checkbutton(filter_frame, text="导出空白内容", variable=self.export_blanks).grid(
             row=0, column=1, padx=10, pady=5, sticky="w")
         
+        # 全文索引选项
+        ttk.Checkbutton(filter_frame, text="更新全文索引", variable=self.update_index).grid(
+            row=0, column=2, padx=10, pady=5, sticky="w")
+        
+        # 零件编号、尺寸、数值单位、网址等规则
+        for idx, (name, var) in enumerate(self.export_rule_vars.items()):
+            ttk.Checkbutton(filter_frame, text=f"导出{RULE_LABELS[name]}", variable=var).grid(
+                row=1 + idx // 3, column=idx % 3, padx=10, pady=5, sticky="w")
+        
+        # 最短长度
+        rule_row = 2 + (len(self.export_rule_vars) - 1) // 3
+        length_frame = ttk.Frame(filter_frame)
+        length_frame.grid(row=rule_row, column=0, padx=10, pady=5, sticky="w")
+        ttk.Label(length_frame, text="最短长度:").pack(side=tk.LEFT)
+        ttk.Spinbox(length_frame, from_=0, to=50, width=5, textvariable=self.min_length).pack(side=tk.LEFT, padx=5)
+        
+        # 不翻译词表
+        dnt_frame = ttk.Frame(filter_frame)
+        dnt_frame.grid(row=rule_row, column=1, columnspan=2, padx=10, pady=5, sticky="w")
+        ttk.Label(dnt_frame, text="不翻译词表:").pack(side=tk.LEFT)
+        self.entry_dnt = ttk.Entry(dnt_frame, width=28)
+        self.entry_dnt.pack(side=tk.LEFT, padx=5)
+        ttk.Button(dnt_frame, text="浏览", command=self.browse_dnt_file).pack(side=tk.LEFT)
+        
         # 提示信息
-        ttk.Label(filter_frame, text="* 取消勾选将跳过相应内容", foreground="gray").grid(
-            row=1, column=0, columnspan=2, padx=10, pady=(0, 5), sticky="w")
+        ttk.Label(filter_frame, text="* 取消勾选将跳过相应内容；完全由不翻译词组成的句段也会跳过", foreground="gray").grid(
+            row=rule_row + 1, column=0, columnspan=3, padx=10, pady=(0, 5), sticky="w")
+        
+        # 预翻译：导出前把新句段发送给机器翻译服务
+        row += 1
+        mt_frame = ttk.LabelFrame(frame, text="预翻译")
+        mt_frame.grid(row=row, column=0, columnspan=3, padx=10, pady=10, sticky="we")
+        ttk.Checkbutton(mt_frame, text="启用预翻译", variable=self.pretranslate_enabled).grid(
+            row=0, column=0, padx=10, pady=5, sticky="w")
+        ttk.Label(mt_frame, text="服务地址:").grid(row=0, column=1, padx=(20, 5), pady=5, sticky="e")
+        ttk.Entry(mt_frame, width=36, textvariable=self.mt_url).grid(
+            row=0, column=2, columnspan=5, padx=5, pady=5, sticky="w")
+        ttk.Label(mt_frame, text="语言:").grid(row=1, column=0, padx=10, pady=5, sticky="e")
+        lang_frame = ttk.Frame(mt_frame)
+        lang_frame.grid(row=1, column=1, padx=5, pady=5, sticky="w")
+        ttk.Entry(lang_frame, width=6, textvariable=self.mt_source_lang).pack(side=tk.LEFT)
+        ttk.Label(lang_frame, text="→").pack(side=tk.LEFT, padx=3)
+        ttk.Entry(lang_frame, width=6, textvariable=self.mt_target_lang).pack(side=tk.LEFT)
+        ttk.Label(mt_frame, text="批大小:").grid(row=1, column=2, padx=(20, 5), pady=5, sticky="e")
+        ttk.Spinbox(mt_frame, from_=1, to=1000, width=5, textvariable=self.mt_batch_size).grid(
+            row=1, column=3, padx=5, pady=5, sticky="w")
+        ttk.Label(mt_frame, text="并发数:").grid(row=1, column=4, padx=(20, 5), pady=5, sticky="e")
+        ttk.Spinbox(mt_frame, from_=1, to=32, width=5, textvariable=self.mt_workers).grid(
+            row=1, column=5, padx=5, pady=5, sticky="w")
+        ttk.Label(mt_frame, text="* 译文按原文缓存，只有新出现的句段才会发送给翻译服务", foreground="gray").grid(
+            row=2, column=0, columnspan=6, padx=10, pady=(0, 5), sticky="w")
         
         row += 1
         # 导出按钮
         btn_frame = ttk.Frame(frame)
         btn_frame.grid(row=row, column=0, columnspan=3, pady=10)
         ttk.Button(btn_frame, text="导出文字", command=self.export_text).pack(side=tk.LEFT, padx=5)
+        
+        # 文件夹监控：新增或修改的 AI 文件自动导出到 output 文件夹
+        row += 1
+        watch_frame = ttk.LabelFrame(frame, text="文件夹监控")
+        watch_frame.grid(row=row, column=0, columnspan=3, padx=10, pady=10, sticky="we")
+        ttk.Label(watch_frame, text="检查间隔:").grid(row=0, column=0, padx=(10, 5), pady=5, sticky="e")
+        ttk.Spinbox(watch_frame, from_=1, to=60, width=5, textvariable=self.watch_interval).grid(
+            row=0, column=1, padx=5, pady=5, sticky="w")
+        ttk.Label(watch_frame, text="秒").grid(row=0, column=2, padx=(0, 10), pady=5, sticky="w")
+        self.btn_watch = ttk.Button(watch_frame, text="开始监控", command=self.toggle_watch)
+        self.btn_watch.grid(row=0, column=3, padx=10, pady=5)
+        ttk.Label(watch_frame, text="* 仅重新导出新增或内容有变化的 AI 文件", foreground="gray").grid(
+            row=1, column=0, columnspan=4, padx=10, pady=(0, 5), sticky="w")
     
     def browse_export_ai_file(self):
         file_path = filedialog.askopenfilename(filetypes=[("AI Files", "*.ai")])
@@ -309,8 +1182,9 @@ class AIProcessorApp:
             self.entry_export_ai.delete(0, tk.END)
             self.entry_export_ai.insert(0, file_path)
             self.log("已选择 AI 文件: " + file_path)
-            # 自动生成 CSV 文件路径
-            default_csv = os.path.join(os.path.dirname(file_path), f"{os.path.splitext(os.path.basename(file_path))[0]}.csv")
+            # 自动生成导出文件路径
+            default_csv = os.path.join(os.path.dirname(file_path),
+                                       f"{os.path.splitext(os.path.basename(file_path))[0]}{self.export_extension()}")
             self.export_csv_file = default_csv
             self.entry_export_csv.delete(0, tk.END)
             self.entry_export_csv.insert(0, default_csv)
@@ -325,14 +1199,148 @@ class AIProcessorApp:
     
     def browse_export_csv_file(self):
         file_path = filedialog.asksaveasfilename(
-            defaultextension=".csv",
-            filetypes=[("CSV Files", "*.csv")]
+            defaultextension=self.export_extension(),
+            filetypes=TRANSLATION_FILETYPES
         )
         if file_path:
             self.export_csv_file = file_path
+            self.export_format.set(translation_file_kind(file_path))
             self.entry_export_csv.delete(0, tk.END)
             self.entry_export_csv.insert(0, file_path)
-            self.log("已设置 CSV 路径: " + file_path)
+            self.log("已设置导出路径: " + file_path)
+    
+    def export_extension(self):
+        return EXPORT_FORMATS[self.export_format.get()].extension
+    
+    def on_export_format_change(self, event=None):
+        # 已设置导出路径时同步修改扩展名
+        if self.export_csv_file:
+            self.export_csv_file = os.path.splitext(self.export_csv_file)[0] + self.export_extension()
+            self.entry_export_csv.delete(0, tk.END)
+            self.entry_export_csv.insert(0, self.export_csv_file)
+    
+    def browse_dnt_file(self):
+        file_path = filedialog.askopenfilename(filetypes=[("Text Files", "*.txt")])
+        if file_path:
+            self.dnt_file = file_path
+            self.entry_dnt.delete(0, tk.END)
+            self.entry_dnt.insert(0, file_path)
+            self.log("已选择不翻译词表: " + file_path)
+    
+    def build_segment_filter(self):
+        """根据导出页的过滤设置构造 SegmentFilter"""
+        skip_rules = set(name for name, var in self.export_rule_vars.items() if not var.get())
+        if not self.export_numbers.get():
+            skip_rules.add('number')
+        if not self.export_blanks.get():
+            skip_rules.add('blank')
+        
+        dnt_terms = []
+        if self.dnt_file:
+            try:
+                dnt_terms = load_dnt_terms(self.dnt_file)
+            except (OSError, UnicodeDecodeError) as e:
+                self.log(f"读取不翻译词表失败: {str(e)}")
+        
+        try:
+            min_length = max(0, self.min_length.get())
+        except tk.TclError:
+            min_length = 0
+        return SegmentFilter(skip_rules, dnt_terms, min_length)
+    
+    def get_export_options(self):
+        """读取导出页的合并、过滤与预翻译设置"""
+        options = {
+            'segment_filter': self.build_segment_filter(),
+            'merge_segments': self.merge_segments.get(),
+            'merge_threshold': self.merge_threshold.get(),
+            'index_db': INDEX_DB if self.update_index.get() else None,
+            'translator': None,
+        }
+        if self.pretranslate_enabled.get() and self.mt_url.get().strip():
+            translator = HttpTranslator(self.mt_url.get().strip(), self.mt_source_lang.get().strip(),
+                                        self.mt_target_lang.get().strip())
+            options['translator'] = translator
+            try:
+                options['translation_cache'] = TranslationCache(TRANSLATION_CACHE_DB, translator.name)
+            except (sqlite3.Error, OSError) as e:
+                # 缓存只是加速手段，打不开时照常导出
+                self.log(f"无法打开译文缓存，本次不使用缓存: {str(e)}")
+                options['translation_cache'] = None
+            try:
+                options['mt_batch_size'] = max(1, self.mt_batch_size.get())
+                options['mt_workers'] = max(1, self.mt_workers.get())
+            except tk.TclError:
+                options['mt_batch_size'], options['mt_workers'] = 50, 4
+        return options
+    
+    def run_in_background(self, func, callback, poll_ms=100):
+        """
+        在工作线程中执行 func（翻译服务的 HTTP 请求可能持续数分钟），界面保持响应；
+        Tk 线程用 after 轮询结果，完成后调用 callback(结果, 异常)，工作线程不直接操作界面
+        """
+        results = queue.Queue()
+        
+        def worker():
+            try:
+                results.put((func(), None))
+            except Exception as e:
+                results.put((None, e))
+        
+        def poll():
+            try:
+                result, error = results.get_nowait()
+            except queue.Empty:
+                self.root.after(poll_ms, poll)
+                return
+            callback(result, error)
+        
+        threading.Thread(target=worker, daemon=True).start()
+        self.root.after(poll_ms, poll)
+    
+    def run_pretranslation(self, segment_lists, options, callback):
+        """
+        在后台预翻译多个文件的句段（合并去重后一次提交），完成后在 Tk 线程中调用 callback(译文字典或 None)
+        未启用预翻译时直接调用 callback(None)
+        """
+        if not options['translator']:
+            callback(None)
+            return
+        texts = [segment['text'] for segments in segment_lists for segment in segments]
+        self.log(f"正在后台预翻译 {len(texts)} 个句段...")
+        
+        def done(result, error):
+            if error is not None:
+                self.log(f"  - 预翻译出错: {str(error)}")
+                callback(None)
+                return
+            translations, stats = result
+            self.log(f"  - 预翻译: 唯一句段 {stats['unique']}，缓存命中 {stats['cached']}，"
+                     f"新翻译 {stats['translated']}，失败 {stats['failed']}")
+            if stats['errors']:
+                self.log(f"  - 预翻译出错: {stats['errors'][0]}")
+            callback(translations)
+        
+        self.run_in_background(lambda: pretranslate(texts, options['translator'], options['translation_cache'],
+                                                    options['mt_batch_size'], options['mt_workers']), done)
+    
+    def extract_for_export(self, ai_file, options, show_message=True, raise_errors=False):
+        """
+        提取单个 AI 文件的句段并过滤（Illustrator COM 调用，在 Tk 线程中执行）
+        :param raise_errors: 提取失败时抛出异常（监控模式据此决定是否标记为已处理）
+        :return: (提取到的全部句段（为空表示跳过）, 过滤后保留的句段)
+        """
+        segments = extract_segments_from_ai(
+            ai_file, 
+            merge_segments=options['merge_segments'],
+            merge_threshold=options['merge_threshold'],
+            show_message=show_message,
+            index_db=options['index_db'],
+            raise_errors=raise_errors
+        )
+        # 先过滤再预翻译，跳过的句段不发送给翻译服务
+        kept = options['segment_filter'].apply(segments, key=lambda segment: segment['text']) if segments else []
+        return segments, kept
     
     def export_text(self):
         if not self.export_ai_file and not self.export_ai_folder:
@@ -340,81 +1348,238 @@ class AIProcessorApp:
             return
         
         # 获取导出选项状态
-        export_numbers = self.export_numbers.get()
-        export_blanks = self.export_blanks.get()
-        merge_segments = self.merge_segments.get()
-        merge_threshold = self.merge_threshold.get()
+        options = self.get_export_options()
+        merge_segments = options['merge_segments']
+        segment_filter = options['segment_filter']
         
         # 记录设置
         settings_info = []
         if merge_segments:
-            settings_info.append(f"合并句段(阈值={merge_threshold}px)")
-        if not export_numbers:
+            settings_info.append(f"合并句段(阈值={options['merge_threshold']}px)")
+        if not self.export_numbers.get():
             settings_info.append("跳过纯数字")
-        if not export_blanks:
+        if not self.export_blanks.get():
             settings_info.append("跳过空白内容")
+        for name, var in self.export_rule_vars.items():
+            if not var.get():
+                settings_info.append(f"跳过{RULE_LABELS[name]}")
+        if segment_filter.min_length:
+            settings_info.append(f"跳过少于 {segment_filter.min_length} 个字符的句段")
+        if segment_filter.dnt_matcher:
+            settings_info.append("跳过不翻译词")
         
         if settings_info:
             self.log(f"导出设置: {', '.join(settings_info)}")
         
         if self.export_ai_file:
-            texts = extract_text_from_ai(
-                self.export_ai_file, 
-                merge_segments=merge_segments,
-                merge_threshold=merge_threshold
-            )
+            if not self.export_csv_file:
+                self.export_csv_file = os.path.join(os.path.dirname(self.export_ai_file), 
+                                                     f"{os.path.splitext(os.path.basename(self.export_ai_file))[0]}{self.export_extension()}")
+            
+            texts, kept = self.extract_for_export(self.export_ai_file, options)
             
             if not texts:
                 messagebox.showwarning("警告", "未提取到任何文本内容")
                 return
-                
-            if not self.export_csv_file:
-                self.export_csv_file = os.path.join(os.path.dirname(self.export_ai_file), 
-                                                     f"{os.path.splitext(os.path.basename(self.export_ai_file))[0]}.csv")
             
             # 记录合并信息
             if merge_segments:
                 self.log(f"合并后句段数量: {len(texts)}")
+            ai_file, output_path = self.export_ai_file, self.export_csv_file
             
-            generate_translation_csv(texts, self.export_csv_file, 
-                                     os.path.basename(self.export_ai_file),
-                                     export_numbers, export_blanks)
-            self.log("成功导出翻译模板")
+            def write(translations):
+                if generate_translation_file(kept, output_path, os.path.basename(ai_file), translations=translations):
+                    self.log("成功导出翻译模板")
+                self.log_filter_hits(segment_filter)
+            
+            self.run_pretranslation([kept], options, write)
             
         elif self.export_ai_folder:
             output_folder = os.path.join(self.export_ai_folder, "output")
             if not os.path.exists(output_folder):
                 os.makedirs(output_folder)
             
-            processed_count = 0
             skipped_count = 0
+            extension = self.export_extension()
+            folder = self.export_ai_folder
+            consolidate = self.consolidate_export.get()
+            
+            # 先在 Tk 线程中逐个提取（COM 调用），预翻译在后台完成后再统一写出
+            extracted = []  # [(文件名, 输出路径, 保留的句段)]
+            for filename in os.listdir(folder):
+                if not filename.endswith(".ai"):
+                    continue
+                ai_file = os.path.join(folder, filename)
+                output_csv = os.path.join(output_folder, f"{os.path.splitext(filename)[0]}{extension}")
+                
+                # 提取文本（应用合并设置）
+                texts, kept = self.extract_for_export(ai_file, options)
+                
+                if texts:
+                    extracted.append((filename, output_csv, kept))
+                    # 记录合并信息
+                    if merge_segments:
+                        self.log(f"  - {filename} 合并后句段数量: {len(texts)}")
+                else:
+                    skipped_count += 1
+                    self.log(f"跳过空文件: {filename}")
             
-            for filename in os.listdir(self.export_ai_folder):
-                if filename.endswith(".ai"):
-                    ai_file = os.path.join(self.export_ai_folder, filename)
-                    
-                    # 提取文本（应用合并设置）
-                    texts = extract_text_from_ai(
-                        ai_file, 
-                        merge_segments=merge_segments,
-                        merge_threshold=merge_threshold
-                    )
-                    
-                    if texts:
-                        output_csv = os.path.join(output_folder, f"{os.path.splitext(filename)[0]}.csv")
-                        generate_translation_csv(texts, output_csv, filename, 
-                                               export_numbers, export_blanks)
+            def write(translations):
+                processed_count = 0
+                # 合并导出：所有 AI 文件的句段流式写入同一个文件
+                writer = None
+                if consolidate:
+                    try:
+                        writer = open_translation_writer(consolidated_export_path(folder, output_folder, extension))
+                    except Exception as e:
+                        messagebox.showerror("错误", f"创建导出文件失败: {str(e)}")
+                        return
+                try:
+                    for filename, output_csv, kept in extracted:
+                        if writer is not None:
+                            write_translation_segments(writer, kept, filename, translations=translations)
+                        elif not generate_translation_file(kept, output_csv, filename, translations=translations):
+                            continue
                         processed_count += 1
                         self.log(f"成功导出: {filename}")
-                        
-                        # 记录合并信息
-                        if merge_segments:
-                            self.log(f"  - 合并后句段数量: {len(texts)}")
-                    else:
-                        skipped_count += 1
-                        self.log(f"跳过空文件: {filename}")
+                finally:
+                    if writer is not None:
+                        writer.close()
+                        self.log(f"已合并导出到: {writer.path}")
+                
+                self.log(f"批量导出完成: 处理 {processed_count} 个文件, 跳过 {skipped_count} 个文件")
+                self.log_filter_hits(segment_filter)
             
-            self.log(f"批量导出完成: 处理 {processed_count} 个文件, 跳过 {skipped_count} 个文件")
+            self.run_pretranslation([kept for _, _, kept in extracted], options, write)
+    
+    def log_filter_hits(self, segment_filter):
+        if segment_filter.hit_counts:
+            self.log(f"已过滤句段: {segment_filter.summary()}")
+    
+    # --------------------------
+    # 文件夹监控
+    # --------------------------
+    def toggle_watch(self):
+        if self.watcher:
+            self.stop_watch()
+            return
+        
+        if not self.export_ai_folder:
+            messagebox.showwarning("警告", "请先选择要监控的 AI 文件夹")
+            return
+        
+        output_folder = os.path.join(self.export_ai_folder, "output")
+        os.makedirs(output_folder, exist_ok=True)
+        self.watcher = FolderWatcher(self.export_ai_folder, os.path.join(output_folder, WATCH_STATE_FILE))
+        self.btn_watch.config(text="停止监控")
+        self.log(f"开始监控文件夹: {self.export_ai_folder}")
+        self.poll_watch_folder()
+    
+    def stop_watch(self):
+        if self.watch_job:
+            self.root.after_cancel(self.watch_job)
+            self.watch_job = None
+        self.watcher = None
+        self.btn_watch.config(text="开始监控")
+        self.log("已停止监控")
+    
+    def poll_watch_folder(self):
+        """在 Tk 主循环中定时扫描，两次扫描之间不占用 CPU"""
+        self.watch_job = None
+        try:
+            changed = self.watcher.scan()
+        except OSError as e:
+            self.log(f"监控出错: {str(e)}")
+            changed = []
+        
+        watcher = self.watcher
+        if not changed:
+            self.schedule_watch(watcher)
+            return
+        
+        options = self.get_export_options()
+        # 监控开始后可能又选择了别的文件夹，始终以监控的文件夹为准
+        output_folder = os.path.join(watcher.folder, "output")
+        extension = self.export_extension()
+        extracted = []  # [(文件名, 文件信息, 输出路径, 保留的句段)]
+        for filename, info in changed:
+            try:
+                texts, kept = self.extract_for_export(os.path.join(watcher.folder, filename), options,
+                                                      show_message=False, raise_errors=True)
+            except Exception as e:
+                # 不标记为已处理，文件稳定后下次扫描重试
+                self.log(f"[监控] 导出失败: {filename}: {str(e)}")
+                continue
+            if texts:
+                output_path = os.path.join(output_folder, f"{os.path.splitext(filename)[0]}{extension}")
+                extracted.append((filename, info, output_path, kept))
+            else:
+                self.log(f"[监控] 未提取到文本: {filename}")
+                watcher.mark_done(filename, info)
+        
+        def write(translations):
+            for filename, info, output_path, kept in extracted:
+                try:
+                    generate_translation_file(kept, output_path, filename, show_message=False,
+                                              translations=translations, raise_errors=True)
+                except Exception as e:
+                    self.log(f"[监控] 导出失败: {filename}: {str(e)}")
+                    continue
+                self.log(f"[监控] 已更新: {filename}")
+                watcher.mark_done(filename, info)
+            self.log_filter_hits(options['segment_filter'])
+            self.schedule_watch(watcher)
+        
+        # 预翻译在后台进行，完成前不再扫描
+        self.run_pretranslation([kept for _, _, _, kept in extracted], options, write)
+    
+    def schedule_watch(self, watcher):
+        """安排下一次扫描；期间已停止监控（或重新开始了另一个监控）时不再安排"""
+        if self.watcher is not watcher:
+            return
+        try:
+            interval = max(1, self.watch_interval.get())
+        except tk.TclError:
+            interval = 2
+        self.watch_job = self.root.after(interval * 1000, self.poll_watch_folder)
+    
+    # --------------------------
+    # 搜索页相关控件
+    # --------------------------
+    def create_search_widgets(self, frame):
+        search_bar = ttk.Frame(frame)
+        search_bar.pack(fill=tk.X, padx=5, pady=5)
+        ttk.Label(search_bar, text="查找短语:").pack(side=tk.LEFT, padx=5)
+        self.entry_search = ttk.Entry(search_bar, width=50)
+        self.entry_search.pack(side=tk.LEFT, padx=5)
+        self.entry_search.bind("<Return>", lambda event: self.search_index())
+        ttk.Button(search_bar, text="搜索", command=self.search_index).pack(side=tk.LEFT, padx=5)
+        
+        columns = ("file", "frame", "position", "content")
+        self.search_tree = ttk.Treeview(frame, columns=columns, show="headings", height=12)
+        for column, heading, width in zip(columns, ("文件", "文本框", "坐标", "内容"), (220, 60, 120, 340)):
+            self.search_tree.heading(column, text=heading)
+            self.search_tree.column(column, width=width, anchor="w")
+        self.search_tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        
+        self.search_status = ttk.Label(frame, text="* 在已导出的 AI 文件中检索，导出时会自动更新索引", foreground="gray")
+        self.search_status.pack(anchor="w", padx=5)
+    
+    def search_index(self):
+        query = self.entry_search.get()
+        start = time.perf_counter()
+        try:
+            rows = search_text_index(query)
+        except sqlite3.Error as e:
+            messagebox.showerror("错误", f"搜索失败: {str(e)}")
+            return
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        
+        self.search_tree.delete(*self.search_tree.get_children())
+        for path, frame_key, x, y, content in rows:
+            self.search_tree.insert("", tk.END, values=(
+                os.path.basename(path), frame_key, f"({x:.1f}, {y:.1f})", content.replace("\r", " ")))
+        self.search_status.config(text=f"找到 {len(rows)} 条结果，用时 {elapsed_ms:.1f} ms")
     
     # --------------------------
     # 导入页相关控件
@@ -428,8 +1593,8 @@ class AIProcessorApp:
         ttk.Button(frame, text="浏览文件", command=self.browse_import_ai_file).grid(row=row, column=2, padx=5, pady=5)
         
         row += 1
-        # 选择含有译文的 CSV 文件
-        ttk.Label(frame, text="CSV 文件路径:").grid(row=row, column=0, padx=5, pady=5, sticky="w")
+        # 选择含有译文的文件（CSV / XLSX / XLIFF）
+        ttk.Label(frame, text="译文文件路径:").grid(row=row, column=0, padx=5, pady=5, sticky="w")
         self.entry_import_csv = ttk.Entry(frame, width=50)
         self.entry_import_csv.grid(row=row, column=1, padx=5, pady=5)
         ttk.Button(frame, text="浏览文件", command=self.browse_import_csv_file).grid(row=row, column=2, padx=5, pady=5)
@@ -458,12 +1623,12 @@ class AIProcessorApp:
             self.log("已选择更新的 AI 文件: " + file_path)
     
     def browse_import_csv_file(self):
-        file_path = filedialog.askopenfilename(filetypes=[("CSV Files", "*.csv")])
+        file_path = filedialog.askopenfilename(filetypes=TRANSLATION_FILETYPES)
         if file_path:
             self.import_csv_file = file_path
             self.entry_import_csv.delete(0, tk.END)
             self.entry_import_csv.insert(0, file_path)
-            self.log("已选择译文 CSV 文件: " + file_path)
+            self.log("已选择译文文件: " + file_path)
     
     def update_text_import(self, mode):
         if not self.import_ai_file:
@@ -471,22 +1636,16 @@ class AIProcessorApp:
             return
         
         if not self.import_csv_file:
-            messagebox.showwarning("警告", "请先选择 CSV 文件")
+            messagebox.showwarning("警告", "请先选择译文文件")
             return
         
         try:
-            # 读取CSV文件
-            translations = []
-            with open(self.import_csv_file, 'r', encoding='utf-8-sig') as csvfile:
-                reader = csv.reader(csvfile)
-                next(reader)  # 跳过文件名行
-                next(reader)  # 跳过标题行
-                for row in reader:
-                    if len(row) >= 2:  # 确保有译文列
-                        translations.append(row[1])
+            # 读取译文（合并导出的文件只取当前 AI 文件的部分）
+            items = read_translations(self.import_csv_file, os.path.basename(self.import_ai_file))
+            translations = translations_for_update(items)
             
             if not translations:
-                messagebox.showwarning("警告", "CSV文件中未找到有效的译文")
+                messagebox.showwarning("警告", "译文文件中未找到有效的译文")
                 return
             
             font = self.combo_font.get().strip() or None
@@ -495,7 +1654,7 @@ class AIProcessorApp:
                 self.log(f"成功{action}译文")
         except Exception as e:
             self.log(f"错误: {str(e)}")
-            messagebox.showerror("错误", f"处理CSV文件失败: {str(e)}")
+            messagebox.showerror("错误", f"处理译文文件失败: {str(e)}")
     
     def log(self, message):
         self.log_text.configure(state="normal")
@@ -506,7 +1665,27 @@ class AIProcessorApp:
 # --------------------------
 # 启动程序
 # --------------------------
+def search_cli(argv):
+    """命令行检索：python ai_2_word.py search 短语 [--db 索引路径]"""
+    parser = argparse.ArgumentParser(prog="ai_2_word.py search", description="在 AI 文本全文索引中检索")
+    parser.add_argument("query", help="要查找的短语")
+    parser.add_argument("--db", default=INDEX_DB, help="索引数据库路径")
+    parser.add_argument("--limit", type=int, default=200, help="最多返回的结果数")
+    args = parser.parse_args(argv)
+    
+    start = time.perf_counter()
+    rows = search_text_index(args.query, args.db, args.limit)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    for path, frame_key, x, y, content in rows:
+        print(f"{path}\t#{frame_key}\t({x:.1f}, {y:.1f})\t{content}")
+    print(f"共 {len(rows)} 条结果，用时 {elapsed_ms:.1f} ms")
+
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "search":
+        search_cli(sys.argv[2:])
+        sys.exit(0)
+    
+    import_gui()
     root = tk.Tk()
     app = AIProcessorApp(root)
     root.mainloop()
\ No newline at end of file
@@ -1,8 +1,392 @@
 import os
-import win32com.client as win32
-from ttkbootstrap import *
-from tkinter import filedialog, messagebox
+import re
+import sys
+import html
+import time
+import argparse
+import posixpath
+import tempfile
+import zipfile
+from xml.sax.saxutils import escape as xml_escape
 from datetime import datetime
+try:
+    import win32com.client as win32
+except ImportError:  # 非 Windows 环境只能使用离线引擎
+    win32 = None
+try:
+    from ttkbootstrap import *
+    from tkinter import filedialog, messagebox
+except ImportError:  # 服务器上只用命令行时可以不装界面库
+    pass
+
+def process_escape_text(text):
+    """把输入框中的 \\n、\\r 转成真正的换行符"""
+    return text.replace(r'\n', '\n').replace(r'\r', '\r')
+
+class OpenXmlReplaceEngine:
+    """
+    离线替换引擎：直接读写 .xlsx/.xlsm 包中的 XML，不需要 Excel
+    单元格文本在共享字符串表和内联字符串中替换，文本框/图形的文字在 drawing XML 中替换，
+    图表的标题等富文本在图表部件中替换；其余部件（样式、公式、VBA 等）原样写回。
+    连接线（xdr:cxnSp）和图片没有文字；SmartArt 等其他图形框的文字不替换，只记录到日志
+    """
+    SST_PATH = 'xl/sharedStrings.xml'
+    SI_PATTERN = re.compile(r'<si>.*?</si>|<si/>', re.S)
+    CELL_T_PATTERN = re.compile(r'(<t(?:\s[^>]*)?>)(.*?)(</t>)', re.S)
+    PHONETIC_PATTERN = re.compile(r'<rPh\b.*?</rPh>', re.S)
+    # 只匹配字符串单元格（共享字符串和内联字符串），数字、公式单元格不动
+    STRING_CELL_PATTERN = re.compile(r'(<c\b[^>]*?\bt="(s|inlineStr)"[^>]*?(?<!/)>)(.*?)(</c>)', re.S)
+    # 带文字的形状（文本框/自选图形）和图形框（图表、表格、SmartArt 等）
+    SHAPE_PATTERN = re.compile(r'<xdr:(sp|graphicFrame)\b.*?</xdr:\1>', re.S)
+    GRAPHIC_DATA_PATTERN = re.compile(r'<a:graphicData\b[^>]*?\buri="([^"]*)"')
+    # 图形框中可以直接替换的内容：图表（文字在图表部件中，见 process_chart）和表格（文字就在框内）
+    CHART_URI = 'http://schemas.openxmlformats.org/drawingml/2006/chart'
+    TABLE_URI = 'http://schemas.openxmlformats.org/drawingml/2006/table'
+    SHAPE_NAME_PATTERN = re.compile(r'<xdr:cNvPr\b[^>]*?\bname="([^"]*)"')
+    PARAGRAPH_PATTERN = re.compile(r'<a:p\b[^>]*?(?<!/)>.*?</a:p>', re.S)
+    DRAWING_T_PATTERN = re.compile(r'(<a:t(?:\s[^>]*)?>)(.*?)(</a:t>)', re.S)
+    SHARED_CELL_PATTERN = re.compile(r'<c\b[^>]*?\bt="s"')
+    SHEET_PATTERN = re.compile(r'<sheet\b[^>]*>')
+    REL_PATTERN = re.compile(r'<Relationship\b[^>]*>')
+    ATTR_PATTERN = re.compile(r'([\w:]+)="([^"]*)"')
+
+    def __init__(self, find_text, replace_text, scope="workbook", cells=True, shapes=True, log=print):
+        """
+        :param find_text: 查找内容（已处理转义字符）
+        :param replace_text: 替换内容
+        :param scope: "workbook" 处理全部工作表，"worksheet" 只处理文件保存时的活动工作表
+        :param cells: 是否替换单元格
+        :param shapes: 是否替换文本框/图形
+        :param log: 日志函数
+        """
+        self.find_text = find_text
+        self.replace_text = replace_text
+        self.scope = scope
+        self.cells = cells
+        self.shapes = shapes
+        self.log = log
+
+    def replace_runs(self, fragment, pattern, skip=()):
+        """
+        在一段 XML（一个共享字符串或一个段落）的文本节点中替换
+        匹配都落在单个节点内时逐节点替换，保留每段文字的格式；跨节点的匹配把整段文字合并到第一个节点
+        :param skip: 不参与替换的区间（如注音）
+        :return: (新的 XML, 原文字, 新文字, 替换次数)
+        """
+        matches = [m for m in pattern.finditer(fragment)
+                   if not any(start <= m.start() < end for start, end in skip)]
+        texts = [html.unescape(m.group(2)) for m in matches]
+        full = "".join(texts)
+        count = full.count(self.find_text)
+        if not count:
+            return fragment, full, full, 0
+        if sum(t.count(self.find_text) for t in texts) == count:
+            new_texts = [t.replace(self.find_text, self.replace_text) for t in texts]
+        else:
+            new_texts = [full.replace(self.find_text, self.replace_text)] + [""] * (len(texts) - 1)
+        parts, pos = [], 0
+        for m, text in zip(matches, new_texts):
+            open_tag = m.group(1)
+            # 单元格文字首尾有空白或含换行时需要 xml:space="preserve"，否则 Excel 会丢掉
+            if open_tag.startswith('<t') and 'xml:space' not in open_tag and text != text.strip():
+                open_tag = open_tag[:-1] + ' xml:space="preserve">'
+            parts.append(fragment[pos:m.start()])
+            parts.append(open_tag + xml_escape(text) + m.group(3))
+            pos = m.end()
+        parts.append(fragment[pos:])
+        return "".join(parts), full, "".join(new_texts), count
+
+    def replace_shared_string(self, si):
+        skip = [(m.start(), m.end()) for m in self.PHONETIC_PATTERN.finditer(si)]
+        new_si, _, _, count = self.replace_runs(si, self.CELL_T_PATTERN, skip)
+        return new_si, count
+
+    def process_cells(self, xml, sheet_name, strings, in_place):
+        """
+        替换一个工作表中的字符串单元格
+        :param strings: 共享字符串状态 {'items': [...], 'changes': {原下标: (新下标, 次数)}}
+        :param in_place: True 时直接修改共享字符串（所有工作表都要替换）；否则追加新字符串并改写本表的下标
+        :return: (新的 XML 或 None, 替换次数)
+        """
+        replacements = 0
+        modified = False
+
+        def replace_cell(m):
+            nonlocal replacements, modified
+            open_tag, kind, body, close_tag = m.groups()
+            if kind == 'inlineStr':
+                new_body, _, _, count = self.replace_runs(body, self.CELL_T_PATTERN)
+                if count:
+                    replacements += count
+                    modified = True
+                return open_tag + new_body + close_tag
+            v = re.search(r'<v>(\d+)</v>', body)
+            if not v or strings is None:
+                return m.group(0)
+            index = int(v.group(1))
+            if index not in strings['changes']:
+                items = strings['items']
+                new_si, count = self.replace_shared_string(items[index]) if index < len(items) else ("", 0)
+                new_index = index
+                if count:
+                    if in_place:
+                        items[index] = new_si
+                    else:
+                        new_index = len(items)
+                        items.append(new_si)
+                    strings['modified'] = True
+                strings['changes'][index] = (new_index, count)
+            new_index, count = strings['changes'][index]
+            replacements += count
+            if new_index == index:
+                return m.group(0)
+            modified = True
+            return open_tag + body.replace(v.group(0), f'<v>{new_index}</v>') + close_tag
+
+        new_xml = self.STRING_CELL_PATTERN.sub(replace_cell, xml)
+        if replacements:
+            self.log(f"工作表 [{sheet_name}]：单元格共替换 {replacements} 项")
+        return (new_xml if modified else None), replacements
+
+    def process_drawing(self, xml, sheet_name):
+        """替换一个 drawing 部件中所有形状（含组合内的形状）的文字，返回 (新的 XML 或 None, 替换次数)"""
+        replacements = 0
+
+        def replace_shape(m):
+            nonlocal replacements
+            shape = m.group(0)
+            name = self.SHAPE_NAME_PATTERN.search(shape)
+            if m.group(1) == 'graphicFrame':
+                uri = self.GRAPHIC_DATA_PATTERN.search(shape)
+                uri = uri.group(1) if uri else ''
+                if uri == self.CHART_URI:
+                    return shape
+                if uri != self.TABLE_URI:
+                    self.log(f"工作表 [{sheet_name}] 图形框 [{name.group(1) if name else ''}]："
+                             f"不支持的类型（{uri or '未知'}），未替换")
+                    return shape
+            originals, updated, count = [], [], 0
+
+            def replace_paragraph(p):
+                nonlocal count
+                new_p, orig, new, n = self.replace_runs(p.group(0), self.DRAWING_T_PATTERN)
+                originals.append(orig)
+                updated.append(new)
+                count += n
+                return new_p
+
+            new_shape = self.PARAGRAPH_PATTERN.sub(replace_paragraph, shape)
+            if count:
+                replacements += count
+                self.log(f"工作表 [{sheet_name}] 形状 [{name.group(1) if name else ''}]："
+                         f"{chr(10).join(originals)} → {chr(10).join(updated)}")
+            return new_shape
+
+        new_xml = self.SHAPE_PATTERN.sub(replace_shape, xml)
+        return (new_xml if replacements else None), replacements
+
+    def process_chart(self, xml, sheet_name, chart_path):
+        """
+        替换图表部件中富文本（标题、坐标轴标题、手动编辑的数据标签）的文字，返回 (新的 XML 或 None, 替换次数)
+        系列名称、分类等来自单元格的文字在缓存中，Excel 打开时按单元格刷新，不在这里改
+        """
+        originals, updated, count = [], [], 0
+
+        def replace_paragraph(p):
+            nonlocal count
+            new_p, orig, new, n = self.replace_runs(p.group(0), self.DRAWING_T_PATTERN)
+            if n:
+                originals.append(orig)
+                updated.append(new)
+                count += n
+            return new_p
+
+        new_xml = self.PARAGRAPH_PATTERN.sub(replace_paragraph, xml)
+        if count:
+            self.log(f"工作表 [{sheet_name}] 图表 [{posixpath.basename(chart_path)}]："
+                     f"{chr(10).join(originals)} → {chr(10).join(updated)}")
+        return (new_xml if count else None), count
+
+    def resolve_target(self, base_path, target):
+        """关系中的 Target 转为包内路径"""
+        if target.startswith('/'):
+            return target.lstrip('/')
+        return posixpath.normpath(posixpath.join(posixpath.dirname(base_path), target))
+
+    def rels_path(self, part_path):
+        directory, name = posixpath.split(part_path)
+        return posixpath.join(directory, '_rels', name + '.rels')
+
+    def attributes(self, tag):
+        """标签的属性字典（不依赖属性顺序，各种工具写出的顺序不同）"""
+        return {name: html.unescape(value) for name, value in self.ATTR_PATTERN.findall(tag)}
+
+    def relationships(self, package, part_path):
+        """部件的关系列表 [(Id, Type, 包内路径), ...]"""
+        rels_path = self.rels_path(part_path)
+        if rels_path not in package.namelist():
+            return []
+        rels = package.read(rels_path).decode('utf-8')
+        result = []
+        for tag in self.REL_PATTERN.findall(rels):
+            attrs = self.attributes(tag)
+            if attrs.get('TargetMode') == 'External' or 'Target' not in attrs:
+                continue
+            result.append((attrs.get('Id'), attrs.get('Type', ''), self.resolve_target(part_path, attrs['Target'])))
+        return result
+
+    def list_sheets(self, package):
+        """返回 [(工作表名, 工作表 XML 路径), ...]；按 scope 只保留活动工作表"""
+        workbook = package.read('xl/workbook.xml').decode('utf-8')
+        targets = {rid: path for rid, _, path in self.relationships(package, 'xl/workbook.xml')}
+        sheets = []
+        for tag in self.SHEET_PATTERN.findall(workbook):
+            attrs = self.attributes(tag)
+            sheets.append((attrs.get('name', ''), targets.get(attrs.get('r:id'))))
+        if self.scope == "worksheet":
+            active = re.search(r'<workbookView\b[^>]*?\bactiveTab="(\d+)"', workbook)
+            index = int(active.group(1)) if active else 0
+            sheets = sheets[index:index + 1]
+        # 图表工作表等没有单元格，跳过
+        return [(name, path) for name, path in sheets if path and '/worksheets/' in '/' + path]
+
+    def process_file(self, src, dst=None):
+        """
+        处理一个文件
+        :param src: 源文件（.xlsx/.xlsm）
+        :param dst: 输出文件，默认覆盖源文件（先写临时文件再替换）
+        :return: 替换次数
+        """
+        dst = dst or src
+        total = 0
+        changed = {}
+        with zipfile.ZipFile(src) as package:
+            names = set(package.namelist())
+            strings = None
+            if self.cells and self.SST_PATH in names:
+                sst = package.read(self.SST_PATH).decode('utf-8')
+                strings = {'xml': sst, 'items': [m.group(0) for m in self.SI_PATTERN.finditer(sst)],
+                           'changes': {}, 'modified': False}
+            sheets = self.list_sheets(package)
+            # 只处理部分工作表时不能改共享字符串本身，其他工作表可能引用同一个字符串
+            in_place = self.scope == "workbook"
+            for sheet_name, sheet_path in sheets:
+                if self.cells and sheet_path in names:
+                    new_xml, count = self.process_cells(package.read(sheet_path).decode('utf-8'),
+                                                        sheet_name, strings, in_place)
+                    total += count
+                    if new_xml is not None:
+                        changed[sheet_path] = new_xml.encode('utf-8')
+                if self.shapes:
+                    for _, rel_type, drawing_path in self.relationships(package, sheet_path):
+                        if not rel_type.endswith('/drawing') or drawing_path not in names:
+                            continue
+                        new_xml, count = self.process_drawing(package.read(drawing_path).decode('utf-8'),
+                                                              sheet_name)
+                        total += count
+                        if new_xml is not None:
+                            changed[drawing_path] = new_xml.encode('utf-8')
+                        for _, chart_type, chart_path in self.relationships(package, drawing_path):
+                            if not chart_type.endswith('/chart') or chart_path not in names:
+                                continue
+                            new_xml, count = self.process_chart(package.read(chart_path).decode('utf-8'),
+                                                                sheet_name, chart_path)
+                            total += count
+                            if new_xml is not None:
+                                changed[chart_path] = new_xml.encode('utf-8')
+            if strings is not None and strings['modified']:
+                # 只处理活动工作表时追加了新字符串、改写了下标，两个计数都要按实际重算
+                references = None if in_place else self.count_shared_references(package, changed)
+                changed[self.SST_PATH] = self.build_shared_strings(strings, references).encode('utf-8')
+            if not changed and dst == src:
+                return total
+            self.write_package(package, changed, dst)
+        return total
+
+    def set_sst_attribute(self, head, name, value):
+        """设置 <sst> 标签的计数属性，原来没有就补上"""
+        pattern = re.compile(r'(<sst\b[^>]*?\s' + name + r'=")\d*(")')
+        if pattern.search(head):
+            return pattern.sub(lambda m: m.group(1) + str(value) + m.group(2), head, count=1)
+        return re.sub(r'<sst\b', lambda m: f'{m.group(0)} {name}="{value}"', head, count=1)
+
+    def count_shared_references(self, package, changed):
+        """统计所有工作表中共享字符串单元格的个数（sst 的 count 属性）"""
+        references = 0
+        for _, rel_type, path in self.relationships(package, 'xl/workbook.xml'):
+            if rel_type.endswith('/worksheet') and (path in changed or path in package.namelist()):
+                xml = changed[path] if path in changed else package.read(path)
+                references += len(self.SHARED_CELL_PATTERN.findall(xml.decode('utf-8')))
+        return references
+
+    def build_shared_strings(self, strings, references=None):
+        """
+        重新生成共享字符串表
+        :param references: 共享字符串的引用总数，None 表示引用没有变化、count 保持原值
+        """
+        sst = strings['xml']
+        matches = list(self.SI_PATTERN.finditer(sst))
+        head, tail = sst[:matches[0].start()], sst[matches[-1].end():]
+        head = self.set_sst_attribute(head, 'uniqueCount', len(strings['items']))
+        if references is not None:
+            head = self.set_sst_attribute(head, 'count', references)
+        return head + "".join(strings['items']) + tail
+
+    def write_package(self, package, changed, dst):
+        """写出新的包：修改过的部件用新内容，其余部件原样复制，条目顺序和压缩方式不变"""
+        fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(os.path.abspath(dst)))
+        os.close(fd)
+        try:
+            with zipfile.ZipFile(tmp_path, 'w') as out:
+                for info in package.infolist():
+                    out.writestr(info, changed.get(info.filename) or package.read(info))
+            self.copy_permissions(package.filename, dst, tmp_path)
+            os.replace(tmp_path, dst)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def copy_permissions(self, src, dst, tmp_path):
+        """
+        临时文件由 mkstemp 创建，权限是 0o600；改成被覆盖文件（输出到新位置时用源文件）的权限和属主，
+        都取不到时按 umask 给默认权限
+        """
+        reference = dst if os.path.exists(dst) else src
+        if reference and os.path.exists(reference):
+            st = os.stat(reference)
+            os.chmod(tmp_path, st.st_mode & 0o7777)
+            if hasattr(os, 'chown'):
+                try:
+                    os.chown(tmp_path, st.st_uid, st.st_gid)
+                except OSError:
+                    pass  # 非 root 不能改属主，保留当前用户
+        else:
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(tmp_path, 0o666 & ~umask)
+
+    def run(self, paths, output_dir=None):
+        """
+        批量处理文件
+        :param paths: 文件路径列表
+        :param output_dir: 输出目录，默认覆盖原文件
+        :return: 总替换次数
+        """
+        total = 0
+        for path in paths:
+            if not path.lower().endswith(('.xlsx', '.xlsm')):
+                self.log(f"跳过 {path}：离线模式只支持 .xlsx/.xlsm")
+                continue
+            dst = os.path.join(output_dir, os.path.basename(path)) if output_dir else None
+            start = time.perf_counter()
+            try:
+                count = self.process_file(path, dst)
+            except (OSError, zipfile.BadZipFile, KeyError, UnicodeDecodeError) as e:
+                self.log(f"处理 {path} 出错：{e}")
+                continue
+            total += count
+            self.log(f"{os.path.basename(path)}：替换 {count} 处，耗时 {time.perf_counter() - start:.2f} 秒")
+        return total
 
 class ExcelFindReplaceTool:
     def __init__(self, master):
@@ -15,7 +399,8 @@ class ExcelFindReplaceTool:
         self.log = []
 
         self.create_widgets()
-        self.connect_to_excel()
+        if self.engine_var.get() == "com":
+            self.connect_to_excel()
 
     def create_widgets(self):
         main_frame = Frame(self.master)
@@ -54,6 +439,14 @@ class ExcelFindReplaceTool:
         Checkbutton(input_frame, text="单元格", variable=self.cell_var).grid(row=4, column=1, sticky=W)
         Checkbutton(input_frame, text="文本框/图形", variable=self.textbox_var).grid(row=4, column=2, sticky=W)
 
+        # 替换引擎：Excel 实例（COM）或离线直接处理 .xlsx/.xlsm 文件
+        Label(input_frame, text="替换引擎:").grid(row=5, column=0, padx=5, pady=5, sticky=W)
+        self.engine_var = StringVar(value="com" if win32 else "file")
+        Radiobutton(input_frame, text="Excel实例", variable=self.engine_var, value="com",
+                    state=NORMAL if win32 else DISABLED).grid(row=5, column=1, padx=5, sticky=W)
+        Radiobutton(input_frame, text="离线文件（xlsx/xlsm）", variable=self.engine_var,
+                    value="file").grid(row=5, column=2, padx=5, sticky=W)
+
         # 功能按钮
         btn_frame = Frame(main_frame)
         btn_frame.pack(pady=10)
@@ -73,6 +466,9 @@ class ExcelFindReplaceTool:
         self.log_text.pack(fill=BOTH, expand=True)
 
     def reconnect_excel(self):
+        if win32 is None:
+            messagebox.showwarning("警告", "未安装 pywin32，只能使用离线文件引擎")
+            return
         self.connect_to_excel(force=True)
 
     def connect_to_excel(self, force=False):
@@ -127,7 +523,7 @@ class ExcelFindReplaceTool:
 
     def process_escape_chars(self, text):
         if self.escape_var.get():
-            return text.replace(r'\n', '\n').replace(r'\r', '\r')
+            return process_escape_text(text)
         return text
 
     def process_worksheet(self, sheet):
@@ -213,6 +609,9 @@ class ExcelFindReplaceTool:
         return replacements
 
     def start_replace(self):
+        if self.engine_var.get() == "file":
+            self.start_offline_replace()
+            return
         if not self.validate_connection():
             messagebox.showwarning("警告", "未连接到有效的Excel工作簿")
             return
@@ -240,6 +639,23 @@ class ExcelFindReplaceTool:
             self.excel.Calculation = -4105  # xlCalculationAutomatic
             self.update_log()
 
+    def start_offline_replace(self):
+        """离线引擎：选择一个或多个文件，替换后直接保存，不需要 Excel"""
+        if not self.find_entry.get().strip():
+            messagebox.showwarning("警告", "查找内容不能为空")
+            return
+        paths = filedialog.askopenfilenames(filetypes=[("Excel文件", "*.xlsx *.xlsm")])
+        if not paths:
+            self.log_action("用户取消文件选择")
+            return
+        engine = OpenXmlReplaceEngine(self.process_escape_chars(self.find_entry.get()),
+                                      self.process_escape_chars(self.replace_entry.get()),
+                                      scope=self.scope_var.get(), cells=self.cell_var.get(),
+                                      shapes=self.textbox_var.get(), log=self.log_action)
+        total = engine.run(paths)
+        self.log_action(f"操作完成！{len(paths)} 个文件共完成 {total} 处替换")
+        self.generate_log_file()
+
     def log_action(self, msg):
         ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         self.log.append(f"[{ts}] {msg}")
@@ -282,7 +698,37 @@ class ExcelFindReplaceTool:
         messagebox.showerror("连接错误", err)
         self.master.destroy()
 
+def run_cli(argv=None):
+    """命令行模式：用离线引擎批量处理文件"""
+    parser = argparse.ArgumentParser(description="Excel查找替换工具（离线处理 .xlsx/.xlsm，不需要 Excel）")
+    parser.add_argument('files', nargs='+', help="要处理的文件")
+    parser.add_argument('-f', '--find', required=True, help="查找内容")
+    parser.add_argument('-r', '--replace', default="", help="替换内容")
+    parser.add_argument('--scope', choices=['workbook', 'worksheet'], default='workbook',
+                        help="workbook 处理全部工作表，worksheet 只处理保存时的活动工作表")
+    parser.add_argument('--no-cells', action='store_true', help="不替换单元格")
+    parser.add_argument('--no-shapes', action='store_true', help="不替换文本框/图形")
+    parser.add_argument('--no-escape', action='store_true', help="不处理转义字符（默认 \\n 表示换行）")
+    parser.add_argument('-o', '--output-dir', help="输出目录，默认覆盖原文件")
+    args = parser.parse_args(argv)
+    if not args.find:
+        parser.error("查找内容不能为空")
+
+    def log(msg):
+        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {msg}")
+
+    convert = (lambda text: text) if args.no_escape else process_escape_text
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    engine = OpenXmlReplaceEngine(convert(args.find), convert(args.replace), scope=args.scope,
+                                  cells=not args.no_cells, shapes=not args.no_shapes, log=log)
+    total = engine.run(args.files, args.output_dir)
+    log(f"操作完成！{len(args.files)} 个文件共完成 {total} 处替换")
+    return 0
+
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(run_cli())
     app = Window(title="Excel查找替换工具", themename="litera")
     ExcelFindReplaceTool(app)
     app.mainloop()
\ No newline at end of file
@@ -0,0 +1,309 @@
+"""
+olmOCR 界面包装层的基准测试：用确定性的本地桩模块替换 olmocr.pipeline 和 olmocr.viewer.dolmaviewer，
+只测量包装层本身的开销（任务目录、文件放入、预检/分块、工作进程调用、JSONL 解析、预览生成与转换、缓存、翻页读取）
+
+用法:
+    python benchmark.py                     # 1 / 50 / 500 页，各重复 3 次取中位数
+    python benchmark.py --pages 1 50 --repeat 5 --image-kb 50 --json result.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+from contextlib import contextmanager
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# --------------------------
+# 桩模块
+# --------------------------
+# pipeline 桩：按 PDF 的页数输出与 olmOCR 相同格式的文档（每页约 page_chars 个字符），可选模拟每页耗时
+STUB_PIPELINE = r'''
+import os
+import re
+import sys
+import json
+import time
+import random
+import hashlib
+
+PAGE_CHARS = int(os.environ.get("BENCH_PAGE_CHARS", "3000"))
+PAGE_DELAY = float(os.environ.get("BENCH_PAGE_MS", "0")) / 1000
+WORDS = ["olmOCR", "文档", "table", "页面", "analysis", "结果", "model", "文本", "section", "数据"]
+
+def page_count(path):
+    with open(path, "rb") as f:
+        counts = re.findall(rb"/Count\s+(\d+)", f.read())
+    return max(int(count) for count in counts) if counts else 1
+
+def page_text(seed, page):
+    rng = random.Random(f"{seed}:{page}")
+    words = []
+    length = 0
+    while length < PAGE_CHARS:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)
+
+def main():
+    args = sys.argv[1:]
+    workspace = args[0]
+    pdfs = []
+    for arg in args[args.index("--pdfs") + 1:]:
+        if arg.startswith("--"):
+            break
+        pdfs.append(arg)
+    results_dir = os.path.join(workspace, "results")
+    os.makedirs(results_dir, exist_ok=True)
+    name = hashlib.sha1("".join(pdfs).encode("utf-8")).hexdigest()
+    with open(os.path.join(results_dir, f"output_{name}.jsonl"), "w", encoding="utf-8") as out:
+        for pdf in pdfs:
+            pages = page_count(pdf)
+            texts, spans, length = [], [], 0
+            for page in range(1, pages + 1):
+                text = page_text(os.path.basename(pdf), page)
+                if texts:
+                    texts.append("\n")
+                    length += 1
+                spans.append([length, length + len(text), page])
+                texts.append(text)
+                length += len(text)
+                print(f"{pdf}: page {page}/{pages}", flush=True)
+                if PAGE_DELAY:
+                    time.sleep(PAGE_DELAY)
+            doc = {"id": hashlib.sha1(pdf.encode("utf-8")).hexdigest(), "text": "".join(texts),
+                   "metadata": {"Source-File": pdf, "pdf-total-pages": pages,
+                                "total-input-tokens": pages * 1000, "total-output-tokens": length // 4},
+                   "attributes": {"pdf_page_numbers": spans}}
+            out.write(json.dumps(doc, ensure_ascii=False) + "\n")
+'''
+
+# dolmaviewer 桩：每个文档生成一个内嵌 base64 页面图像的 HTML（每页约 image_kb KB 图像）
+STUB_VIEWER = r'''
+import os
+import sys
+import json
+import html
+import base64
+import random
+
+IMAGE_BYTES = int(os.environ.get("BENCH_IMAGE_KB", "100")) * 1024
+
+def main(path):
+    os.makedirs("dolma_previews", exist_ok=True)
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            doc = json.loads(line)
+            source = doc["metadata"]["Source-File"]
+            name = os.path.splitext(os.path.basename(source))[0]
+            text = doc["text"]
+            with open(os.path.join("dolma_previews", f"{name}.html"), "w", encoding="utf-8") as out:
+                out.write('<html><head><meta charset="utf-8"><style>.page {padding: 4px;}</style></head><body>')
+                out.write('<div class="container">')
+                for start, end, page in doc["attributes"]["pdf_page_numbers"]:
+                    image = random.Random(f"{name}:{page}").randbytes(IMAGE_BYTES)
+                    out.write('<div class="page"><div class="row"><div class="col-md-6">')
+                    out.write(f'<img style="width: 100%" src="data:image/webp;base64,{base64.b64encode(image).decode()}">')
+                    out.write('</div><div class="col-md-6"><div class="text-content">')
+                    out.write(html.escape(text[start:end]))
+                    out.write('</div></div></div></div>')
+                out.write('</div></body></html>')
+
+if __name__ == "__main__":
+    main(sys.argv[1])
+'''
+
+def write_blank_pdf(path, pages, nonce=""):
+    """生成指定页数的最小合法 PDF（nonce 让每个文件内容不同，避免命中结果缓存）"""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>",
+               "<< /Type /Pages /Kids [%s] /Count %d >>" % (" ".join(f"{3 + i} 0 R" for i in range(pages)), pages)]
+    objects += ["<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] >>"] * pages
+    data = f"%PDF-1.4\n% bench {nonce}\n".encode("ascii")
+    offsets = []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(len(data))
+        data += f"{number} 0 obj\n{obj}\nendobj\n".encode("ascii")
+    xref = len(data)
+    data += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("ascii")
+    for offset in offsets:
+        data += f"{offset:010d} 00000 n \n".encode("ascii")
+    data += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("ascii")
+    with open(path, "wb") as f:
+        f.write(data)
+
+class StageTimer:
+    """记录各阶段耗时（秒）"""
+    def __init__(self):
+        self.times = {}
+
+    @contextmanager
+    def __call__(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.times[stage] = self.times.get(stage, 0) + time.perf_counter() - start
+
+# 报告中的阶段顺序和说明
+STAGES = [
+    ("job_dir", "创建任务目录"),
+    ("ingest", "放入上传文件（硬链接）"),
+    ("copy", "对照：复制上传文件"),
+    ("preflight", "预检/分块"),
+    ("pipeline", "工作进程调用（桩）+ 合并"),
+    ("jsonl_index", "JSONL 解析/建立索引"),
+    ("viewer", "生成预览（子进程）"),
+    ("html_convert", "预览转换"),
+    ("cache_store", "写入结果缓存"),
+    ("page_read", "翻页读取 + 载入预览"),
+    ("end_to_end", "端到端（任务队列）"),
+    ("cache_hit", "端到端（缓存命中）"),
+]
+
+def run_stages(app, pages, run_no, input_dir):
+    """按 run_ocr_job 的步骤逐段计时，再通过任务队列测一次端到端耗时"""
+    timer = StageTimer()
+    pdf_file = os.path.join(input_dir, f"bench_{pages}p_{run_no}.pdf")
+    write_blank_pdf(pdf_file, pages, nonce=f"{pages}:{run_no}:stages")
+
+    job = app.OcrJob([pdf_file], [app.ResultCache.key_for(pdf_file)])
+    job.started_at = time.time()
+    job.work_dir = os.path.join(app.WORKSPACE_DIR, f"job_{int(job.submitted_at)}_{job.id}")
+    with timer("job_dir"):
+        os.makedirs(job.work_dir)
+    pdf_path = os.path.join(job.work_dir, f"000_{os.path.basename(pdf_file)}")
+    with timer("ingest"):
+        app.ingest_file(pdf_file, pdf_path)
+    with timer("copy"):
+        shutil.copy(pdf_file, pdf_path + ".copy")
+    os.remove(pdf_path + ".copy")
+
+    job.log_path = os.path.join(job.work_dir, "pipeline.log")
+    with timer("preflight"):
+        units = app.plan_run_units(job, [pdf_path], job.log_path)
+    with timer("pipeline"):
+        job.results = app.ResultReader([])
+        app.run_units(job, units, [pdf_path], job.log_path)
+        output_files = app.collect_outputs(job, units, [pdf_path])
+    errors = [unit.error for unit in units if unit.error]
+    if errors:
+        raise RuntimeError("\n".join(errors))
+    with timer("jsonl_index"):
+        job.results = app.ResultReader(output_files)
+        page_total = job.results.page_count()
+    with timer("viewer"):
+        app.run_viewer(job, output_files)
+    with timer("html_convert"):
+        preview_inputs = app.convert_previews(job)
+    with timer("cache_store"):
+        app.store_job_results(job, preview_inputs)
+    with timer("page_read"):
+        app.result_page([job], max(1, page_total // 2))
+        app.load_preview(job.previews[0][1] if job.previews else None)
+
+    # 端到端：新的文件（不命中缓存），再提交一次同一文件（命中缓存）
+    e2e_file = os.path.join(input_dir, f"bench_{pages}p_{run_no}_e2e.pdf")
+    write_blank_pdf(e2e_file, pages, nonce=f"{pages}:{run_no}:e2e")
+    for stage in ("end_to_end", "cache_hit"):
+        with timer(stage):
+            jobs = app.submit_pdfs([e2e_file])
+            for queued in jobs:
+                queued.done.wait()
+        failed = [queued.error for queued in jobs if queued.error]
+        if failed:
+            raise RuntimeError("\n".join(failed))
+    return timer.times
+
+def format_report(results, page_sizes, worker_start):
+    lines = [f"工作进程冷启动: {worker_start * 1000:.1f} ms", ""]
+    header = f"{'阶段':<28}" + "".join(f"{f'{pages} 页 (ms)':>16}" for pages in page_sizes)
+    lines += [header, "-" * len(header)]
+    for stage, label in STAGES:
+        row = f"{label:<28}"
+        for pages in page_sizes:
+            row += f"{results[pages]['median_ms'].get(stage, float('nan')):>16.1f}"
+        lines.append(row)
+    lines.append("")
+    row = f"{'吞吐量（页/秒，端到端）':<28}"
+    for pages in page_sizes:
+        row += f"{results[pages]['pages_per_second']:>16.1f}"
+    lines.append(row)
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="olmOCR 界面包装层基准测试（桩 pipeline / 桩 dolmaviewer）")
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 50, 500], help="输入 PDF 的页数")
+    parser.add_argument("--repeat", type=int, default=3, help="每种页数重复次数（取中位数）")
+    parser.add_argument("--page-chars", type=int, default=3000, help="桩 pipeline 每页输出的字符数")
+    parser.add_argument("--image-kb", type=int, default=100, help="桩预览中每页图像的大小（KB）")
+    parser.add_argument("--page-ms", type=float, default=0, help="桩 pipeline 模拟的每页处理耗时（毫秒）")
+    parser.add_argument("--json", help="把结果另存为 JSON 文件")
+    parser.add_argument("--keep", action="store_true", help="保留临时工作目录")
+    args = parser.parse_args()
+    if args.json:
+        args.json = os.path.abspath(args.json)
+
+    bench_dir = tempfile.mkdtemp(prefix="olmocr_bench_")
+    stub_dir = os.path.join(bench_dir, "stubs")
+    input_dir = os.path.join(bench_dir, "inputs")
+    os.makedirs(stub_dir)
+    os.makedirs(input_dir)
+    with open(os.path.join(stub_dir, "bench_stub_pipeline.py"), "w", encoding="utf-8") as f:
+        f.write(STUB_PIPELINE)
+    with open(os.path.join(stub_dir, "bench_stub_viewer.py"), "w", encoding="utf-8") as f:
+        f.write(STUB_VIEWER)
+
+    # 在导入界面模块之前配置桩模块；工作进程（spawn）继承 sys.path，预览子进程使用 PYTHONPATH
+    os.environ["OLMOCR_PIPELINE_MODULE"] = "bench_stub_pipeline"
+    os.environ["OLMOCR_VIEWER_MODULE"] = "bench_stub_viewer"
+    os.environ["BENCH_PAGE_CHARS"] = str(args.page_chars)
+    os.environ["BENCH_IMAGE_KB"] = str(args.image_kb)
+    os.environ["BENCH_PAGE_MS"] = str(args.page_ms)
+    os.environ["PYTHONPATH"] = os.pathsep.join(filter(None, [stub_dir, os.environ.get("PYTHONPATH")]))
+    sys.path[:0] = [SCRIPT_DIR, stub_dir]
+    os.chdir(bench_dir)
+    import olmocr as app
+
+    try:
+        start = time.perf_counter()
+        app.get_worker_pool().ensure_started()
+        worker_start = time.perf_counter() - start
+
+        results = {}
+        for pages in args.pages:
+            runs = []
+            for run_no in range(args.repeat):
+                runs.append(run_stages(app, pages, run_no, input_dir))
+                print(f"{pages} 页 第 {run_no + 1}/{args.repeat} 次完成", flush=True)
+            median_ms = dict((stage, statistics.median(run[stage] for run in runs) * 1000)
+                             for stage, _ in STAGES if all(stage in run for run in runs))
+            results[pages] = {
+                "median_ms": median_ms,
+                "pages_per_second": pages / (median_ms["end_to_end"] / 1000),
+                "runs_ms": [dict((stage, value * 1000) for stage, value in run.items()) for run in runs],
+            }
+
+        print()
+        print(format_report(results, args.pages, worker_start))
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump({"worker_start_ms": worker_start * 1000, "options": vars(args),
+                           "results": results}, f, ensure_ascii=False, indent=2)
+    finally:
+        for worker in app.get_worker_pool().workers:
+            worker.stop(force=True)
+        os.chdir(SCRIPT_DIR)
+        if args.keep:
+            print(f"工作目录: {bench_dir}")
+        else:
+            shutil.rmtree(bench_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
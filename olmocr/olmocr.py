@@ -1,4 +1,5 @@
 import os
+import sys
 import json
 import gradio as gr
 import subprocess
@@ -7,201 +8,1805 @@ from pathlib import Path
 import shutil
 import time
 import re
+import hashlib
+import base64
+import codecs
+import signal
+import shlex
+import uuid
+import queue
+import errno
+import threading
+import atexit
+import urllib.request
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 
 # 创建工作目录
 WORKSPACE_DIR = "olmocr_workspace"
 os.makedirs(WORKSPACE_DIR, exist_ok=True)
 
-def modify_html_for_better_display(html_content):
-    """修改HTML以便在Gradio中更好地显示"""
-    if not html_content:
-        return html_content
-    
-    # 增加容器宽度
-    html_content = html_content.replace('<div class="container">', 
-                                       '<div class="container" style="max-width: 100%; width: 100%;">')
+# pipeline / 预览模块（可通过环境变量替换为本地桩模块，便于无 GPU 环境下测试）
+PIPELINE_MODULE = os.environ.get("OLMOCR_PIPELINE_MODULE", "olmocr.pipeline")
+VIEWER_MODULE = os.environ.get("OLMOCR_VIEWER_MODULE", "olmocr.viewer.dolmaviewer")
+# 追加给 pipeline 的参数。其中指定了 --server 时使用该外部推理服务，不再自行启动
+PIPELINE_EXTRA_ARGS = shlex.split(os.environ.get("OLMOCR_PIPELINE_ARGS", ""))
+
+# 常驻推理服务：工作进程池启动一次 vLLM 服务并保持模型加载，每个任务通过 --server 使用它，
+# 不再由每次 pipeline 运行各自启动服务、加载模型。OLMOCR_SERVER=0 时恢复每个任务自行启动
+INFERENCE_SERVER_ENABLED = os.environ.get("OLMOCR_SERVER", "1") != "0"
+INFERENCE_SERVER_MODEL = os.environ.get("OLMOCR_MODEL", "allenai/olmOCR-7B-0725-FP8")
+INFERENCE_SERVER_PORT = int(os.environ.get("OLMOCR_SERVER_PORT", "30024"))
+# 启动命令，{model} 和 {port} 会被替换；served-model-name 必须是 pipeline 请求使用的 "olmocr"
+INFERENCE_SERVER_COMMAND = os.environ.get(
+    "OLMOCR_SERVER_COMMAND",
+    "vllm serve {model} --port {port} --served-model-name olmocr --disable-log-requests --uvicorn-log-level warning")
+
+# 常驻工作进程的启动超时（首次加载模型可能较慢）和健康检查间隔（秒）
+WORKER_START_TIMEOUT = 1800
+WORKER_HEALTH_INTERVAL = 30
+
+# 并发执行的任务数（每个任务占用一个常驻工作进程，受显存限制）
+OCR_CONCURRENCY = max(1, int(os.environ.get("OLMOCR_CONCURRENCY", "1")))
+# 合并到同一次 pipeline 调用（--pdfs）的最大 PDF 数
+MAX_PDFS_PER_JOB = 20
+# 任务列表中保留的历史任务数
+MAX_JOB_HISTORY = 200
+
+# 大文件分块：超过 CHUNK_PAGES 页的 PDF 按页范围拆分后并行处理，失败的块单独重试 CHUNK_RETRIES 次
+CHUNK_PAGES = int(os.environ.get("OLMOCR_CHUNK_PAGES", "50"))
+CHUNK_RETRIES = 2
+
+# 文本层快速通道：页面已有可用的文本层时直接提取，不经过 OCR。
+# 判断条件：非空白字符数、可正常解码的字符比例、图像面积占页面的比例
+TEXT_LAYER_ENABLED = os.environ.get("OLMOCR_TEXT_LAYER", "1") != "0"
+TEXT_LAYER_MIN_CHARS = 200
+TEXT_LAYER_MIN_COVERAGE = 0.9
+TEXT_LAYER_MAX_IMAGE_RATIO = 0.5
+
+# 结果缓存目录、总大小上限，以及参与缓存键计算的版本号（结果格式变化时递增）
+CACHE_DIR = os.path.join(WORKSPACE_DIR, "cache")
+CACHE_MAX_BYTES = int(os.environ.get("OLMOCR_CACHE_MAX_MB", "2048")) * 1024 * 1024
+CACHE_VERSION = 2
+
+# 工作区清理：任务目录保留时长、工作区总大小上限（不含结果缓存，缓存自行淘汰）和清理间隔（秒）
+WORKSPACE_MAX_AGE = float(os.environ.get("OLMOCR_WORKSPACE_MAX_AGE_HOURS", "24")) * 3600
+WORKSPACE_MAX_BYTES = int(os.environ.get("OLMOCR_WORKSPACE_MAX_MB", "10240")) * 1024 * 1024
+WORKSPACE_GC_INTERVAL = 600
+
+# 对外提供预览图像的目录：Gradio 只允许访问这里，工作区中的 PDF、结果和日志不通过文件接口暴露
+PREVIEW_PUBLIC_DIR = os.path.join(WORKSPACE_DIR, "preview_public")
+
+# 文本分页：文档没有页码信息时每页显示的最大字符数
+TEXT_PAGE_CHARS = 20000
+
+# 异步 API：状态查询时读取的日志尾部字节数，结果接口每次输出的最大字节数
+API_LOG_TAIL_BYTES = 8192
+API_RESULT_CHUNK_BYTES = 1024 * 1024
+
+# 流式输出：界面刷新间隔（秒）和日志框中保留的最大字符数
+STREAM_INTERVAL = 0.5
+LOG_TAIL_CHARS = 20000
+# 从 pipeline 日志中识别页进度，例如 "12/40 pages"、"page 12/40"
+PAGE_PROGRESS_PATTERN = re.compile(r"(\d+)\s*/\s*(\d+)\s*pages?|pages?\s*(\d+)\s*/\s*(\d+)", re.IGNORECASE)
+
+# --------------------------
+# 常驻 pipeline 工作进程
+# --------------------------
+@contextmanager
+def redirect_output_to(log_path):
+    """在文件描述符层面把 stdout/stderr 重定向到日志文件，pipeline 启动的子进程输出也能记录下来"""
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved_fds = [os.dup(1), os.dup(2)]
+    with open(log_path, "a", encoding="utf-8") as log_file:
+        os.dup2(log_file.fileno(), 1)
+        os.dup2(log_file.fileno(), 2)
+        try:
+            yield
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os.dup2(saved_fds[0], 1)
+            os.dup2(saved_fds[1], 2)
+            for fd in saved_fds:
+                os.close(fd)
+
+def pipeline_worker_main(module_name, job_queue, result_queue):
+    """
+    工作进程入口：导入一次 pipeline 模块后循环执行任务，省去每次启动解释器和导入 torch 等依赖的时间。
+    模型在常驻推理服务中加载（见 InferenceServer），任务参数带 --server 时 pipeline 不再自行启动服务。
+    第二个任务起先 reload pipeline 模块，模块级状态（队列、计数器等）每次都是新的，
+    asyncio.run 每次也使用新的事件循环；已导入的依赖仍在 sys.modules 中，reload 很快
+    任务格式: {"type": "run", "id", "args", "log_path"} 或 {"type": "ping", "id"}，None 表示退出
+    """
+    import asyncio
+    import importlib
+    import traceback
     
-    # 增加文本大小
-    html_content = html_content.replace('<style>', 
-                                       '<style>\nbody {font-size: 16px;}\n.text-content {font-size: 16px; line-height: 1.5;}\n')
+    # 独立进程组，取消任务时可以连同 pipeline 启动的推理服务一起结束
+    if hasattr(os, "setpgrp"):
+        os.setpgrp()
     
-    # 调整图像和文本部分的大小比例
-    html_content = html_content.replace('<div class="row">', 
-                                       '<div class="row" style="display: flex; flex-wrap: wrap;">')
-    html_content = html_content.replace('<div class="col-md-6">', 
-                                       '<div class="col-md-6" style="flex: 0 0 50%; max-width: 50%; padding: 15px;">')
+    # 本脚本名为 olmocr.py，所在目录在 sys.path 中会遮挡已安装的 olmocr 包
+    script_name = os.path.splitext(os.path.basename(__file__))[0]
+    if module_name.split(".")[0] == script_name:
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        sys.path[:] = [path for path in sys.path if os.path.abspath(path or os.curdir) != script_dir]
     
-    # 增加页面之间的间距
-    html_content = html_content.replace('<div class="page">', 
-                                       '<div class="page" style="margin-bottom: 30px; border-bottom: 1px solid #ccc; padding-bottom: 20px;">')
+    try:
+        module = importlib.import_module(module_name)
+    except BaseException:
+        result_queue.put({"type": "fatal", "error": traceback.format_exc()})
+        return
+    result_queue.put({"type": "ready", "pid": os.getpid()})
     
-    # 增加图像大小
-    html_content = re.sub(r'<img([^>]*)style="([^"]*)"', 
-                         r'<img\1style="max-width: 100%; height: auto; \2"', 
-                         html_content)
+    fresh = True
+    while True:
+        job = job_queue.get()
+        if job is None:
+            break
+        if job["type"] == "ping":
+            result_queue.put({"type": "pong", "id": job["id"]})
+            continue
+        
+        ok, error = True, ""
+        saved_argv = sys.argv
+        sys.argv = [module_name] + job["args"]
+        try:
+            with redirect_output_to(job["log_path"]):
+                if not fresh:
+                    module = importlib.reload(module)
+                fresh = False
+                result = module.main()
+                if asyncio.iscoroutine(result):
+                    asyncio.run(result)
+        except SystemExit as e:
+            if e.code not in (None, 0):
+                ok, error = False, f"pipeline 退出码: {e.code}"
+        except BaseException:
+            ok, error = False, traceback.format_exc()
+        finally:
+            sys.argv = saved_argv
+        result_queue.put({"type": "done", "id": job["id"], "ok": ok, "error": error})
+
+def kill_process_tree(pid):
+    """结束进程及其启动的所有子进程（释放显存等资源）"""
+    if os.name == "nt":
+        subprocess.run(["taskkill", "/F", "/T", "/PID", str(pid)], capture_output=True)
+        return
+    try:
+        pgid = os.getpgid(pid)
+        if pgid == os.getpgrp():
+            # 子进程没能建立自己的进程组，killpg 会连同本进程一起结束，只结束它本身
+            os.kill(pid, signal.SIGKILL)
+        else:
+            os.killpg(pgid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+# wait_message 在任务被取消时返回的标记
+CANCELLED = {"type": "cancelled"}
+
+class PipelineWorker:
+    """
+    常驻的 pipeline 工作进程：启动时导入一次 pipeline，之后通过本地队列接收任务，
+    避免每次点击都重新启动解释器和导入依赖；进程崩溃或超时时自动重启。
+    推理服务和模型由 WorkerPool 的 InferenceServer 常驻，任务参数中带有它的 --server 地址
+    """
+    def __init__(self, module_name=PIPELINE_MODULE):
+        self.module_name = module_name
+        self.context = multiprocessing.get_context("spawn")
+        self.lock = threading.Lock()  # 同一时间只执行一个任务
+        self.process = None
+        self.job_queue = None
+        self.result_queue = None
+
+    def start(self, timeout=WORKER_START_TIMEOUT):
+        self.job_queue = self.context.Queue()
+        self.result_queue = self.context.Queue()
+        self.process = self.context.Process(
+            target=pipeline_worker_main,
+            args=(self.module_name, self.job_queue, self.result_queue),
+            daemon=True
+        )
+        self.process.start()
+        message = self.wait_message(lambda msg: msg["type"] in ("ready", "fatal"), timeout)
+        if message is None or message["type"] == "fatal":
+            self.stop()
+            detail = message["error"] if message else "启动超时"
+            raise RuntimeError(f"pipeline 工作进程启动失败:\n{detail}")
+
+    def stop(self, force=False):
+        """结束工作进程；force 为 True 时不等待当前任务，直接结束整个进程树"""
+        if self.process is None:
+            return
+        if self.process.is_alive() and not force:
+            try:
+                self.job_queue.put(None)
+                self.process.join(timeout=5)
+            except Exception:
+                pass
+        if self.process.is_alive():
+            kill_process_tree(self.process.pid)
+            self.process.kill()
+            self.process.join(timeout=5)
+        self.process = None
+
+    def restart(self):
+        self.stop()
+        self.start()
+
+    def is_alive(self):
+        return self.process is not None and self.process.is_alive()
+
+    def wait_message(self, predicate, timeout=None, cancel_event=None):
+        """等待满足条件的消息；进程退出或超时返回 None，cancel_event 被设置时返回 CANCELLED"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                message = self.result_queue.get(timeout=0.2)
+            except queue.Empty:
+                if cancel_event is not None and cancel_event.is_set():
+                    return CANCELLED
+                if not self.process.is_alive():
+                    return None
+                if deadline is not None and time.monotonic() > deadline:
+                    return None
+                continue
+            if predicate(message):
+                return message
+
+    def health_check(self, timeout=10):
+        """发送 ping 并等待回应，用于检测卡死或已崩溃的工作进程"""
+        if not self.is_alive():
+            return False
+        ping_id = uuid.uuid4().hex
+        self.job_queue.put({"type": "ping", "id": ping_id})
+        return self.wait_message(lambda msg: msg.get("id") == ping_id, timeout) is not None
+
+    def ensure_started(self):
+        """启动工作进程（已在运行时不做任何事），用于应用启动时预热"""
+        with self.lock:
+            if not self.is_alive():
+                self.start()
+
+    def ensure_healthy(self):
+        """空闲时检查工作进程，不健康则重启"""
+        if not self.lock.acquire(blocking=False):
+            return  # 正在执行任务
+        try:
+            if self.process is not None and not self.health_check():
+                self.restart()
+        finally:
+            self.lock.release()
+
+    def run_job(self, args, log_path, timeout=None, cancel_event=None):
+        """
+        执行一次 pipeline 任务（阻塞直到完成）
+        :param args: pipeline 命令行参数（不含模块名）
+        :param log_path: 任务日志文件
+        :param cancel_event: 设置后立即结束工作进程（连同子进程），并在后台重新预热
+        :return: (是否成功, 错误信息)
+        """
+        with self.lock:
+            if not self.is_alive():
+                self.start()
+            job_id = uuid.uuid4().hex
+            self.job_queue.put({"type": "run", "id": job_id, "args": args + PIPELINE_EXTRA_ARGS,
+                                "log_path": os.path.abspath(log_path)})
+            message = self.wait_message(lambda msg: msg.get("id") == job_id, timeout, cancel_event)
+            if message is CANCELLED:
+                self.stop(force=True)
+                threading.Thread(target=self.ensure_started, daemon=True).start()
+                return False, "任务已取消"
+            if message is None:
+                # 工作进程崩溃或超时：结束并重启，下一个任务仍可使用
+                crashed = not self.process.is_alive()
+                self.restart()
+                return False, "pipeline 工作进程意外退出，已重启" if crashed else "pipeline 执行超时，已重启工作进程"
+            return message["ok"], message["error"]
+
+def pipeline_option(args, name):
+    """取命令行参数中某个选项的值（"--name value" 或 "--name=value"），没有时返回 None"""
+    for i, arg in enumerate(args):
+        if arg == name and i + 1 < len(args):
+            return args[i + 1]
+        if arg.startswith(name + "="):
+            return arg.split("=", 1)[1]
+    return None
+
+class InferenceServer:
+    """
+    常驻的推理服务（vLLM，OpenAI 兼容接口）：启动一次并保持模型加载，所有任务通过 --server 共用，
+    vLLM 会把多个工作进程的并发请求合并成批次。服务在独立的进程组中运行，停止时连同子进程一起结束
+    """
+    def __init__(self, model=INFERENCE_SERVER_MODEL, port=INFERENCE_SERVER_PORT, command=INFERENCE_SERVER_COMMAND):
+        self.model = model
+        self.port = port
+        self.command = command
+        self.process = None
+        self.lock = threading.Lock()
+        self.log_path = os.path.join(WORKSPACE_DIR, f"inference_server_{port}.log")
+
+    @property
+    def url(self):
+        return f"http://localhost:{self.port}/v1"
+
+    def is_alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def is_ready(self, timeout=5):
+        """服务已加载模型并能响应 /v1/models"""
+        try:
+            with urllib.request.urlopen(f"{self.url}/models", timeout=timeout) as response:
+                return response.status == 200
+        except OSError:
+            return False
+
+    def log_tail(self, size=4096):
+        try:
+            with open(self.log_path, "rb") as f:
+                f.seek(max(0, os.path.getsize(self.log_path) - size))
+                return f.read().decode("utf-8", errors="replace")
+        except OSError:
+            return ""
+
+    def start(self, timeout=WORKER_START_TIMEOUT):
+        """启动服务并等待模型加载完成；启动命令不存在（未安装 vLLM）时抛出 FileNotFoundError"""
+        args = shlex.split(self.command.format(model=shlex.quote(self.model), port=self.port))
+        with open(self.log_path, "ab") as log:
+            self.process = subprocess.Popen(args, stdout=log, stderr=subprocess.STDOUT,
+                                            start_new_session=(os.name != "nt"))
+        deadline = time.monotonic() + timeout
+        while not self.is_ready():
+            if not self.is_alive():
+                code = self.process.returncode
+                self.process = None
+                raise RuntimeError(f"推理服务启动失败（退出码 {code}）:\n{self.log_tail()}")
+            if time.monotonic() > deadline:
+                self.stop()
+                raise RuntimeError("推理服务启动超时")
+            time.sleep(1)
+        print(f"推理服务已就绪: {self.url}（模型 {self.model}）")
+
+    def stop(self):
+        if self.process is None:
+            return
+        if self.is_alive():
+            kill_process_tree(self.process.pid)
+            self.process.kill()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            pass
+        self.process = None
+
+    def ensure_running(self):
+        """服务未运行或已退出时（重新）启动"""
+        with self.lock:
+            if not self.is_alive():
+                self.start()
+
+    def ensure_healthy(self):
+        """进程还在但不再响应时重启"""
+        with self.lock:
+            if self.process is not None and not (self.is_alive() and self.is_ready()):
+                print("推理服务无响应，正在重启")
+                self.stop()
+                self.start()
+
+class WorkerPool:
+    """
+    固定数量的常驻工作进程，任务从空闲队列中取用工作进程；
+    所有工作进程共用一个常驻推理服务（OLMOCR_PIPELINE_ARGS 中已指定 --server 或 OLMOCR_SERVER=0 时不启动）
+    """
+    def __init__(self, size=OCR_CONCURRENCY, use_server=INFERENCE_SERVER_ENABLED, module_name=PIPELINE_MODULE):
+        self.workers = [PipelineWorker(module_name) for _ in range(size)]
+        self.idle = queue.Queue()
+        for worker in self.workers:
+            self.idle.put(worker)
+        self.server = None
+        if use_server and "--server" not in PIPELINE_EXTRA_ARGS:
+            model = pipeline_option(PIPELINE_EXTRA_ARGS, "--model") or INFERENCE_SERVER_MODEL
+            self.server = InferenceServer(model)
+
+    def server_args(self):
+        """
+        启动（或确认）常驻推理服务，返回追加给任务的 --server 参数；
+        没有安装 vLLM 时退回到每个任务自行启动服务，返回空列表
+        """
+        if self.server is None:
+            return []
+        try:
+            self.server.ensure_running()
+        except FileNotFoundError as e:
+            print(f"无法启动常驻推理服务（{e}），改为每个任务自行启动推理服务并加载模型")
+            self.server = None
+            return []
+        return ["--server", self.server.url]
+
+    def run_job(self, args, log_path, timeout=None, cancel_event=None):
+        try:
+            server_args = self.server_args()
+        except RuntimeError as e:
+            return False, str(e)
+        # 等待空闲工作进程，排队期间也可以取消
+        while True:
+            try:
+                worker = self.idle.get(timeout=0.2)
+                break
+            except queue.Empty:
+                if cancel_event is not None and cancel_event.is_set():
+                    return False, "任务已取消"
+        try:
+            return worker.run_job(args + server_args, log_path, timeout, cancel_event)
+        finally:
+            self.idle.put(worker)
+
+    def ensure_started(self):
+        try:
+            self.server_args()
+        except RuntimeError as e:
+            print(e)
+        for worker in self.workers:
+            worker.ensure_started()
+
+    def ensure_healthy(self):
+        if self.server is not None:
+            self.server.ensure_healthy()
+        for worker in self.workers:
+            worker.ensure_healthy()
+
+    def close(self):
+        """退出时结束常驻推理服务（它在独立的进程组中，不会随本进程退出）"""
+        if self.server is not None:
+            self.server.stop()
+
+_worker_pool = None
+_worker_pool_lock = threading.Lock()
+
+def get_worker_pool():
+    """获取全局工作进程池（首次调用时创建，并启动后台健康检查）"""
+    global _worker_pool
+    with _worker_pool_lock:
+        if _worker_pool is None:
+            _worker_pool = WorkerPool()
+            atexit.register(_worker_pool.close)
+            threading.Thread(target=health_check_loop, args=(_worker_pool,), daemon=True).start()
+        return _worker_pool
+
+def health_check_loop(pool):
+    while True:
+        time.sleep(WORKER_HEALTH_INTERVAL)
+        try:
+            pool.ensure_healthy()
+        except Exception as e:
+            print(f"pipeline 工作进程健康检查失败: {e}")
+
+# --------------------------
+# 工作区清理
+# --------------------------
+def directory_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+def collect_workspace(max_age=WORKSPACE_MAX_AGE, max_bytes=WORKSPACE_MAX_BYTES, now=None):
+    """
+    清理工作区中的任务目录：先删除超过保留时长的目录，再按从旧到新删除直到总大小不超过上限。
+    排队中或执行中的任务目录不会被删除
+    :return: (删除的目录数, 释放的字节数)
+    """
+    now = now or time.time()
+    active_ids = get_job_queue().active_job_ids()
+    job_dirs = []
+    for entry in os.scandir(WORKSPACE_DIR):
+        if not entry.is_dir() or not entry.name.startswith("job_"):
+            continue
+        if entry.name.rsplit("_", 1)[-1] in active_ids:
+            continue
+        job_dirs.append((entry.stat().st_mtime, entry.path, directory_size(entry.path)))
+    job_dirs.sort()
     
-    # 添加缩放控制
-    zoom_controls = """
-    <div style="position: fixed; bottom: 20px; right: 20px; background: #fff; padding: 10px; border-radius: 5px; box-shadow: 0 0 10px rgba(0,0,0,0.2); z-index: 1000;">
-        <button onclick="document.body.style.zoom = parseFloat(document.body.style.zoom || 1) + 0.1;" style="margin-right: 5px;">放大</button>
-        <button onclick="document.body.style.zoom = parseFloat(document.body.style.zoom || 1) - 0.1;">缩小</button>
-    </div>
+    total = sum(size for _, _, size in job_dirs)
+    removed, freed = 0, 0
+    for mtime, path, size in job_dirs:
+        if now - mtime <= max_age and total <= max_bytes:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+        removed += 1
+        freed += size
+    return removed, freed
+
+def workspace_gc_loop():
+    while True:
+        try:
+            removed, freed = collect_workspace()
+            collect_published_previews()
+            if removed:
+                print(f"工作区清理: 删除 {removed} 个任务目录，释放 {freed / 1024 / 1024:.1f} MB")
+        except Exception as e:
+            print(f"工作区清理失败: {e}")
+        time.sleep(WORKSPACE_GC_INTERVAL)
+
+# 注入预览 HTML 的样式（一次性追加到 </head> 前，不再逐个改写元素的 style 属性）
+PREVIEW_STYLE = """<style id="olmocr-preview-style">
+body {font-size: 16px;}
+.container {max-width: 100% !important; width: 100% !important;}
+.text-content {font-size: 16px; line-height: 1.5;}
+.row {display: flex; flex-wrap: wrap;}
+.col-md-6 {flex: 0 0 50%; max-width: 50%; padding: 15px;}
+.page {margin-bottom: 30px; border-bottom: 1px solid #ccc; padding-bottom: 20px;}
+img {max-width: 100%; height: auto;}
+</style>
+"""
+
+# 缩放控制
+PREVIEW_ZOOM_CONTROLS = """
+<div style="position: fixed; bottom: 20px; right: 20px; background: #fff; padding: 10px; border-radius: 5px; box-shadow: 0 0 10px rgba(0,0,0,0.2); z-index: 1000;">
+    <button onclick="document.body.style.zoom = parseFloat(document.body.style.zoom || 1) + 0.1;" style="margin-right: 5px;">放大</button>
+    <button onclick="document.body.style.zoom = parseFloat(document.body.style.zoom || 1) - 0.1;">缩小</button>
+</div>
+"""
+
+# 预览中内嵌的 base64 页面图像、<img> 标签、</head> 和 </body>，一次扫描全部处理
+PREVIEW_PATTERN = re.compile(
+    r"data:image/(?P<fmt>png|jpe?g|webp|gif);base64,(?P<data>[A-Za-z0-9+/=\s]+)"
+    r"|(?P<img><img\b)|(?P<head></head>)|(?P<body></body>)",
+    re.IGNORECASE)
+
+# 图像地址中的占位符，显示时替换为实际的文件 URL（目录移动后预览仍然可用）
+PREVIEW_ASSET_TOKEN = "__OLMOCR_PREVIEW_ASSETS__"
+
+def gradio_file_url(path):
+    """Gradio 提供本地文件的 URL（4.x 为 /file=，5.x 为 /gradio_api/file=）"""
+    major = int(str(getattr(gr, "__version__", "4")).split(".")[0] or 4)
+    prefix = "/gradio_api/file=" if major >= 5 else "/file="
+    return prefix + os.path.abspath(path)
+
+def convert_preview(html_path, preview_dir):
+    """
+    把 dolmaviewer 生成的预览转换为适合在 Gradio 中显示的版本（只扫描一遍）：
+    内嵌的页面图像写成单独的文件并延迟加载，样式和缩放控制一次性注入。
+    结果写到 preview_dir/preview.html，图像在 preview_dir/assets 下
     """
-    html_content = html_content.replace('</body>', f'{zoom_controls}</body>')
+    assets_dir = os.path.join(preview_dir, "assets")
+    os.makedirs(assets_dir, exist_ok=True)
+    with open(html_path, "r", encoding="utf-8") as f:
+        html_content = f.read()
+    state = {"images": 0, "styled": False}
     
-    return html_content
+    def replace(match):
+        if match.group("data"):
+            state["images"] += 1
+            ext = match.group("fmt").lower().replace("jpeg", "jpg")
+            name = f"{state['images']:04d}.{ext}"
+            with open(os.path.join(assets_dir, name), "wb") as img_file:
+                img_file.write(base64.b64decode("".join(match.group("data").split())))
+            return f"{PREVIEW_ASSET_TOKEN}/{name}"
+        if match.group("img"):
+            return '<img loading="lazy" decoding="async"'
+        if match.group("head"):
+            state["styled"] = True
+            return PREVIEW_STYLE + "</head>"
+        return PREVIEW_ZOOM_CONTROLS + "</body>"
+    
+    html_content = PREVIEW_PATTERN.sub(replace, html_content)
+    if not state["styled"]:
+        html_content = PREVIEW_STYLE + html_content
+    with open(os.path.join(preview_dir, "preview.html"), "w", encoding="utf-8") as f:
+        f.write(html_content)
+    return state["images"]
+
+# 已发布的预览: 预览目录 -> 对外目录
+_published_previews = {}
+_published_lock = threading.Lock()
+
+def publish_preview_assets(preview_dir):
+    """
+    把预览图像硬链接到 PREVIEW_PUBLIC_DIR 下随机命名的子目录（不能硬链接时复制），返回该子目录
+    目录名不可猜测，同一个预览只发布一次
+    """
+    with _published_lock:
+        public_dir = _published_previews.get(preview_dir)
+        if public_dir and os.path.isdir(public_dir):
+            return public_dir
+        public_dir = os.path.join(PREVIEW_PUBLIC_DIR, uuid.uuid4().hex)
+        os.makedirs(public_dir)
+        for entry in os.scandir(os.path.join(preview_dir, "assets")):
+            if entry.is_file(follow_symlinks=False):
+                ingest_file(entry.path, os.path.join(public_dir, entry.name))
+        _published_previews[preview_dir] = public_dir
+        return public_dir
+
+def collect_published_previews(max_age=WORKSPACE_MAX_AGE, now=None):
+    """删除源预览已被清理、超过保留时长或不再登记（上次运行遗留）的对外目录"""
+    now = now or time.time()
+    with _published_lock:
+        for preview_dir, public_dir in list(_published_previews.items()):
+            expired = not os.path.isdir(public_dir) or now - os.stat(public_dir).st_mtime > max_age
+            if expired or not os.path.isdir(preview_dir):
+                _published_previews.pop(preview_dir)
+        known = {os.path.basename(path) for path in _published_previews.values()}
+        if os.path.isdir(PREVIEW_PUBLIC_DIR):
+            for entry in os.scandir(PREVIEW_PUBLIC_DIR):
+                if entry.name not in known:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+
+def session_jobs(job_ids):
+    """会话状态中记录的任务（已从历史中移除的跳过）"""
+    job_queue = get_job_queue()
+    return [job for job in (job_queue.get(job_id) for job_id in (job_ids or [])) if job is not None]
+
+def load_preview(preview_dir, job_ids):
+    """读取转换后的预览；只接受本会话任务的预览目录，图像通过对外目录提供"""
+    if not preview_dir:
+        return None
+    if preview_dir not in {path for job in session_jobs(job_ids) for _, path in job.previews}:
+        return None
+    try:
+        with open(os.path.join(preview_dir, "preview.html"), "r", encoding="utf-8") as f:
+            html_content = f.read()
+        public_dir = publish_preview_assets(preview_dir)
+    except OSError:
+        return "<p>预览文件已被清理，请重新处理</p>"
+    return html_content.replace(PREVIEW_ASSET_TOKEN, gradio_file_url(public_dir))
+
+# --------------------------
+# 结果读取
+# --------------------------
+def document_pages(doc):
+    """
+    把文档文本划分为显示页：优先使用 olmOCR 输出的 pdf_page_numbers（[起始, 结束, 页码]），
+    否则按 TEXT_PAGE_CHARS 切分
+    :return: [(起始, 结束, 页码)]
+    """
+    text = doc.get("text") or ""
+    spans = (doc.get("attributes") or {}).get("pdf_page_numbers") or []
+    pages = [(int(start), int(end), int(page)) for start, end, page in spans]
+    if pages:
+        return pages
+    if not text:
+        return [(0, 0, 1)]
+    return [(start, min(start + TEXT_PAGE_CHARS, len(text)), start // TEXT_PAGE_CHARS + 1)
+            for start in range(0, len(text), TEXT_PAGE_CHARS)]
+
+class ResultReader:
+    """
+    流式读取一个或多个 JSONL 结果分片（每行一个文档），不把全部文档载入内存。
+    首次访问时扫描一遍建立索引（文档所在分片与字节偏移、元数据、页范围），之后按需读取单个文档
+    """
+    def __init__(self, paths):
+        self.paths = [str(path) for path in paths]
+        self.lock = threading.Lock()
+        self.offsets = None   # [(分片路径, 字节偏移)]
+        self.metadata = None  # 每个文档的 metadata
+        self.pages = None     # [(文档序号, 起始, 结束, 页码)]
+        self.last_doc = (None, None)
+
+    @staticmethod
+    def iter_shard(path):
+        """逐行产生 (分片路径, 字节偏移, 原始行)，跳过空行"""
+        with open(path, "rb") as f:
+            offset = 0
+            for raw in f:
+                if raw.strip():
+                    yield path, offset, raw
+                offset += len(raw)
+
+    def iter_lines(self):
+        for path in list(self.paths):
+            yield from self.iter_shard(path)
+
+    def __iter__(self):
+        for _, _, raw in self.iter_lines():
+            yield json.loads(raw)
+
+    def build_index(self):
+        with self.lock:
+            if self.offsets is not None:
+                return
+            offsets, metadata, pages = [], [], []
+            for path in self.paths:
+                self.index_shard(path, offsets, metadata, pages)
+            self.offsets, self.metadata, self.pages = offsets, metadata, pages
+
+    @classmethod
+    def index_shard(cls, path, offsets, metadata, pages):
+        for _, offset, raw in cls.iter_shard(path):
+            doc = json.loads(raw)
+            doc_idx = len(offsets)
+            offsets.append((path, offset))
+            metadata.append(doc.get("metadata") or {})
+            pages.extend((doc_idx, start, end, page) for start, end, page in document_pages(doc))
+
+    def append(self, path):
+        """追加一个已写完的分片（分块处理时按页序逐块加入，界面可以先显示已完成的页）"""
+        with self.lock:
+            if self.offsets is not None:
+                self.index_shard(str(path), self.offsets, self.metadata, self.pages)
+            self.paths.append(str(path))
+
+    def __len__(self):
+        self.build_index()
+        return len(self.offsets)
+
+    def page_count(self):
+        self.build_index()
+        return len(self.pages)
+
+    def raw_line(self, doc_idx):
+        self.build_index()
+        path, offset = self.offsets[doc_idx]
+        with open(path, "rb") as f:
+            f.seek(offset)
+            return f.readline()
+
+    def document(self, doc_idx):
+        """读取单个文档（保留最近读取的一个，翻页时不必重复解析）"""
+        cached_idx, cached_doc = self.last_doc
+        if cached_idx == doc_idx:
+            return cached_doc
+        doc = json.loads(self.raw_line(doc_idx))
+        self.last_doc = (doc_idx, doc)
+        return doc
+
+    def page(self, page_idx):
+        """:return: (来源文件, 页码, 文本)"""
+        self.build_index()
+        doc_idx, start, end, page = self.pages[page_idx]
+        doc = self.document(doc_idx)
+        source = self.metadata[doc_idx].get("Source-File", doc.get("id", ""))
+        return os.path.basename(str(source)), page, (doc.get("text") or "")[start:end]
+
+# --------------------------
+# 结果缓存
+# --------------------------
+class ResultCache:
+    """
+    内容寻址的结果缓存：以 PDF 内容的 SHA-256 加 pipeline 参数为键，保存该 PDF 的 JSONL 结果和 HTML 预览。
+    条目按最近使用顺序排列，总大小超过上限时淘汰最久未用的条目
+    """
+    def __init__(self, root=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # 键 -> 占用字节数，最久未用的在前
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(root, exist_ok=True)
+        self.load_index()
+
+    def load_index(self):
+        """启动时按目录修改时间（最近使用时间）恢复 LRU 顺序"""
+        found = []
+        for entry in os.scandir(self.root):
+            if entry.is_dir() and not entry.name.startswith("."):
+                size = directory_size(entry.path)
+                found.append((entry.stat().st_mtime, entry.name, size))
+        for _, key, size in sorted(found):
+            self.entries[key] = size
+
+    @staticmethod
+    def key_for(pdf_path):
+        """PDF 内容 SHA-256 + 影响结果的 pipeline 参数"""
+        digest = hashlib.sha256()
+        with open(pdf_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        options = json.dumps([CACHE_VERSION, PIPELINE_MODULE, PIPELINE_EXTRA_ARGS, TEXT_LAYER_ENABLED,
+                              TEXT_LAYER_MIN_CHARS, TEXT_LAYER_MIN_COVERAGE, TEXT_LAYER_MAX_IMAGE_RATIO])
+        digest.update(options.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key):
+        """命中时返回 {"output": JSONL 路径, "preview": 预览目录或 None}，并更新最近使用时间"""
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return None
+            entry_dir = os.path.join(self.root, key)
+            output_path = os.path.join(entry_dir, "output.jsonl")
+            try:
+                if not os.path.exists(output_path):
+                    raise OSError(f"缓存条目缺少结果文件: {output_path}")
+                preview_dir = os.path.join(entry_dir, "preview")
+                if not os.path.isdir(preview_dir):
+                    preview_dir = None
+                os.utime(entry_dir)
+            except (OSError, ValueError):
+                # 条目已损坏或被删除
+                self.entries.pop(key, None)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return {"output": output_path, "preview": preview_dir}
+
+    def begin(self, key):
+        """创建临时条目目录（output.jsonl 和 preview 目录写入其中），写完后调用 commit"""
+        tmp_dir = os.path.join(self.root, f".tmp_{key}_{uuid.uuid4().hex[:8]}")
+        os.makedirs(tmp_dir)
+        return tmp_dir
+
+    def commit(self, key, tmp_dir):
+        """原子地替换为正式条目，并按大小上限淘汰旧条目"""
+        entry_dir = os.path.join(self.root, key)
+        size = directory_size(tmp_dir)
+        
+        with self.lock:
+            if key in self.entries:
+                shutil.rmtree(entry_dir, ignore_errors=True)
+            os.replace(tmp_dir, entry_dir)
+            self.entries[key] = size
+            self.entries.move_to_end(key)
+            self.evict()
+
+    def evict(self):
+        """淘汰最久未用的条目直到总大小不超过上限（至少保留最新的一个）"""
+        total = sum(self.entries.values())
+        while total > self.max_bytes and len(self.entries) > 1:
+            key, size = self.entries.popitem(last=False)
+            shutil.rmtree(os.path.join(self.root, key), ignore_errors=True)
+            total -= size
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self.entries),
+                "bytes": sum(self.entries.values()),
+            }
+
+    def stats_text(self):
+        stats = self.stats()
+        return (f"**结果缓存**: 命中 {stats['hits']} / 未命中 {stats['misses']} "
+                f"(命中率 {stats['hit_rate']:.0%}) · {stats['entries']} 个条目 · "
+                f"{stats['bytes'] / 1024 / 1024:.1f} MB / {self.max_bytes / 1024 / 1024:.0f} MB")
+
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+def get_result_cache():
+    global _result_cache
+    with _result_cache_lock:
+        if _result_cache is None:
+            _result_cache = ResultCache()
+        return _result_cache
+
+# --------------------------
+# 任务队列
+# --------------------------
+class OcrJob:
+    """一次 pipeline 调用，可包含多个 PDF（通过同一个 --pdfs 参数提交）"""
+    def __init__(self, pdf_files, cache_keys=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.pdf_files = pdf_files
+        self.cache_keys = cache_keys or [None] * len(pdf_files)
+        self.names = [os.path.basename(path) for path in pdf_files]
+        self.status = "排队中"
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.work_dir = None
+        self.log_path = None
+        self.log_text = ""
+        self.error = ""
+        self.results = None  # ResultReader
+        self.previews = []   # [(显示名, 预览目录)]
+        self.done = threading.Event()
+        self.cancel_event = threading.Event()
 
-def process_pdf(pdf_file):
-    """处理PDF文件并返回结果"""
-    if pdf_file is None:
-        return "请上传PDF文件", "", None, None
+class JobQueue:
+    """服务端任务队列：最多 concurrency 个任务同时执行，其余排队"""
+    def __init__(self, concurrency=OCR_CONCURRENCY):
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="ocr-job")
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+
+    def add(self, job):
+        with self.lock:
+            self.jobs[job.id] = job
+            # 只保留最近的已完成任务
+            while len(self.jobs) > MAX_JOB_HISTORY:
+                oldest_id, oldest = next(iter(self.jobs.items()))
+                if not oldest.done.is_set():
+                    break
+                del self.jobs[oldest_id]
+
+    def submit(self, pdf_files, cache_keys=None):
+        job = OcrJob(pdf_files, cache_keys)
+        self.add(job)
+        self.executor.submit(self.run, job)
+        return job
+
+    def add_cached(self, pdf_files, cached_results):
+        """记录直接由缓存返回结果的文件（不经过 pipeline）"""
+        job = OcrJob(pdf_files)
+        job.status = "缓存命中"
+        job.started_at = job.finished_at = time.time()
+        job.results = ResultReader([result["output"] for result in cached_results])
+        job.previews = [(name, result["preview"]) for name, result in zip(job.names, cached_results)
+                        if result["preview"]]
+        job.done.set()
+        self.add(job)
+        return job
+
+    def run(self, job):
+        if job.cancel_event.is_set():
+            job.status = "已取消"
+            job.done.set()
+            return
+        job.status = "处理中"
+        job.started_at = time.time()
+        try:
+            run_ocr_job(job)
+            if job.cancel_event.is_set():
+                job.status = "已取消"
+            else:
+                job.status = "失败" if job.error else "完成"
+        except Exception as e:
+            job.error = f"处理过程中发生错误: {str(e)}"
+            job.status = "失败"
+        finally:
+            job.finished_at = time.time()
+            job.done.set()
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """取消排队中或正在执行的任务；执行中的任务会结束其工作进程"""
+        job = self.get(job_id)
+        if job is None or job.done.is_set():
+            return False
+        job.cancel_event.set()
+        return True
+
+    def active_job_ids(self):
+        """排队中或执行中的任务，工作区清理时跳过它们的目录"""
+        with self.lock:
+            return {job.id for job in self.jobs.values() if not job.done.is_set()}
+
+    def status_table(self):
+        """任务状态表（最新的在前）"""
+        with self.lock:
+            jobs = list(self.jobs.values())
+        rows = []
+        for job in reversed(jobs):
+            if job.finished_at and job.started_at:
+                elapsed = f"{job.finished_at - job.started_at:.1f}s"
+            elif job.started_at:
+                elapsed = f"{time.time() - job.started_at:.1f}s"
+            else:
+                elapsed = ""
+            rows.append([job.id, job.status, len(job.names), ", ".join(job.names),
+                         time.strftime("%H:%M:%S", time.localtime(job.submitted_at)), elapsed])
+        return pd.DataFrame(rows, columns=["任务", "状态", "PDF数", "文件", "提交时间", "耗时"])
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+def get_job_queue():
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue()
+        return _job_queue
+
+def uploaded_file_path(pdf_file):
+    """兼容 Gradio 不同版本：上传文件可能是路径字符串或带 name 属性的临时文件对象"""
+    return getattr(pdf_file, "name", pdf_file)
+
+def ingest_file(src, dst):
+    """
+    把上传文件放入任务目录：同一文件系统上使用硬链接（不复制数据），否则退回到复制
+    :return: True 表示使用了硬链接
+    """
+    try:
+        os.link(src, dst)
+        return True
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EACCES, errno.EMLINK, errno.ENOTSUP):
+            raise
+    shutil.copy(src, dst)
+    return False
+
+def run_ocr_job(job):
+    """在任务线程中执行：准备工作目录、调用 pipeline、读取结果并生成预览"""
+    # 创建一个唯一的工作目录（任务 ID 随机生成，目录已存在说明出现了冲突，直接报错）
+    job.work_dir = os.path.join(WORKSPACE_DIR, f"job_{int(job.submitted_at)}_{job.id}")
+    os.makedirs(job.work_dir)
+    
+    # 放入PDF文件（保留原文件名，便于在结果中区分来源）
+    pdf_paths = []
+    for idx, pdf_file in enumerate(job.pdf_files):
+        pdf_path = os.path.join(job.work_dir, f"{idx:03d}_{os.path.basename(pdf_file)}")
+        ingest_file(pdf_file, pdf_path)
+        pdf_paths.append(pdf_path)
+    
+    # 预检：有文本层的页直接提取；其余页按大小分块，与小 PDF 一起交给常驻工作进程并行执行
+    log_path = os.path.join(job.work_dir, "pipeline.log")
+    job.log_path = log_path
+    units = plan_run_units(job, pdf_paths, log_path)
+    job.results = ResultReader([])
+    run_units(job, units, pdf_paths, log_path)
+    
+    # 命令输出
+    if os.path.exists(log_path):
+        with open(log_path, "r", encoding="utf-8", errors="replace") as lf:
+            job.log_text = lf.read()
+    if job.cancel_event.is_set():
+        return
     
-    # 创建一个唯一的工作目录
-    timestamp = int(time.time())
-    work_dir = os.path.join(WORKSPACE_DIR, f"job_{timestamp}")
-    os.makedirs(work_dir, exist_ok=True)
+    failed = [unit for unit in units if unit.error]
+    if failed:
+        job.error = "\n".join(f"{unit.label()}: {unit.error}" for unit in failed)
+        # 不完整的结果不写入缓存
+        for unit in failed:
+            for idx in unit.input_indexes:
+                job.cache_keys[idx] = None
     
-    # 复制PDF文件
-    pdf_path = os.path.join(work_dir, "input.pdf")
-    shutil.copy(pdf_file, pdf_path)
+    output_files = collect_outputs(job, units, pdf_paths)
+    if not output_files:
+        job.error = job.error or "处理完成，但未找到输出文件"
+        return
     
-    # 构建命令并执行
-    cmd = ["python", "-m", "olmocr.pipeline", work_dir, "--pdfs", pdf_path]
+    # 流式读取全部JSONL分片（每行一个文档），在任务线程中预先建立索引
+    job.results = ResultReader(output_files)
+    if not len(job.results):
+        job.error = job.error or "输出文件为空"
+        return
     
+    run_viewer(job, output_files)
+    preview_inputs = convert_previews(job)
+    
+    # 按输入文件写入结果缓存
     try:
-        # 执行命令，等待完成
-        process = subprocess.run(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            check=True
-        )
-        
-        # 命令输出
-        log_text = process.stdout
-        
-        # 检查结果目录
-        results_dir = os.path.join(work_dir, "results")
-        if not os.path.exists(results_dir):
-            return f"处理完成，但未生成结果目录\n\n日志输出:\n{log_text}", "", None, None
+        store_job_results(job, preview_inputs)
+    except OSError as e:
+        job.log_text += f"\n写入结果缓存失败: {str(e)}"
+
+def collect_outputs(job, units, pdf_paths):
+    """整理全部单元的输出；分页处理的结果合并后每个 PDF 还原为一个文档，页码与原文件一致"""
+    output_files = [path for unit in units if unit.input_idx is None for path in unit.output_files]
+    chunked = [unit for unit in units if unit.input_idx is not None and unit.output_files]
+    if chunked:
+        merged_path = os.path.join(job.work_dir, "results", "output_merged.jsonl")
+        merge_chunk_results(chunked, pdf_paths, merged_path)
+        output_files.append(merged_path)
+    return output_files
+
+def run_viewer(job, output_files):
+    """生成HTML预览（在任务目录中运行，dolma_previews 只包含本任务的预览）"""
+    for output_file in output_files:
+        try:
+            preview_cmd = [sys.executable, "-m", VIEWER_MODULE, os.path.abspath(output_file)]
+            subprocess.run(preview_cmd, cwd=job.work_dir, check=True)
+        except Exception as e:
+            job.log_text += f"\n生成HTML预览失败: {str(e)}"
+
+def convert_previews(job):
+    """
+    转换预览：页面图像拆成单独的文件，按输入 PDF 分目录保存
+    :return: {输入序号: 预览目录}
+    """
+    preview_inputs = {}
+    for html_file in sorted(Path(job.work_dir, "dolma_previews").glob("*.html")):
+        idx = preview_input_index(html_file.name, job.pdf_files)
+        preview_dir = os.path.join(job.work_dir, "previews", f"{idx:03d}" if idx is not None else html_file.stem)
+        try:
+            convert_preview(html_file, preview_dir)
+            os.remove(html_file)
+        except Exception as e:
+            job.log_text += f"\n转换HTML预览失败: {str(e)}"
+            continue
+        job.previews.append((job.names[idx] if idx is not None else html_file.stem, preview_dir))
+        if idx is not None:
+            preview_inputs[idx] = preview_dir
+    return preview_inputs
+
+class RunUnit:
+    """
+    一次处理单元：若干个完整的 PDF（一次 pipeline 调用），大 PDF 的一组页（一次 pipeline 调用），
+    或直接从文本层提取的一组页（不经过 pipeline）
+    """
+    def __init__(self, pdf_paths, input_indexes, input_idx=None, page_numbers=None, total_pages=None,
+                 text_layer=False):
+        self.pdf_paths = pdf_paths
+        self.input_indexes = input_indexes
+        self.input_idx = input_idx        # 分页处理时所属的输入序号，完整 PDF 时为 None
+        self.page_numbers = page_numbers  # 块内各页对应的原文件页码
+        self.total_pages = total_pages
+        self.text_layer = text_layer
+        self.output_files = []
+        self.error = ""
+        self.attempts = 0
+
+    def label(self):
+        if self.input_idx is None:
+            return ", ".join(os.path.basename(path) for path in self.pdf_paths)
+        return f"{os.path.basename(self.pdf_paths[0])} (页 {compact_ranges(self.page_numbers)})"
+
+def page_ranges(pages):
+    """[1, 2, 3, 5] -> [[1, 3], [5, 5]]"""
+    ranges = []
+    for page in pages:
+        if ranges and page == ranges[-1][1] + 1:
+            ranges[-1][1] = page
+        else:
+            ranges.append([page, page])
+    return ranges
+
+def compact_ranges(pages):
+    """[1, 2, 3, 5] -> '1-3, 5'"""
+    return ", ".join(str(first) if first == last else f"{first}-{last}" for first, last in page_ranges(pages))
+
+def page_has_text_layer(page):
+    """
+    判断页面是否有可直接使用的文本层：字符数足够、字符能正常解码（非替换字符/私用区），
+    且不是以图像为主的扫描页
+    """
+    import fitz
+    chars = good_chars = 0
+    for block in page.get_text("dict")["blocks"]:
+        for line in block.get("lines", []):
+            for span in line["spans"]:
+                for char in span["text"]:
+                    if char.isspace():
+                        continue
+                    chars += 1
+                    if char != "\ufffd" and not ("\ue000" <= char <= "\uf8ff") and char.isprintable():
+                        good_chars += 1
+    if chars < TEXT_LAYER_MIN_CHARS or good_chars / chars < TEXT_LAYER_MIN_COVERAGE:
+        return False
+    
+    page_area = abs(page.rect)
+    image_area = 0
+    for image in page.get_image_info():
+        bbox = fitz.Rect(image["bbox"]) & page.rect
+        image_area += abs(bbox)
+    return not page_area or image_area / page_area < TEXT_LAYER_MAX_IMAGE_RATIO
+
+def write_pdf_pages(doc, page_numbers, chunk_path):
+    """把指定页（原文件页码，可不连续）写成新的 PDF"""
+    import fitz
+    with fitz.open() as part:
+        for first, last in page_ranges(page_numbers):
+            part.insert_pdf(doc, from_page=first - 1, to_page=last - 1)
+        part.save(chunk_path)
+
+def plan_pdf_units(idx, pdf_path, work_dir):
+    """
+    用 PyMuPDF 预检 PDF：有文本层的页直接提取，其余页按 CHUNK_PAGES 分块交给 pipeline。
+    整个文件直接交给 pipeline（未安装 PyMuPDF、页数不多且没有可用文本层）时返回空列表
+    """
+    try:
+        import fitz
+    except ImportError:
+        return []
+    units = []
+    with fitz.open(pdf_path) as doc:
+        total_pages = doc.page_count
+        text_pages = {}
+        if TEXT_LAYER_ENABLED:
+            for page in doc:
+                if page_has_text_layer(page):
+                    text_pages[page.number + 1] = page.get_text("text", sort=True)
+        ocr_pages = [page for page in range(1, total_pages + 1) if page not in text_pages]
+        if not text_pages and total_pages <= CHUNK_PAGES:
+            return []
         
-        # 查找输出文件
-        output_files = list(Path(results_dir).glob("output_*.jsonl"))
-        if not output_files:
-            return f"处理完成，但未找到输出文件\n\n日志输出:\n{log_text}", "", None, None
+        # 文本层页：连续的页作为一个单元，结果直接写出
+        prefix, name = os.path.basename(pdf_path).split("_", 1)
+        text_dir = os.path.join(work_dir, "text_layer")
+        for first, last in page_ranges(sorted(text_pages)):
+            pages = list(range(first, last + 1))
+            os.makedirs(text_dir, exist_ok=True)
+            unit = RunUnit([pdf_path], [idx], idx, pages, total_pages, text_layer=True)
+            unit.output_files = [os.path.join(text_dir, f"{prefix}_p{first:05d}.jsonl")]
+            text_doc = page_document(pdf_path, [(page, text_pages[page]) for page in pages])
+            with open(unit.output_files[0], "w", encoding="utf-8") as out:
+                out.write(json.dumps(text_doc, ensure_ascii=False) + "\n")
+            units.append(unit)
         
-        # 读取JSONL文件
-        output_file = output_files[0]
-        with open(output_file, "r") as f:
-            content = f.read().strip()
-            if not content:
-                return f"输出文件为空\n\n日志输出:\n{log_text}", "", None, None
-            
-            # 解析JSON
-            result = json.loads(content)
-            extracted_text = result.get("text", "未找到文本内容")
-            
-            # 生成HTML预览
+        # 需要 OCR 的页：按 CHUNK_PAGES 分块（块文件名保留 000_ 前缀，结果仍能对应到输入序号）
+        chunk_dir = os.path.join(work_dir, "chunks")
+        for start in range(0, len(ocr_pages), CHUNK_PAGES):
+            pages = ocr_pages[start:start + CHUNK_PAGES]
+            os.makedirs(chunk_dir, exist_ok=True)
+            chunk_path = os.path.join(chunk_dir, f"{prefix}_p{pages[0]:05d}-{pages[-1]:05d}_{name}")
+            write_pdf_pages(doc, pages, chunk_path)
+            units.append(RunUnit([chunk_path], [idx], idx, pages, total_pages))
+    return sorted(units, key=lambda unit: unit.page_numbers[0])
+
+def page_document(source, pages, metadata=None, page_sources=None):
+    """把 [(页码, 文本)] 组成一个与 pipeline 输出格式相同的文档（页之间用换行分隔）"""
+    texts, spans, length = [], [], 0
+    for page, text in pages:
+        if texts:
+            texts.append("\n")
+            length += 1
+        spans.append([length, length + len(text), page])
+        texts.append(text)
+        length += len(text)
+    metadata = dict(metadata or {})
+    metadata["Source-File"] = source
+    attributes = {"pdf_page_numbers": spans}
+    if page_sources:
+        attributes["page_sources"] = page_sources
+    return {"id": hashlib.sha1(source.encode("utf-8")).hexdigest(), "text": "".join(texts),
+            "metadata": metadata, "attributes": attributes}
+
+def plan_run_units(job, pdf_paths, log_path):
+    """小 PDF 合并为一次调用（通过同一个 --pdfs 参数），需要分页处理的 PDF 拆分为多个单元"""
+    whole, units = [], []
+    for idx, pdf_path in enumerate(pdf_paths):
+        try:
+            pdf_units = plan_pdf_units(idx, pdf_path, job.work_dir)
+        except Exception as e:
+            with open(log_path, "a", encoding="utf-8") as lf:
+                lf.write(f"{os.path.basename(pdf_path)} 预检失败，按整个文件处理: {str(e)}\n")
+            pdf_units = []
+        if not pdf_units:
+            whole.append(idx)
+        units.extend(pdf_units)
+    if whole:
+        units.insert(0, RunUnit([pdf_paths[idx] for idx in whole], whole))
+    return units
+
+def run_unit(job, unit, unit_no, log_path):
+    """执行一个处理单元；分块失败时在新的工作目录中重试。文本层单元已在预检时完成"""
+    if unit.text_layer:
+        return
+    while True:
+        if job.cancel_event.is_set():
+            unit.error = "任务已取消"
+            return
+        unit.attempts += 1
+        run_dir = os.path.join(job.work_dir, "runs", f"{unit_no:03d}_{unit.attempts}")
+        ok, error = get_worker_pool().run_job([run_dir, "--pdfs"] + unit.pdf_paths, log_path,
+                                              cancel_event=job.cancel_event)
+        if ok:
+            unit.output_files = sorted(Path(run_dir, "results").glob("output_*.jsonl"))
+            if unit.output_files:
+                unit.error = ""
+                return
+            error = "处理完成，但未找到输出文件"
+        else:
+            error = f"命令执行失败: {error}"
+        unit.error = error
+        if job.cancel_event.is_set() or unit.input_idx is None or unit.attempts > CHUNK_RETRIES:
+            return
+        with open(log_path, "a", encoding="utf-8") as lf:
+            lf.write(f"\n{unit.label()} 第 {unit.attempts} 次处理失败（{error}），重试\n")
+
+def run_units(job, units, pdf_paths, log_path):
+    """
+    并行执行全部处理单元（并发数受常驻工作进程数限制），
+    按顺序把已完成的单元加入 job.results，界面可以先显示前面的页
+    """
+    chunk_dir = os.path.join(job.work_dir, "chunk_results")
+    next_unit = 0
+    with ThreadPoolExecutor(max_workers=OCR_CONCURRENCY, thread_name_prefix=f"ocr-{job.id}") as executor:
+        futures = [executor.submit(run_unit, job, unit, unit_no, log_path) for unit_no, unit in enumerate(units)]
+        for future in as_completed(futures):
+            future.result()
+            while next_unit < len(units) and futures[next_unit].done():
+                unit = units[next_unit]
+                if unit.input_idx is not None and not unit.text_layer and unit.output_files:
+                    # 块内页码换算为原文件页码
+                    os.makedirs(chunk_dir, exist_ok=True)
+                    rebased_path = os.path.join(chunk_dir, f"{next_unit:04d}.jsonl")
+                    rebase_chunk_output(unit, pdf_paths[unit.input_idx], rebased_path)
+                    unit.output_files = [rebased_path]
+                for output_file in unit.output_files:
+                    job.results.append(output_file)
+                next_unit += 1
+
+def rebase_chunk_output(unit, source, output_path):
+    """把分块的结果改写为原文件的页码和来源文件"""
+    with open(output_path, "w", encoding="utf-8") as out:
+        for path in unit.output_files:
+            for _, _, raw in ResultReader.iter_shard(path):
+                doc = json.loads(raw)
+                attributes = doc.setdefault("attributes", {})
+                attributes["pdf_page_numbers"] = [[start, end, unit.page_numbers[page - 1]]
+                                                  for start, end, page in attributes.get("pdf_page_numbers") or []
+                                                  if 0 < page <= len(unit.page_numbers)]
+                metadata = doc.setdefault("metadata", {})
+                metadata["Source-File"] = source
+                metadata["Page-Range"] = compact_ranges(unit.page_numbers)
+                out.write(json.dumps(doc, ensure_ascii=False) + "\n")
+
+def merge_chunk_results(units, pdf_paths, output_path):
+    """
+    每个分页处理的 PDF 按页序合并为一个文档：total-* 统计项累加，
+    每页的来源（文本层 / OCR）记录在 metadata 的 Page-Sources 和 attributes 的 page_sources 中
+    """
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    by_input = OrderedDict()
+    for unit in sorted(units, key=lambda unit: unit.input_idx):
+        by_input.setdefault(unit.input_idx, []).append(unit)
+    
+    with open(output_path, "w", encoding="utf-8") as out:
+        for idx, input_units in by_input.items():
+            pages, metadata = {}, {}
+            for unit in input_units:
+                source = "text-layer" if unit.text_layer else "ocr"
+                for doc in ResultReader(unit.output_files):
+                    text = doc.get("text") or ""
+                    spans = (doc.get("attributes") or {}).get("pdf_page_numbers") or []
+                    if not spans:
+                        # 没有页范围信息时整段文本归到块的第一页
+                        spans = [[0, len(text), unit.page_numbers[0]]]
+                    for start, end, page in spans:
+                        pages[page] = (text[start:end], source)
+                    for key, value in (doc.get("metadata") or {}).items():
+                        if key.startswith("total-") and isinstance(value, (int, float)):
+                            metadata[key] = metadata.get(key, 0) + value
+                        else:
+                            metadata.setdefault(key, value)
+            metadata.pop("Page-Range", None)
+            metadata["pdf-total-pages"] = input_units[0].total_pages
+            page_sources = [[page, pages[page][1]] for page in sorted(pages)]
+            text_layer_pages = [page for page, source in page_sources if source == "text-layer"]
+            ocr_pages = [page for page, source in page_sources if source == "ocr"]
+            metadata["Page-Sources"] = "; ".join(
+                f"{label}: {compact_ranges(group)}"
+                for label, group in (("文本层", text_layer_pages), ("OCR", ocr_pages)) if group)
+            doc = page_document(pdf_paths[idx], [(page, pages[page][0]) for page in sorted(pages)],
+                                metadata, page_sources)
+            out.write(json.dumps(doc, ensure_ascii=False) + "\n")
+
+def input_index_of(metadata, input_count):
+    """根据文档的 Source-File（形如 000_xxx.pdf）找到对应的输入序号"""
+    source = os.path.basename(str(metadata.get("Source-File", "")))
+    match = re.match(r"(\d{3})_", source)
+    if match and int(match.group(1)) < input_count:
+        return int(match.group(1))
+    return 0 if input_count == 1 else None
+
+def preview_input_index(html_name, pdf_files):
+    """预览文件名中包含 000_xxx 形式的输入文件名时返回对应的输入序号"""
+    for idx, pdf_file in enumerate(pdf_files):
+        if f"{idx:03d}_{os.path.splitext(os.path.basename(pdf_file))[0]}" in html_name:
+            return idx
+    return 0 if len(pdf_files) == 1 else None
+
+def store_job_results(job, preview_inputs):
+    """
+    把任务结果按输入 PDF 拆分后写入缓存
+    :param preview_inputs: {输入序号: 预览目录}
+    """
+    cache = get_result_cache()
+    staging = {}  # 输入序号 -> (临时条目目录, 结果文件)
+    try:
+        # 按索引逐个复制原始行，不重新解析/序列化文档
+        for doc_idx, metadata in enumerate(job.results.metadata):
+            idx = input_index_of(metadata, len(job.pdf_files))
+            if idx is None or job.cache_keys[idx] is None:
+                continue
+            if idx not in staging:
+                tmp_dir = cache.begin(job.cache_keys[idx])
+                staging[idx] = (tmp_dir, open(os.path.join(tmp_dir, "output.jsonl"), "wb"))
+            raw = job.results.raw_line(doc_idx)
+            staging[idx][1].write(raw if raw.endswith(b"\n") else raw + b"\n")
+    finally:
+        for _, output in staging.values():
+            output.close()
+    
+    for idx, (tmp_dir, _) in staging.items():
+        if idx in preview_inputs:
+            shutil.copytree(preview_inputs[idx], os.path.join(tmp_dir, "preview"), copy_function=ingest_file)
+        cache.commit(job.cache_keys[idx], tmp_dir)
+
+def result_readers(jobs):
+    return [job.results for job in jobs if job.results is not None]
+
+def result_page(jobs, page_no):
+    """
+    跨任务分页读取文本（只读取当前页所在的文档）
+    :param page_no: 从 1 开始的页序号，超出范围时取最近的有效值
+    :return: (文本, 分页说明, 实际页序号)
+    """
+    readers = result_readers(jobs)
+    total = sum(reader.page_count() for reader in readers)
+    if not total:
+        return "", "", 1
+    page_no = min(max(int(page_no or 1), 1), total)
+    page_idx = page_no - 1
+    for reader in readers:
+        if page_idx < reader.page_count():
             try:
-                preview_cmd = ["python", "-m", "olmocr.viewer.dolmaviewer", str(output_file)]
-                subprocess.run(preview_cmd, check=True)
-            except Exception as e:
-                log_text += f"\n生成HTML预览失败: {str(e)}"
-            
-            # 查找HTML文件
-            html_files = list(Path("dolma_previews").glob("*.html"))
-            html_content = ""
-            if html_files:
-                try:
-                    with open(html_files[0], "r", encoding="utf-8") as hf:
-                        html_content = hf.read()
-                        # 修改HTML以更好地显示
-                        html_content = modify_html_for_better_display(html_content)
-                except Exception as e:
-                    log_text += f"\n读取HTML预览失败: {str(e)}"
-            
-            # 创建元数据表格
-            metadata = result.get("metadata", {})
-            meta_rows = []
+                source, page, text = reader.page(page_idx)
+            except OSError:
+                return "结果文件已被清理，请重新处理", "", page_no
+            return text, f"第 {page_no}/{total} 页 · {source} 第 {page} 页", page_no
+        page_idx -= reader.page_count()
+
+def show_result_page(job_ids, page_no):
+    """翻页：读取当前会话任务结果的指定页"""
+    return result_page(session_jobs(job_ids), page_no)
+
+def preview_choices(jobs):
+    """HTML预览下拉框的选项：[(显示名, 预览目录)]"""
+    return [preview for job in jobs for preview in job.previews]
+
+def format_job_results(jobs):
+    """把一个或多个任务的结果整理为界面输出：日志、HTML预览选项、元数据表格（文本由 result_page 分页读取）"""
+    log_parts = []
+    meta_rows = []
+    readers = result_readers(jobs)
+    document_count = sum(len(reader) for reader in readers)
+    
+    for job in jobs:
+        header = f"[任务 {job.id}] {', '.join(job.names)}"
+        if job.error:
+            log_parts.append(f"{header}\n{job.error}\n\n日志输出:\n{job.log_text}")
+        else:
+            log_parts.append(f"{header}\n{job.log_text}")
+    
+    # 创建元数据表格（元数据在建立索引时已读取，不需要再读文档）
+    for reader in readers:
+        for metadata in reader.metadata:
+            if document_count > 1:
+                # 多个文档时用来源文件分隔
+                meta_rows.append(["文件", metadata.get("Source-File", "")])
             for key, value in metadata.items():
                 meta_rows.append([key, value])
+    
+    df = pd.DataFrame(meta_rows, columns=["属性", "值"]) if document_count else None
+    return "\n\n".join(log_parts), preview_choices(jobs), df
+
+def submit_pdfs(paths):
+    """
+    提交一批 PDF：缓存命中的直接返回结果，其余按 MAX_PDFS_PER_JOB 分组提交到任务队列
+    :return: 任务列表（缓存命中的文件合并为一个已完成的任务）
+    """
+    cache = get_result_cache()
+    job_queue = get_job_queue()
+    cached_paths, cached_results = [], []
+    pending_paths, pending_keys = [], []
+    for path in paths:
+        key = cache.key_for(path)
+        result = cache.get(key)
+        if result is not None:
+            cached_paths.append(path)
+            cached_results.append(result)
+        else:
+            pending_paths.append(path)
+            pending_keys.append(key)
+    
+    jobs = []
+    if cached_paths:
+        jobs.append(job_queue.add_cached(cached_paths, cached_results))
+    for start in range(0, len(pending_paths), MAX_PDFS_PER_JOB):
+        jobs.append(job_queue.submit(pending_paths[start:start + MAX_PDFS_PER_JOB],
+                                     pending_keys[start:start + MAX_PDFS_PER_JOB]))
+    return jobs
+
+class LogTail:
+    """增量读取正在写入的日志文件（按字节偏移续读，多字节字符跨块时也能正确解码）"""
+    def __init__(self):
+        self.path = None
+        self.offset = 0
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    def read_new(self, path):
+        if path != self.path:
+            self.path, self.offset = path, 0
+            self.decoder.reset()
+        if not path or not os.path.exists(path):
+            return ""
+        with open(path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read()
+        self.offset += len(data)
+        return self.decoder.decode(data)
+
+def job_progress(jobs, logs):
+    """汇总进度：完成的任务数，以及从日志中识别到的页进度"""
+    finished = sum(1 for job in jobs if job.done.is_set())
+    pages_done = pages_total = 0
+    for job in jobs:
+        matches = PAGE_PROGRESS_PATTERN.findall(logs[job.id])
+        if matches:
+            done, total = [group for group in matches[-1] if group]
+            pages_done += int(done)
+            pages_total += int(total)
+    progress = f"**进度**: 任务 {finished}/{len(jobs)} 完成"
+    if pages_total:
+        progress += f" · 页 {pages_done}/{pages_total}"
+    statuses = ", ".join(sorted(set(job.status for job in jobs)))
+    return f"{progress} · 状态: {statuses}"
+
+def process_pdf(pdf_files):
+    """
+    处理一个或多个PDF文件（多个文件按 MAX_PDFS_PER_JOB 分组提交到任务队列）
+    以生成器方式持续输出：进度、实时日志、已完成任务的文本，全部完成后输出预览和元数据
+    """
+    if not pdf_files:
+        yield "", "请上传PDF文件", "", None, None, [], 1, "", gr.update(choices=[], value=None)
+        return
+    if not isinstance(pdf_files, list):
+        pdf_files = [pdf_files]
+    
+    paths = [uploaded_file_path(pdf_file) for pdf_file in pdf_files]
+    job_queue = get_job_queue()
+    jobs = submit_pdfs(paths)
+    job_ids = [job.id for job in jobs]
+    
+    tails = dict((job.id, LogTail()) for job in jobs)
+    logs = dict((job.id, "") for job in jobs)
+    try:
+        while not all(job.done.is_set() for job in jobs):
+            for job in jobs:
+                logs[job.id] += tails[job.id].read_new(job.log_path)
             
-            df = pd.DataFrame(meta_rows, columns=["属性", "值"])
-            
-            return log_text, extracted_text, html_content, df
-        
-    except subprocess.CalledProcessError as e:
-        return f"命令执行失败: {e.stderr}", "", None, None
-    except Exception as e:
-        return f"处理过程中发生错误: {str(e)}", "", None, None
+            # 已完成的任务和大文件已完成的块先显示第一页文本
+            partial_text, page_info, _ = result_page(jobs, 1)
+            log_text = "\n\n".join(f"[任务 {job.id}] {', '.join(job.names)}\n{logs[job.id]}" for job in jobs)
+            yield (job_progress(jobs, logs), log_text[-LOG_TAIL_CHARS:], partial_text, None, None, job_ids,
+                   1, page_info, gr.update())
+            time.sleep(STREAM_INTERVAL)
+    except GeneratorExit:
+        # 客户端断开或点击了取消：结束仍在执行的任务
+        for job_id in job_ids:
+            job_queue.cancel(job_id)
+        raise
+    
+    log_text, previews, df = format_job_results(jobs)
+    text, page_info, _ = result_page(jobs, 1)
+    # 只载入第一个预览，其余在下拉框中选择时再读取
+    first_preview = previews[0][1] if previews else None
+    yield (job_progress(jobs, logs), log_text[-LOG_TAIL_CHARS:], text, load_preview(first_preview, job_ids), df,
+           job_ids, 1, page_info, gr.update(choices=previews, value=first_preview))
+
+def queue_overview():
+    """任务队列标签页：任务状态表和缓存统计"""
+    return get_job_queue().status_table(), get_result_cache().stats_text()
+
+def cancel_jobs(job_ids):
+    """取消当前会话提交的任务"""
+    job_queue = get_job_queue()
+    cancelled = [job_id for job_id in (job_ids or []) if job_queue.cancel(job_id)]
+    if cancelled:
+        return f"**已取消** {len(cancelled)} 个任务"
+    return "没有正在执行的任务"
+
+# --------------------------
+# 异步 API（与界面共用同一个任务队列）
+# 用法（gradio_client）:
+#   ids = client.predict([handle_file("a.pdf")], api_name="/submit")["job_ids"]
+#   client.predict(",".join(ids), api_name="/status")
+#   for chunk in client.submit(ids[0], api_name="/result"): ...  # 每次输出一段 JSONL
+# --------------------------
+def parse_job_ids(job_ids):
+    """接受列表、JSON 数组或逗号/空白分隔的字符串"""
+    if isinstance(job_ids, str):
+        text = job_ids.strip()
+        if text.startswith("["):
+            job_ids = json.loads(text)
+        else:
+            job_ids = re.split(r"[\s,]+", text)
+    return [str(job_id) for job_id in job_ids or [] if str(job_id).strip()]
+
+def log_page_progress(log_path):
+    """从日志尾部识别最近的页进度"""
+    if not log_path or not os.path.exists(log_path):
+        return None
+    with open(log_path, "rb") as f:
+        f.seek(max(0, os.path.getsize(log_path) - API_LOG_TAIL_BYTES))
+        tail = f.read().decode("utf-8", errors="replace")
+    matches = PAGE_PROGRESS_PATTERN.findall(tail)
+    if not matches:
+        return None
+    done, total = [group for group in matches[-1] if group]
+    return int(done), int(total)
+
+def job_status(job):
+    status = {
+        "id": job.id,
+        "status": job.status,
+        "done": job.done.is_set(),
+        "files": job.names,
+        "submitted_at": job.submitted_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "error": job.error,
+        # 已经可以读取的页（大文件分块处理时逐块增加）
+        "pages_ready": job.results.page_count() if job.results is not None else 0,
+    }
+    progress = None if job.done.is_set() else log_page_progress(job.log_path)
+    if progress:
+        status["pages_done"], status["pages_total"] = progress
+    return status
+
+def api_submit(pdf_files):
+    """提交 PDF，立即返回任务 ID，不等待处理完成"""
+    if not pdf_files:
+        raise gr.Error("请上传PDF文件")
+    if not isinstance(pdf_files, list):
+        pdf_files = [pdf_files]
+    jobs = submit_pdfs([uploaded_file_path(pdf_file) for pdf_file in pdf_files])
+    return {"job_ids": [job.id for job in jobs], "jobs": [job_status(job) for job in jobs]}
+
+def api_status(job_ids):
+    """查询任务状态；不存在（或已从历史中移除）的任务返回 status=未知"""
+    job_queue = get_job_queue()
+    statuses = []
+    for job_id in parse_job_ids(job_ids):
+        job = job_queue.get(job_id)
+        statuses.append(job_status(job) if job is not None else {"id": job_id, "status": "未知", "done": False})
+    return {"jobs": statuses}
+
+def api_result(job_id):
+    """
+    以 JSONL 分段流式输出已完成任务的结果（每次最多 API_RESULT_CHUNK_BYTES，客户端按顺序拼接）
+    """
+    job = get_job_queue().get(str(job_id).strip())
+    if job is None:
+        raise gr.Error(f"任务不存在: {job_id}")
+    if not job.done.is_set():
+        raise gr.Error(f"任务尚未完成: {job.status}")
+    if job.results is None:
+        raise gr.Error(job.error or f"任务没有结果: {job.status}")
+    chunk, size = [], 0
+    try:
+        for _, _, raw in job.results.iter_lines():
+            line = raw.decode("utf-8").rstrip("\r\n") + "\n"
+            chunk.append(line)
+            size += len(raw)
+            if size >= API_RESULT_CHUNK_BYTES:
+                yield "".join(chunk)
+                chunk, size = [], 0
+    except OSError:
+        raise gr.Error("结果文件已被清理，请重新提交")
+    if chunk:
+        yield "".join(chunk)
 
 # 创建Gradio界面
-with gr.Blocks(title="olmOCR PDF提取工具") as app:
-    gr.Markdown("# olmOCR PDF文本提取工具")
+def create_app():
+    """构建 Gradio 界面（放在函数中，工作进程以 spawn 方式启动时不会重复构建）"""
+    with gr.Blocks(title="olmOCR PDF提取工具") as app:
+        gr.Markdown("# olmOCR PDF文本提取工具")
     
-    with gr.Row():
-        with gr.Column(scale=1):
-            pdf_input = gr.File(label="上传PDF文件", file_types=[".pdf"])
-            process_btn = gr.Button("处理PDF", variant="primary")
+        with gr.Row():
+            with gr.Column(scale=1):
+                pdf_input = gr.File(label="上传PDF文件（可多选）", file_types=[".pdf"], file_count="multiple")
+                process_btn = gr.Button("处理PDF", variant="primary")
+                cancel_btn = gr.Button("取消", variant="stop")
+                progress_output = gr.Markdown()
+                job_ids_state = gr.State([])
         
-        with gr.Column(scale=2):
-            tabs = gr.Tabs()
-            with tabs:
-                with gr.TabItem("提取文本"):
-                    text_output = gr.Textbox(label="提取的文本", lines=20, interactive=True)
-                with gr.TabItem("HTML预览", id="html_preview_tab"):
-                    # 使用更大的HTML组件
-                    html_output = gr.HTML(label="HTML预览", elem_id="html_preview_container")
-                with gr.TabItem("元数据"):
-                    meta_output = gr.DataFrame(label="文档元数据")
-                with gr.TabItem("日志"):
-                    log_output = gr.Textbox(label="处理日志", lines=15, interactive=False)
-    
-    # 使用CSS自定义HTML预览标签页和内容大小
-    gr.HTML("""
-    <style>
-    #html_preview_container {
-        height: 800px;
-        width: 100%; 
-        overflow: auto;
-        border: 1px solid #ddd;
-        border-radius: 4px;
-    }
-    #html_preview_container iframe {
-        width: 100%;
-        height: 100%;
-        border: none;
-    }
-    </style>
-    """)
-    
-    # 添加操作说明
-    gr.Markdown("""
-    ## 使用说明
-    1. 上传PDF文件
-    2. 点击"处理PDF"按钮
-    3. 等待处理完成
-    4. 查看提取的文本和HTML预览
-    
-    ### 关于HTML预览
-    - HTML预览展示原始PDF页面和提取的文本对照
-    - 可以清楚地看到OCR过程的精确度
-    - 如果预览内容太小，可以使用右下角的放大/缩小按钮调整
-    
-    ## 注意
-    - 处理过程可能需要几分钟，请耐心等待
-    - 首次运行会下载模型（约7GB）
-    """)
-    
-    # 绑定按钮事件 - 使用阻塞模式
-    process_btn.click(
-        fn=process_pdf,
-        inputs=pdf_input,
-        outputs=[log_output, text_output, html_output, meta_output],
-        api_name="process"
-    )
+            with gr.Column(scale=2):
+                tabs = gr.Tabs()
+                with tabs:
+                    with gr.TabItem("提取文本"):
+                        # 按页显示，长文档不会一次性载入整段文本
+                        text_output = gr.Textbox(label="提取的文本", lines=20, interactive=True)
+                        with gr.Row():
+                            prev_page_btn = gr.Button("上一页")
+                            page_input = gr.Number(value=1, precision=0, label="页")
+                            next_page_btn = gr.Button("下一页")
+                        page_info_output = gr.Markdown()
+                    with gr.TabItem("HTML预览", id="html_preview_tab"):
+                        preview_select = gr.Dropdown(label="预览文件", choices=[])
+                        # 使用更大的HTML组件
+                        html_output = gr.HTML(label="HTML预览", elem_id="html_preview_container")
+                    with gr.TabItem("元数据"):
+                        meta_output = gr.DataFrame(label="文档元数据")
+                    with gr.TabItem("日志"):
+                        log_output = gr.Textbox(label="处理日志", lines=15, interactive=False)
+                    with gr.TabItem("任务队列"):
+                        cache_stats_output = gr.Markdown()
+                        jobs_output = gr.DataFrame(label="任务状态")
+                        refresh_jobs_btn = gr.Button("刷新")
+    
+        # 使用CSS自定义HTML预览标签页和内容大小
+        gr.HTML("""
+        <style>
+        #html_preview_container {
+            height: 800px;
+            width: 100%; 
+            overflow: auto;
+            border: 1px solid #ddd;
+            border-radius: 4px;
+        }
+        #html_preview_container iframe {
+            width: 100%;
+            height: 100%;
+            border: none;
+        }
+        </style>
+        """)
+    
+        # 添加操作说明
+        gr.Markdown("""
+        ## 使用说明
+        1. 上传一个或多个PDF文件
+        2. 点击"处理PDF"按钮
+        3. 等待处理完成
+        4. 查看提取的文本和HTML预览
+        5. 在"任务队列"标签页查看排队和处理状态
+    
+        ### 关于HTML预览
+        - HTML预览展示原始PDF页面和提取的文本对照
+        - 可以清楚地看到OCR过程的精确度
+        - 如果预览内容太小，可以使用右下角的放大/缩小按钮调整
+    
+        ## 注意
+        - 处理过程可能需要几分钟，请耐心等待
+        - 首次运行会下载模型（约7GB）
+    
+        ## API
+        - `/submit`：上传PDF，立即返回任务ID
+        - `/status`：按任务ID查询状态和进度
+        - `/result`：任务完成后以 JSONL 分段流式返回结果
+        """)
+    
+        # 异步 API 使用的隐藏组件
+        with gr.Row(visible=False):
+            api_files = gr.File(file_count="multiple", file_types=[".pdf"])
+            api_job_ids = gr.Textbox()
+            api_json = gr.JSON()
+            api_jsonl = gr.Textbox()
+            api_submit_btn = gr.Button()
+            api_status_btn = gr.Button()
+            api_result_btn = gr.Button()
+    
+        # 绑定按钮事件 - 生成器流式输出；并发由服务端任务队列控制，Gradio 层不限制同时进行的请求数
+        process_event = process_btn.click(
+            fn=process_pdf,
+            inputs=pdf_input,
+            outputs=[progress_output, log_output, text_output, html_output, meta_output, job_ids_state,
+                     page_input, page_info_output, preview_select],
+            api_name="process",
+            concurrency_limit=None
+        )
+        # 异步 API：提交和查询立即返回，结果按段流式输出
+        api_submit_btn.click(fn=api_submit, inputs=api_files, outputs=api_json,
+                             api_name="submit", concurrency_limit=None)
+        api_status_btn.click(fn=api_status, inputs=api_job_ids, outputs=api_json,
+                             api_name="status", concurrency_limit=None)
+        api_result_btn.click(fn=api_result, inputs=api_job_ids, outputs=api_jsonl,
+                             api_name="result", concurrency_limit=None)
+        # 取消：结束本会话的任务（连同工作进程），并停止流式输出
+        cancel_btn.click(fn=cancel_jobs, inputs=job_ids_state, outputs=progress_output, cancels=[process_event])
+        preview_select.input(fn=load_preview, inputs=[preview_select, job_ids_state], outputs=html_output)
+        # 翻页
+        page_outputs = [text_output, page_info_output, page_input]
+        prev_page_btn.click(fn=lambda ids, page: show_result_page(ids, (page or 1) - 1),
+                            inputs=[job_ids_state, page_input], outputs=page_outputs)
+        next_page_btn.click(fn=lambda ids, page: show_result_page(ids, (page or 1) + 1),
+                            inputs=[job_ids_state, page_input], outputs=page_outputs)
+        page_input.submit(fn=show_result_page, inputs=[job_ids_state, page_input], outputs=page_outputs)
+        refresh_jobs_btn.click(fn=queue_overview, outputs=[jobs_output, cache_stats_output])
+        app.load(fn=queue_overview, outputs=[jobs_output, cache_stats_output])
+    
+    return app
 
 # 启动应用
 if __name__ == "__main__":
-    app.launch(share=True)
+    # 后台预热工作进程，首次点击时 pipeline 及其依赖已经导入
+    threading.Thread(target=lambda: get_worker_pool().ensure_started(), daemon=True).start()
+    # 后台定期清理工作区
+    threading.Thread(target=workspace_gc_loop, daemon=True).start()
+    app = create_app()
+    # 预览中的页面图像以单独文件的形式由 Gradio 提供；只开放对外目录，不开放整个工作区
+    os.makedirs(PREVIEW_PUBLIC_DIR, exist_ok=True)
+    app.launch(share=True, allowed_paths=[os.path.abspath(PREVIEW_PUBLIC_DIR)])
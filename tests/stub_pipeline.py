@@ -0,0 +1,43 @@
+"""
+测试用的 pipeline 桩模块：不加载模型，按命令行参数模拟正常完成、失败、崩溃和卡住
+用法: stub_pipeline.py <结果文件> [ok|fail|crash|hang] [--server 地址]
+"""
+import asyncio
+import json
+import os
+import sys
+
+# 模块级状态：工作进程每次任务前 reload 模块，这里应当总是从 0 开始
+RUNS = 0
+LOOP_QUEUE = None
+
+async def run(result_path, mode, server=None):
+    global RUNS, LOOP_QUEUE
+    # 模块级的 asyncio 对象绑定在第一次使用的事件循环上，跨 asyncio.run 复用会出错
+    if LOOP_QUEUE is None:
+        LOOP_QUEUE = asyncio.Queue()
+    await LOOP_QUEUE.put(mode)
+    await LOOP_QUEUE.get()
+    RUNS += 1
+    if mode == "fail":
+        raise RuntimeError("stub failure")
+    if mode == "crash":
+        os._exit(3)
+    if mode == "hang":
+        await asyncio.sleep(3600)
+    print("stub pipeline done", flush=True)
+    result = {"pid": os.getpid(), "runs": RUNS}
+    if server:
+        result["server"] = server
+    with open(result_path, "w", encoding="utf-8") as f:
+        json.dump(result, f)
+
+def main():
+    args = sys.argv[1:]
+    server = None
+    if "--server" in args:
+        i = args.index("--server")
+        server = args[i + 1]
+        del args[i:i + 2]
+    mode = args[1] if len(args) > 1 else "ok"
+    return run(args[0], mode, server)
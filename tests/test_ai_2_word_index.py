@@ -0,0 +1,47 @@
+"""ai_2_word 全文索引的测试：trigram 分词与不支持 trigram 时的 LIKE 回退"""
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import ai_2_word
+
+FRAMES = [
+    {'index': 1, 'x': 10, 'y': 20, 'content': "这是一个文本框内容"},
+    {'index': 2, 'x': 30, 'y': 40, 'content': "Part number AB-1234"},
+]
+
+def build_index(db_path):
+    ai_2_word.update_text_index(str(db_path), "sample.ai", FRAMES)
+
+def keys(rows):
+    return [row[1] for row in rows]
+
+def test_substring_search_with_trigram(tmp_path):
+    db_path = tmp_path / "index.db"
+    build_index(db_path)
+    conn = ai_2_word.open_text_index(str(db_path))
+    try:
+        assert ai_2_word.has_trigram_index(conn)
+    finally:
+        conn.close()
+    assert keys(ai_2_word.search_text_index("文本框", str(db_path))) == [1]
+    assert keys(ai_2_word.search_text_index("1234", str(db_path))) == [2]
+    # 少于 3 个字符走 LIKE
+    assert keys(ai_2_word.search_text_index("内容", str(db_path))) == [1]
+
+def test_index_without_trigram_falls_back_to_like(tmp_path):
+    # 模拟旧版 SQLite 建立的索引：segment_fts 使用默认分词器，中文整句是一个词
+    db_path = tmp_path / "index.db"
+    conn = sqlite3.connect(str(db_path))
+    conn.execute("CREATE VIRTUAL TABLE segment_fts USING fts5(content)")
+    conn.close()
+    build_index(db_path)
+    conn = ai_2_word.open_text_index(str(db_path))
+    try:
+        assert not ai_2_word.has_trigram_index(conn)
+    finally:
+        conn.close()
+    assert keys(ai_2_word.search_text_index("文本框", str(db_path))) == [1]
+    assert keys(ai_2_word.search_text_index("B-12", str(db_path))) == [2]
+    assert keys(ai_2_word.search_text_index("50%", str(db_path))) == []
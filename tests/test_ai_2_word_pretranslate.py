@@ -0,0 +1,124 @@
+"""ai_2_word 预翻译的离线测试：用桩翻译后端代替 HTTP 服务，不需要 Illustrator 和界面"""
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import ai_2_word
+
+class StubTranslator(ai_2_word.Translator):
+    """桩翻译后端：译文为 "EN:" + 原文，原文中含 fail_marker 的批次抛出异常"""
+    name = "stub"
+
+    def __init__(self, fail_marker=None):
+        self.fail_marker = fail_marker
+        self.batches = []
+        self.threads = set()
+
+    def translate_batch(self, texts):
+        self.batches.append(list(texts))
+        self.threads.add(threading.get_ident())
+        if self.fail_marker and any(self.fail_marker in text for text in texts):
+            raise RuntimeError("stub translator failure")
+        return ["EN:" + text for text in texts]
+
+class FakeRoot:
+    """只实现 after：回调排队，由测试在主线程中依次执行"""
+    def __init__(self):
+        self.callbacks = []
+
+    def after(self, ms, func):
+        self.callbacks.append(func)
+
+    def run_until(self, predicate, timeout=10):
+        deadline = time.monotonic() + timeout
+        while not predicate():
+            assert time.monotonic() < deadline, "回调超时"
+            if self.callbacks:
+                self.callbacks.pop(0)()
+            else:
+                time.sleep(0.01)
+
+class Var:
+    def __init__(self, value):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+def make_app():
+    app = ai_2_word.AIProcessorApp.__new__(ai_2_word.AIProcessorApp)
+    app.root = FakeRoot()
+    app.messages = []
+    app.log = app.messages.append
+    return app
+
+def test_pretranslate_deduplicates_and_uses_cache(tmp_path):
+    db_path = str(tmp_path / "cache.db")
+    translator = StubTranslator()
+    texts = ["你好", "再见", "你好", "  ", "谢谢"]
+    translations, stats = ai_2_word.pretranslate(texts, translator, ai_2_word.TranslationCache(db_path, "stub"),
+                                                 batch_size=2, max_workers=2)
+    assert translations == {"你好": "EN:你好", "再见": "EN:再见", "谢谢": "EN:谢谢"}
+    assert stats["unique"] == 3 and stats["translated"] == 3 and stats["cached"] == 0
+    assert sorted(len(batch) for batch in translator.batches) == [1, 2]
+    
+    # 新的缓存实例读到已保存的译文，不再请求后端
+    second = StubTranslator()
+    translations, stats = ai_2_word.pretranslate(texts, second, ai_2_word.TranslationCache(db_path, "stub"))
+    assert stats["cached"] == 3 and second.batches == []
+    assert translations["谢谢"] == "EN:谢谢"
+
+def test_failed_batch_keeps_other_results():
+    translator = StubTranslator(fail_marker="坏")
+    translations, stats = ai_2_word.pretranslate(["好", "坏"], translator, batch_size=1)
+    assert translations == {"好": "EN:好"}
+    assert stats["failed"] == 1 and "stub translator failure" in stats["errors"][0]
+
+def test_run_pretranslation_runs_off_the_tk_thread():
+    app = make_app()
+    translator = StubTranslator()
+    options = {"translator": translator, "translation_cache": None, "mt_batch_size": 10, "mt_workers": 1}
+    results = []
+    segments = [{"text": "你好"}, {"text": "世界"}]
+    app.run_pretranslation([segments], options, results.append)
+    # 请求在后台进行，调用立即返回
+    assert results == []
+    app.root.run_until(lambda: results)
+    assert results == [{"你好": "EN:你好", "世界": "EN:世界"}]
+    assert threading.get_ident() not in translator.threads
+
+def test_run_pretranslation_reports_errors(monkeypatch):
+    app = make_app()
+    options = {"translator": StubTranslator(), "translation_cache": None, "mt_batch_size": 10, "mt_workers": 1}
+    
+    def broken(*args):
+        raise RuntimeError("boom")
+    
+    monkeypatch.setattr(ai_2_word, "pretranslate", broken)
+    results = []
+    app.run_pretranslation([[{"text": "你好"}]], options, results.append)
+    app.root.run_until(lambda: results)
+    assert results == [None]
+    assert any("boom" in message for message in app.messages)
+
+def test_run_pretranslation_without_translator_is_immediate():
+    app = make_app()
+    results = []
+    app.run_pretranslation([[{"text": "你好"}]], {"translator": None}, results.append)
+    assert results == [None] and app.root.callbacks == []
+
+def test_export_options_continue_without_cache(tmp_path, monkeypatch):
+    # 目录不能作为 SQLite 数据库打开
+    monkeypatch.setattr(ai_2_word, "TRANSLATION_CACHE_DB", str(tmp_path))
+    app = make_app()
+    app.build_segment_filter = ai_2_word.SegmentFilter
+    app.merge_segments, app.merge_threshold, app.update_index = Var(False), Var(1), Var(False)
+    app.pretranslate_enabled, app.mt_url = Var(True), Var("http://127.0.0.1:9/translate")
+    app.mt_source_lang, app.mt_target_lang = Var("zh"), Var("en")
+    app.mt_batch_size, app.mt_workers = Var(10), Var(2)
+    options = app.get_export_options()
+    assert options["translator"] is not None
+    assert options["translation_cache"] is None
+    assert any("译文缓存" in message for message in app.messages)
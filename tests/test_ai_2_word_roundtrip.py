@@ -0,0 +1,114 @@
+"""ai_2_word 翻译文件往返测试：导出 → 编辑译文 → 导入 → update_ai_file 按文本框序号写回"""
+import csv
+import os
+import sys
+import types
+import xml.etree.ElementTree as ET
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import ai_2_word
+
+# 序号 1 是纯数字、序号 3 是空白，导出时被过滤，保留的句段序号不连续
+FRAMES = ["标题", "2024", "说明文字", " ", "注意事项"]
+KEPT_KEYS = [0, 2, 4]
+
+def segments():
+    return [{'key': str(i), 'text': text, 'x': 10.0 * i, 'y': 100.0 - i} for i, text in enumerate(FRAMES)]
+
+def export(path):
+    segment_filter = ai_2_word.SegmentFilter.from_options(export_numbers=False, export_blanks=False)
+    ai_2_word.generate_translation_file(segments(), str(path), "a.ai", segment_filter,
+                                        show_message=False, raise_errors=True)
+
+def edit_csv(path):
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        rows = list(csv.reader(f))
+    for row in rows[2:]:
+        row[1] = "EN:" + row[0]
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        csv.writer(f).writerows(rows)
+
+def edit_xliff(path):
+    ns = {'x': ai_2_word.XLIFF_NAMESPACE}
+    ET.register_namespace('', ai_2_word.XLIFF_NAMESPACE)
+    tree = ET.parse(path)
+    for unit in tree.iterfind('.//x:trans-unit', ns):
+        unit.find('x:target', ns).text = "EN:" + unit.find('x:source', ns).text
+    tree.write(path, encoding='utf-8', xml_declaration=True)
+
+def edit_xlsx(path):
+    openpyxl = pytest.importorskip("openpyxl")
+    workbook = openpyxl.load_workbook(path)
+    sheet = workbook.active
+    for row in sheet.iter_rows(min_row=2):
+        row[3].value = "EN:" + row[2].value
+    workbook.save(path)
+
+class FakeFrame:
+    def __init__(self, contents):
+        self.Contents = contents
+
+class FakeDocument:
+    def __init__(self, contents):
+        self.TextFrames = [FakeFrame(text) for text in contents]
+        self.saved = False
+
+    def Save(self):
+        self.saved = True
+
+    def Close(self):
+        pass
+
+@pytest.fixture
+def illustrator(monkeypatch):
+    """用假的 comtypes.client 代替 Illustrator，记录打开的文档"""
+    documents = []
+
+    class Application:
+        def Open(self, path):
+            documents.append(FakeDocument(FRAMES))
+            return documents[-1]
+
+    client = types.ModuleType("comtypes.client")
+    client.CreateObject = lambda name: Application()
+    comtypes = types.ModuleType("comtypes")
+    comtypes.client = client
+    monkeypatch.setitem(sys.modules, "comtypes", comtypes)
+    monkeypatch.setitem(sys.modules, "comtypes.client", client)
+    return documents
+
+@pytest.mark.parametrize("extension, edit", [(".csv", edit_csv), (".xlf", edit_xliff), (".xlsx", edit_xlsx)])
+def test_export_edit_import_maps_by_frame_key(tmp_path, illustrator, extension, edit):
+    if extension == ".xlsx":
+        pytest.importorskip("openpyxl")
+    path = tmp_path / ("a" + extension)
+    export(path)
+    edit(str(path))
+
+    items = ai_2_word.read_translations(str(path), "a.ai")
+    assert items == [(str(key), "EN:" + FRAMES[key]) for key in KEPT_KEYS]
+    translations = ai_2_word.translations_for_update(items)
+    assert translations == {key: "EN:" + FRAMES[key] for key in KEPT_KEYS}
+
+    assert ai_2_word.update_ai_file("a.ai", translations, "replace")
+    document, = illustrator
+    assert document.saved
+    # 被过滤的文本框保持原样，其余按序号写回，不因过滤而错位
+    assert [frame.Contents for frame in document.TextFrames] == ["EN:标题", "2024", "EN:说明文字", " ", "EN:注意事项"]
+
+def test_two_column_csv_still_maps_in_order(tmp_path):
+    path = tmp_path / "old.csv"
+    path.write_text("文件名: a.ai\n原文,译文\n标题,Title\n说明文字,Caption\n", encoding='utf-8-sig')
+    items = ai_2_word.read_translations(str(path), "a.ai")
+    assert items == [(None, "Title"), (None, "Caption")]
+    assert ai_2_word.translations_for_update(items) == ["Title", "Caption"]
+
+def test_plain_text_lists_are_exported_without_keys(tmp_path):
+    for extension in (".csv", ".xlf"):
+        path = tmp_path / ("texts" + extension)
+        assert ai_2_word.generate_translation_csv(["标题 说明文字", "注意事项"], str(path), "a.ai",
+                                                  show_message=False)
+        items = ai_2_word.read_translations(str(path), "a.ai")
+        assert ai_2_word.translations_for_update(items) == ["标题 说明文字", "注意事项"]
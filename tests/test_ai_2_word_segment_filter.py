@@ -0,0 +1,50 @@
+"""ai_2_word 句段过滤规则和不翻译词匹配（Aho-Corasick）的测试"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import ai_2_word
+
+def matches(terms, text):
+    return [text[start:end] for start, end in ai_2_word.AhoCorasick(terms).iter_matches(text)]
+
+def test_matches_are_case_insensitive_and_overlapping():
+    assert matches(["he", "she", "hers"], "USHERS") == ["SHE", "HE", "HERS"]
+
+def test_offsets_after_multi_character_case_folding():
+    # İ 折叠为 i + 组合点两个字符，ß 折叠为 ss：其后的命中位置仍对应原文本
+    assert matches(["İstanbul"], "Visit İSTANBUL, i\u0307stanbul") == ["İSTANBUL", "i\u0307stanbul"]
+    assert matches(["bul"], "İİİstanbul") == ["bul"]
+    assert matches(["strasse"], "Große Straße") == ["Straße"]
+    assert matches(["gross"], "Große") == ["Groß"]
+    # 只覆盖 ß 折叠结果一部分的命中不算
+    assert matches(["s"], "ß") == []
+    assert matches(["ss"], "ß") == ["ß"]
+
+def test_dnt_only_segments_are_skipped():
+    segment_filter = ai_2_word.SegmentFilter(dnt_terms=["Acme", "PowerDrive"])
+    assert segment_filter.classify("ACME PowerDrive™") == 'dnt'
+    assert segment_filter.classify("Acme, PowerDrive!") == 'dnt'
+    # 还有其他需要翻译的内容
+    assert segment_filter.classify("Acme 电钻") is None
+    assert segment_filter.classify("Acmeville") is None
+
+def test_part_numbers_need_three_digits():
+    segment_filter = ai_2_word.SegmentFilter(skip_rules={'part_number'})
+    assert segment_filter.classify("AB-1234") == 'part_number'
+    assert segment_filter.classify("X12-7/B") == 'part_number'
+    for text in ("COVID-19", "MP3", "USB", "X-12"):
+        assert segment_filter.classify(text) is None, text
+
+def test_apply_counts_hits_per_rule():
+    segment_filter = ai_2_word.SegmentFilter(skip_rules={'number', 'blank', 'part_number', 'unit'},
+                                             dnt_terms=["Acme"], min_length=2)
+    texts = ["123", "1,000", " ", "AB-1234", "220V", "Acme", "说明", "COVID-19", "A"]
+    kept = segment_filter.apply([{'text': text} for text in texts], key=lambda segment: segment['text'])
+    assert [segment['text'] for segment in kept] == ["说明", "COVID-19"]
+    assert segment_filter.hit_counts == {'number': 2, 'blank': 1, 'part_number': 1, 'unit': 1,
+                                         'dnt': 1, 'min_length': 1}
+    # 命中数跨批次累计
+    segment_filter.apply(["456"])
+    assert segment_filter.hit_counts['number'] == 3
+    assert segment_filter.summary().startswith("纯数字 3")
@@ -0,0 +1,172 @@
+"""ai_2_word 文件夹监控的测试：防抖、mtime+size / SHA-256 判断，以及只在导出成功后标记为已处理"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import ai_2_word
+
+class Clock:
+    """代替 time.time，由测试推进"""
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ai_2_word.time, "time", clock)
+    return clock
+
+@pytest.fixture
+def hashed(monkeypatch):
+    """记录计算过 SHA-256 的文件"""
+    paths = []
+    original = ai_2_word.file_sha256
+
+    def file_sha256(path):
+        paths.append(os.path.basename(path))
+        return original(path)
+
+    monkeypatch.setattr(ai_2_word, "file_sha256", file_sha256)
+    return paths
+
+def write(folder, name, data, mtime):
+    path = folder / name
+    path.write_bytes(data)
+    os.utime(path, (mtime, mtime))
+    return path
+
+def make_watcher(tmp_path, debounce=2.0):
+    return ai_2_word.FolderWatcher(str(tmp_path), str(tmp_path / "state.json"), debounce=debounce)
+
+def test_file_is_ready_only_after_signature_is_stable(tmp_path, clock):
+    watcher = make_watcher(tmp_path)
+    write(tmp_path, "a.ai", b"v1", 100)
+    write(tmp_path, "notes.txt", b"ignored", 100)
+    assert watcher.scan() == []
+    clock.now += 1
+    assert watcher.scan() == []
+    # 防抖期间再次保存：重新计时
+    write(tmp_path, "a.ai", b"v1 more", 101)
+    clock.now += 1.5
+    assert watcher.scan() == []
+    clock.now += 1.5
+    assert watcher.scan() == []
+    clock.now += 1
+    ready = watcher.scan()
+    assert [name for name, _ in ready] == ["a.ai"]
+    assert ready[0][1]["size"] == len(b"v1 more")
+
+def test_unchanged_signature_skips_hashing(tmp_path, clock, hashed):
+    watcher = make_watcher(tmp_path, debounce=0)
+    write(tmp_path, "a.ai", b"v1", 100)
+    watcher.scan()
+    (name, info), = watcher.scan()
+    watcher.mark_done(name, info)
+    assert hashed == ["a.ai"]
+    for _ in range(3):
+        assert watcher.scan() == []
+    assert hashed == ["a.ai"]
+    # 状态写入文件，重新开始监控后也不再提取
+    restarted = make_watcher(tmp_path, debounce=0)
+    assert restarted.scan() == [] and hashed == ["a.ai"]
+
+def test_touched_file_with_same_content_is_not_exported_again(tmp_path, clock, hashed):
+    watcher = make_watcher(tmp_path, debounce=0)
+    write(tmp_path, "a.ai", b"v1", 100)
+    watcher.scan()
+    watcher.mark_done(*watcher.scan()[0])
+    # 只改了修改时间：计算一次摘要，内容相同，记录新签名
+    write(tmp_path, "a.ai", b"v1", 200)
+    watcher.scan()
+    assert watcher.scan() == []
+    assert hashed == ["a.ai", "a.ai"]
+    assert make_watcher(tmp_path).state["a.ai"]["mtime"] == 200
+    assert watcher.scan() == [] and len(hashed) == 2
+    # 大小不变但内容变化
+    write(tmp_path, "a.ai", b"v2", 300)
+    watcher.scan()
+    assert [name for name, _ in watcher.scan()] == ["a.ai"]
+
+def test_deleted_files_are_forgotten(tmp_path, clock):
+    watcher = make_watcher(tmp_path, debounce=0)
+    path = write(tmp_path, "a.ai", b"v1", 100)
+    watcher.scan()
+    watcher.mark_done(*watcher.scan()[0])
+    path.unlink()
+    assert watcher.scan() == []
+    assert make_watcher(tmp_path).state == {}
+
+class FakeRoot:
+    def __init__(self):
+        self.scheduled = []
+
+    def after(self, ms, func):
+        self.scheduled.append(func)
+        return len(self.scheduled)
+
+class Var:
+    def __init__(self, value):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+def make_app(tmp_path, extract):
+    """只带监控所需属性的应用：extract(文件名) 代替 Illustrator 提取"""
+    app = ai_2_word.AIProcessorApp.__new__(ai_2_word.AIProcessorApp)
+    app.root = FakeRoot()
+    app.messages = []
+    app.log = app.messages.append
+    app.watch_interval = Var(2)
+    app.export_extension = lambda: ".csv"
+    app.get_export_options = lambda: {'segment_filter': ai_2_word.SegmentFilter(), 'translator': None}
+    app.extract_for_export = lambda path, options, show_message=True, raise_errors=False: \
+        extract(os.path.basename(path))
+    (tmp_path / "output").mkdir(exist_ok=True)
+    app.watcher = ai_2_word.FolderWatcher(str(tmp_path), str(tmp_path / "output" / "state.json"), debounce=0)
+    return app
+
+def poll(app):
+    app.root.scheduled.clear()
+    app.poll_watch_folder()
+    assert len(app.root.scheduled) == 1  # 每次扫描后都安排下一次
+
+def test_only_successful_exports_are_marked_done(tmp_path, clock):
+    segments = [{'key': "0", 'text': "你好", 'x': 1.0, 'y': 2.0}]
+
+    def extract(name):
+        if name == "broken.ai":
+            raise RuntimeError("Illustrator 打开失败")
+        return ([], []) if name == "empty.ai" else (segments, segments)
+
+    for name in ("good.ai", "broken.ai", "empty.ai", "locked.ai"):
+        write(tmp_path, name, name.encode(), 100)
+    # 输出路径被目录占用，写入失败
+    os.makedirs(tmp_path / "output" / "locked.csv")
+    app = make_app(tmp_path, extract)
+    poll(app)
+    poll(app)
+
+    assert sorted(app.watcher.state) == ["empty.ai", "good.ai"]
+    assert (tmp_path / "output" / "good.csv").is_file()
+    assert any("broken.ai" in message and "导出失败" in message for message in app.messages)
+    assert any("locked.ai" in message and "导出失败" in message for message in app.messages)
+
+    # 失败的文件未标记，重新经过防抖后再次提取；问题解决后导出并标记
+    os.rmdir(tmp_path / "output" / "locked.csv")
+    retried = []
+    app.extract_for_export = lambda path, options, show_message=True, raise_errors=False: \
+        retried.append(os.path.basename(path)) or (segments, segments)
+    poll(app)
+    assert retried == []
+    poll(app)
+    assert sorted(retried) == ["broken.ai", "locked.ai"]
+    assert sorted(app.watcher.state) == ["broken.ai", "empty.ai", "good.ai", "locked.ai"]
+    retried.clear()
+    poll(app)
+    assert retried == []
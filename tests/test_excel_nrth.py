@@ -0,0 +1,131 @@
+"""excelNRTH 离线替换引擎的往返测试：用 zipfile 构造 .xlsx，替换后检查各部件"""
+import os
+import re
+import sys
+import zipfile
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "excelTH"))
+import excelNRTH
+
+REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+XDR = "http://schemas.openxmlformats.org/drawingml/2006/spreadsheetDrawing"
+A = "http://schemas.openxmlformats.org/drawingml/2006/main"
+
+def rels(*items):
+    body = "".join(f'<Relationship Id="{rid}" Type="{REL}/{kind}" Target="{target}"/>' for rid, kind, target in items)
+    return f'<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">{body}</Relationships>'
+
+def sheet(cells, drawing=False):
+    row = "".join(cells)
+    extra = '<drawing r:id="rId1"/>' if drawing else ""
+    return (f'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="{REL}">'
+            f'<sheetData><row r="1">{row}</row></sheetData>{extra}</worksheet>')
+
+def shared(ref, index):
+    return f'<c r="{ref}" t="s"><v>{index}</v></c>'
+
+def inline(ref, text):
+    return f'<c r="{ref}" t="inlineStr"><is><t>{text}</t></is></c>'
+
+def frame(name, uri, data):
+    return (f'<xdr:graphicFrame><xdr:nvGraphicFramePr><xdr:cNvPr id="3" name="{name}"/></xdr:nvGraphicFramePr>'
+            f'<a:graphic><a:graphicData uri="{uri}">{data}</a:graphicData></a:graphic></xdr:graphicFrame>')
+
+DRAWING = (
+    f'<xdr:wsDr xmlns:xdr="{XDR}" xmlns:a="{A}" xmlns:r="{REL}">'
+    '<xdr:twoCellAnchor><xdr:sp><xdr:nvSpPr><xdr:cNvPr id="2" name="文本框 1"/></xdr:nvSpPr>'
+    '<xdr:spPr/><xdr:txBody><a:bodyPr/><a:p><a:r><a:t>旧</a:t></a:r><a:r><a:t>标签</a:t></a:r></a:p>'
+    '</xdr:txBody></xdr:sp></xdr:twoCellAnchor>'
+    '<xdr:twoCellAnchor><xdr:cxnSp><xdr:nvCxnSpPr><xdr:cNvPr id="4" name="连接线 旧"/></xdr:nvCxnSpPr>'
+    '</xdr:cxnSp></xdr:twoCellAnchor>'
+    '<xdr:twoCellAnchor>'
+    + frame("图表 1", excelNRTH.OpenXmlReplaceEngine.CHART_URI, '<c:chart r:id="rId1"/>')
+    + '</xdr:twoCellAnchor><xdr:twoCellAnchor>'
+    + frame("SmartArt 1", "http://schemas.openxmlformats.org/drawingml/2006/diagram", '<dgm:relIds r:dm="rId2"/>')
+    + '</xdr:twoCellAnchor></xdr:wsDr>')
+
+CHART = (f'<c:chartSpace xmlns:c="http://schemas.openxmlformats.org/drawingml/2006/chart" xmlns:a="{A}">'
+         '<c:chart><c:title><c:tx><c:rich><a:bodyPr/><a:p><a:r><a:t>旧图表</a:t></a:r></a:p></c:rich></c:tx>'
+         '</c:title><c:ser><c:tx><c:strRef><c:strCache><c:pt idx="0"><c:v>旧系列</c:v></c:pt></c:strCache>'
+         '</c:strRef></c:tx></c:ser></c:chart></c:chartSpace>')
+
+def build(path):
+    """两个工作表共用共享字符串 0（“旧值”）；Sheet1 有内联字符串和绘图，保存时活动的是 Sheet2"""
+    parts = {
+        "xl/workbook.xml": (
+            f'<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="{REL}">'
+            '<bookViews><workbookView activeTab="1"/></bookViews><sheets>'
+            '<sheet name="Sheet1" sheetId="1" r:id="rId1"/><sheet name="Sheet2" sheetId="2" r:id="rId2"/>'
+            '</sheets></workbook>'),
+        "xl/_rels/workbook.xml.rels": rels(("rId1", "worksheet", "worksheets/sheet1.xml"),
+                                           ("rId2", "worksheet", "worksheets/sheet2.xml"),
+                                           ("rId3", "sharedStrings", "sharedStrings.xml")),
+        "xl/sharedStrings.xml": (
+            '<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" count="3" uniqueCount="2">'
+            '<si><t>旧值</t></si><si><t>不变</t></si></sst>'),
+        "xl/worksheets/sheet1.xml": sheet([shared("A1", 0), shared("B1", 1), inline("C1", "内联旧文字"),
+                                          '<c r="D1"><v>42</v></c>'], drawing=True),
+        "xl/worksheets/_rels/sheet1.xml.rels": rels(("rId1", "drawing", "../drawings/drawing1.xml")),
+        "xl/worksheets/sheet2.xml": sheet([shared("A1", 0)]),
+        "xl/drawings/drawing1.xml": DRAWING,
+        "xl/drawings/_rels/drawing1.xml.rels": rels(("rId1", "chart", "../charts/chart1.xml"),
+                                                    ("rId2", "diagramData", "../diagrams/data1.xml")),
+        "xl/charts/chart1.xml": CHART,
+        "xl/diagrams/data1.xml": f'<dgm:dataModel xmlns:a="{A}"><a:t>旧</a:t></dgm:dataModel>',
+    }
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as package:
+        for name, xml in parts.items():
+            package.writestr(name, xml)
+    return parts
+
+def run(tmp_path, scope, **options):
+    src = tmp_path / "book.xlsx"
+    original = build(src)
+    messages = []
+    engine = excelNRTH.OpenXmlReplaceEngine("旧", "新&<", scope=scope, log=messages.append, **options)
+    total = engine.run([str(src)])
+    with zipfile.ZipFile(src) as package:
+        parts = {name: package.read(name).decode("utf-8") for name in package.namelist()}
+    return total, parts, original, messages
+
+def texts(xml, tag="t"):
+    return re.findall(rf"<{tag}>(.*?)</{tag}>", xml)
+
+def test_workbook_scope_replaces_shared_inline_shape_and_chart_text(tmp_path):
+    total, parts, original, messages = run(tmp_path, "workbook")
+    # 共享字符串就地修改，两个工作表都引用它：计 2 次
+    assert texts(parts["xl/sharedStrings.xml"]) == ["新&amp;&lt;值", "不变"]
+    assert 'uniqueCount="2"' in parts["xl/sharedStrings.xml"]
+    assert parts["xl/worksheets/sheet2.xml"] == original["xl/worksheets/sheet2.xml"]
+    assert texts(parts["xl/worksheets/sheet1.xml"]) == ["内联新&amp;&lt;文字"]
+    assert "<v>42</v>" in parts["xl/worksheets/sheet1.xml"]
+    # 文本框中“旧”在单独的文字段内，逐段替换、保留格式
+    assert texts(parts["xl/drawings/drawing1.xml"], "a:t") == ["新&amp;&lt;", "标签"]
+    assert 'name="连接线 旧"' in parts["xl/drawings/drawing1.xml"]
+    # 图表标题替换，来自单元格的系列名称缓存不动
+    assert texts(parts["xl/charts/chart1.xml"], "a:t") == ["新&amp;&lt;图表"]
+    assert "<c:v>旧系列</c:v>" in parts["xl/charts/chart1.xml"]
+    assert parts["xl/diagrams/data1.xml"] == original["xl/diagrams/data1.xml"]
+    assert any("SmartArt 1" in m and "不支持的类型" in m for m in messages)
+    assert total == 2 + 1 + 1 + 1
+
+def test_worksheet_scope_only_touches_active_sheet(tmp_path):
+    total, parts, original, messages = run(tmp_path, "worksheet")
+    assert total == 1
+    # 追加新字符串给活动工作表使用，Sheet1 仍引用原字符串
+    sst = parts["xl/sharedStrings.xml"]
+    assert texts(sst) == ["旧值", "不变", "新&amp;&lt;值"]
+    assert 'uniqueCount="3"' in sst and 'count="3"' in sst
+    assert '<c r="A1" t="s"><v>2</v></c>' in parts["xl/worksheets/sheet2.xml"]
+    for name in ("xl/worksheets/sheet1.xml", "xl/drawings/drawing1.xml", "xl/charts/chart1.xml"):
+        assert parts[name] == original[name]
+
+@pytest.mark.parametrize("options, changed", [
+    ({"cells": False}, {"xl/drawings/drawing1.xml", "xl/charts/chart1.xml"}),
+    ({"shapes": False}, {"xl/sharedStrings.xml", "xl/worksheets/sheet1.xml"}),
+])
+def test_cells_and_shapes_can_be_turned_off(tmp_path, options, changed):
+    _, parts, original, _ = run(tmp_path, "workbook", **options)
+    assert {name for name in original if parts[name] != original[name]} == changed
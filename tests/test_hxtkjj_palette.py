@@ -0,0 +1,39 @@
+"""hxtkjj 色板文件解析的测试"""
+import json
+import os
+import sys
+
+import pytest
+
+HXERGB_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "HXERGB")
+
+@pytest.fixture(scope="module")
+def hxtkjj():
+    pytest.importorskip("PIL")
+    pytest.importorskip("keyboard")
+    sys.path.insert(0, HXERGB_DIR)
+    import hxtkjj
+    return hxtkjj
+
+def write(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+def test_hex_like_names_do_not_shadow_the_value(hxtkjj, tmp_path):
+    path = write(tmp_path, "colors.csv", "Beaded,#FF0000\nFacade Grey #808080\nCafe;#00ff00\n")
+    assert hxtkjj.load_palette(path) == [
+        ("Beaded", (255, 0, 0)),
+        ("Facade Grey", (128, 128, 128)),
+        ("Cafe", (0, 255, 0)),
+    ]
+
+def test_bare_hex_takes_last_value_on_line(hxtkjj, tmp_path):
+    path = write(tmp_path, "colors.txt", "Beaded FF0000\n0000FF\nno colour here\n")
+    assert hxtkjj.load_palette(path) == [("Beaded", (255, 0, 0)), ("#0000FF", (0, 0, 255))]
+
+def test_gimp_and_json_palettes(hxtkjj, tmp_path):
+    gpl = write(tmp_path, "p.gpl", "GIMP Palette\nName: test\n#\n255 0 0 Beaded\n0 0 255\n")
+    assert hxtkjj.load_palette(gpl) == [("Beaded", (255, 0, 0)), ("#0000FF", (0, 0, 255))]
+    data = write(tmp_path, "p.json", json.dumps([{"name": "Facade", "hex": "#808080"}, ["Red", "FF0000"]]))
+    assert hxtkjj.load_palette(data) == [("Facade", (128, 128, 128)), ("Red", (255, 0, 0))]
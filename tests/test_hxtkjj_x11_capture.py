@@ -0,0 +1,93 @@
+"""hxtkjj X11 截图后端的测试：在 Xvfb 虚拟屏幕上画已知颜色，分别走 MIT-SHM 和 XGetSubImage 两条路径截取"""
+import os
+import select
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+HXERGB_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "HXERGB")
+COLOR = (0x12, 0xAB, 0x34)
+# 色块在屏幕上的位置和大小
+BLOCK = (40, 30, 64, 48)
+
+@pytest.fixture(scope="module")
+def xvfb():
+    """启动 Xvfb，返回显示名；没有 Xvfb 时跳过"""
+    if not sys.platform.startswith("linux") or not shutil.which("Xvfb"):
+        pytest.skip("需要 Xvfb")
+    read_fd, write_fd = os.pipe()
+    server = subprocess.Popen(["Xvfb", "-displayfd", str(write_fd), "-screen", "0", "320x240x24", "-br", "-nolisten", "tcp"],
+                              pass_fds=(write_fd,), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    os.close(write_fd)
+    try:
+        # Xvfb 就绪后把显示编号写到 displayfd
+        if not select.select([read_fd], [], [], 15)[0]:
+            pytest.skip("Xvfb 启动超时")
+        number = os.read(read_fd, 64).decode().strip()
+        if not number:
+            pytest.skip("Xvfb 启动失败")
+        yield f":{number}"
+    finally:
+        os.close(read_fd)
+        server.terminate()
+        server.wait(10)
+
+@pytest.fixture(scope="module")
+def hxtkjj(xvfb):
+    pytest.importorskip("numpy")
+    pytest.importorskip("PIL")
+    pytest.importorskip("keyboard")
+    sys.path.insert(0, HXERGB_DIR)
+    import hxtkjj
+    return hxtkjj
+
+@pytest.fixture(scope="module")
+def color_block(xvfb):
+    """用一个无边框的 Tk 窗口在 BLOCK 处画纯色块（Xvfb 没有窗口管理器，位置就是请求的位置）"""
+    tk = pytest.importorskip("tkinter")
+    root = tk.Tk(screenName=xvfb)
+    root.withdraw()
+    block = tk.Toplevel(root, background="#%02x%02x%02x" % COLOR, borderwidth=0, highlightthickness=0)
+    block.overrideredirect(True)
+    left, top, width, height = BLOCK
+    block.geometry(f"{width}x{height}+{left}+{top}")
+    block.update()
+    block.wait_visibility()
+    block.update()
+    yield BLOCK
+    root.destroy()
+
+@pytest.mark.parametrize("use_shm, name", [(True, "x11-shm"), (False, "x11")])
+def test_grab_reads_known_color(hxtkjj, xvfb, color_block, use_shm, name):
+    capture = hxtkjj.X11CaptureBackend(display=xvfb, use_shm=use_shm)
+    try:
+        assert capture.name == name
+        assert capture.screen_size() == (320, 240)
+        left, top, width, height = color_block
+        # 1x1 取色路径
+        assert capture.grab(left + 5, top + 5, 1, 1).pixel(0, 0) == COLOR
+        # 跨过色块边界的区域：内部是色块颜色，外面是 Xvfb 的黑色背景（-br）
+        frame = capture.grab(left - 2, top - 2, 8, 8)
+        assert frame.pixel(4, 4) == COLOR
+        assert frame.pixel(0, 0) != COLOR
+        pixels = frame.array()
+        assert pixels.shape == (8, 8, 3)
+        assert tuple(int(v) for v in pixels[2:, 2:].reshape(-1, 3).min(axis=0)) == COLOR
+        assert tuple(int(v) for v in pixels[2:, 2:].reshape(-1, 3).max(axis=0)) == COLOR
+        # reserve 过的尺寸复用缓冲区，数据仍然正确
+        capture.reserve(3, 3)
+        assert capture.grab(left + 10, top + 10, 3, 3).pixel(1, 1) == COLOR
+    finally:
+        capture.close()
+
+@pytest.mark.parametrize("use_shm", [True, False])
+def test_grab_pads_outside_screen(hxtkjj, xvfb, color_block, use_shm):
+    capture = hxtkjj.X11CaptureBackend(display=xvfb, use_shm=use_shm)
+    try:
+        frame = capture.grab(-2, -2, 5, 5)
+        assert (frame.width, frame.height) == (5, 5)
+        assert frame.pixel(0, 0) == (0, 0, 0)
+    finally:
+        capture.close()
@@ -0,0 +1,141 @@
+"""olmocr 常驻 pipeline 工作进程的测试（使用 stub_pipeline，不需要 GPU 和模型）"""
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+OLMOCR_DIR = os.path.join(os.path.dirname(TESTS_DIR), "olmocr")
+
+@pytest.fixture(scope="module")
+def olmocr_app(tmp_path_factory):
+    pytest.importorskip("gradio")
+    pytest.importorskip("pandas")
+    # olmocr.py 导入时在当前目录创建工作区
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("workspace"))
+    sys.path[:0] = [OLMOCR_DIR, TESTS_DIR]
+    try:
+        import olmocr
+        yield olmocr
+    finally:
+        os.chdir(cwd)
+
+@pytest.fixture
+def worker(olmocr_app):
+    worker = olmocr_app.PipelineWorker("stub_pipeline")
+    worker.start(timeout=60)
+    yield worker
+    worker.stop(force=True)
+
+def run(worker, job_dir, mode="ok", timeout=60):
+    """在 job_dir 中执行一次桩任务，返回 (是否成功, 错误信息, 桩模块写出的结果)"""
+    job_dir.mkdir(exist_ok=True)
+    result_path = job_dir / f"{mode}.json"
+    ok, error = worker.run_job([str(result_path), mode], job_dir / "job.log", timeout=timeout)
+    result = json.loads(result_path.read_text()) if result_path.exists() else None
+    return ok, error, result
+
+def test_worker_is_reused_with_fresh_module_state(worker, tmp_path):
+    pid = worker.process.pid
+    first = run(worker, tmp_path / "a")
+    second = run(worker, tmp_path / "b")
+    assert first[:2] == (True, "") and second[:2] == (True, "")
+    # 同一个进程执行两次，模块级状态和事件循环每次都是新的
+    assert first[2] == {"pid": pid, "runs": 1}
+    assert second[2] == {"pid": pid, "runs": 1}
+    assert "stub pipeline done" in (tmp_path / "a" / "job.log").read_text(encoding="utf-8")
+
+def test_failed_job_keeps_worker(worker, tmp_path):
+    pid = worker.process.pid
+    ok, error, _ = run(worker, tmp_path, "fail")
+    assert not ok and "stub failure" in error
+    assert worker.process.pid == pid and worker.health_check()
+
+def test_crash_restarts_worker(worker, tmp_path):
+    pid = worker.process.pid
+    ok, error, _ = run(worker, tmp_path, "crash")
+    assert not ok and "意外退出" in error
+    assert worker.is_alive() and worker.process.pid != pid
+    ok, _, result = run(worker, tmp_path / "after")
+    assert ok and result["pid"] == worker.process.pid
+
+def test_timeout_restarts_worker(worker, tmp_path):
+    pid = worker.process.pid
+    ok, error, _ = run(worker, tmp_path, "hang", timeout=2)
+    assert not ok and "超时" in error
+    assert worker.is_alive() and worker.process.pid != pid
+    assert run(worker, tmp_path / "after")[0]
+
+def test_import_error_is_reported(olmocr_app):
+    worker = olmocr_app.PipelineWorker("stub_pipeline_missing")
+    with pytest.raises(RuntimeError, match="启动失败"):
+        worker.start(timeout=60)
+    assert not worker.is_alive()
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+@pytest.fixture
+def fake_server(olmocr_app, tmp_path):
+    """用 http.server 代替 vLLM：目录中有 v1/models 文件即表示服务已就绪"""
+    (tmp_path / "www" / "v1").mkdir(parents=True)
+    (tmp_path / "www" / "v1" / "models").write_text("{}")
+    command = f"{sys.executable} -m http.server {{port}} --bind 127.0.0.1 --directory {tmp_path / 'www'}"
+    server = olmocr_app.InferenceServer("stub-model", free_port(), command)
+    yield server
+    server.stop()
+
+def test_pool_starts_server_once_and_passes_it_to_jobs(olmocr_app, fake_server, tmp_path):
+    pool = olmocr_app.WorkerPool(size=1, use_server=True, module_name="stub_pipeline")
+    pool.server = fake_server
+    try:
+        results = []
+        for name in ("a", "b"):
+            job_dir = tmp_path / name
+            job_dir.mkdir()
+            ok, error = pool.run_job([str(job_dir / "ok.json"), "ok"], job_dir / "job.log", timeout=60)
+            assert (ok, error) == (True, "")
+            results.append(json.loads((job_dir / "ok.json").read_text()))
+            if name == "a":
+                server_pid = fake_server.process.pid
+        assert [r["server"] for r in results] == [fake_server.url] * 2
+        # 第二个任务复用同一个服务进程
+        assert fake_server.process.pid == server_pid and fake_server.is_ready()
+    finally:
+        pool.close()
+        for worker in pool.workers:
+            worker.stop(force=True)
+    assert not fake_server.is_alive() and not fake_server.is_ready(timeout=1)
+
+def test_pool_falls_back_when_server_command_is_missing(olmocr_app, tmp_path):
+    pool = olmocr_app.WorkerPool(size=1, use_server=True, module_name="stub_pipeline")
+    pool.server = olmocr_app.InferenceServer("stub-model", free_port(), "olmocr-missing-server-binary {port}")
+    try:
+        ok, error = pool.run_job([str(tmp_path / "ok.json"), "ok"], tmp_path / "job.log", timeout=60)
+        assert (ok, error) == (True, "")
+        assert pool.server is None
+        assert "server" not in json.loads((tmp_path / "ok.json").read_text())
+    finally:
+        for worker in pool.workers:
+            worker.stop(force=True)
+
+def test_server_exit_during_start_is_reported(olmocr_app):
+    server = olmocr_app.InferenceServer("stub-model", free_port(), f"{sys.executable} -c 'raise SystemExit(3)'")
+    with pytest.raises(RuntimeError, match="退出码 3"):
+        server.start(timeout=30)
+    assert not server.is_alive()
+
+@pytest.mark.skipif(os.name == "nt", reason="进程组只在 POSIX 上使用")
+def test_kill_process_tree_spares_own_process_group(olmocr_app):
+    # 子进程与测试进程同属一个进程组，只能结束子进程本身
+    child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+    assert os.getpgid(child.pid) == os.getpgrp()
+    olmocr_app.kill_process_tree(child.pid)
+    assert child.wait(timeout=10) == -signal.SIGKILL